@@ -0,0 +1,62 @@
+"""
+Benchmark acquisition function optimization time of hybrid models as a function of
+the number of hysteretic inputs.
+
+Usage, from the repository root or after `pip install -e .`:
+    python -m benchmarks.bench_hybrid_dimension [--dims 2 10 50 100]
+"""
+import argparse
+import time
+from copy import deepcopy
+
+import torch
+from botorch.acquisition import UpperConfidenceBound
+from botorch.optim import optimize_acqf
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.hybrid import ExactHybridGP, AdditiveHybridGP
+
+
+def make_model(model_class, dim, n_train=20, mesh_scale=0.5):
+    torch.manual_seed(0)
+    H = BaseHysteresis(
+        trainable=False,
+        mesh_scale=mesh_scale,
+        fixed_domain=torch.tensor((0.0, 1.0)).double(),
+    )
+    train_x = torch.rand(n_train, dim).double()
+    train_y = torch.sin(4.0 * train_x).sum(dim=-1)
+    model = model_class(train_x, train_y, [deepcopy(H) for _ in range(dim)])
+    model.next()
+    return model
+
+
+def time_acquisition(model, dim, raw_samples=64, num_restarts=2, maxiter=20):
+    acq = UpperConfidenceBound(model, beta=2.0)
+    bounds = torch.stack((torch.zeros(dim), torch.ones(dim))).double()
+    start = time.perf_counter()
+    optimize_acqf(
+        acq,
+        bounds,
+        q=1,
+        num_restarts=num_restarts,
+        raw_samples=raw_samples,
+        options={"maxiter": maxiter},
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dims", type=int, nargs="+", default=[2, 10, 50, 100])
+    args = parser.parse_args()
+
+    print(f"{'dim':>6} {'ExactHybridGP (s)':>20} {'AdditiveHybridGP (s)':>22}")
+    for dim in args.dims:
+        exact = time_acquisition(make_model(ExactHybridGP, dim), dim)
+        additive = time_acquisition(make_model(AdditiveHybridGP, dim), dim)
+        print(f"{dim:>6} {exact:>20.3f} {additive:>22.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark propagation of many initial beam matricies through a lattice with
+TorchAccelerator.propagate_beams against a python loop over propagate_beam.
+
+Usage, from the repository root or after `pip install -e .`:
+    python -m benchmarks.bench_propagation [--n-beams 10 100 1000 10000]
+"""
+import argparse
+import time
+
+import torch
+
+from hysteresis.torch_accelerator.first_order import (
+    TorchAccelerator,
+    TorchDrift,
+    TorchQuad,
+)
+
+
+def make_lattice(n_cells=20):
+    elements = []
+    for i in range(n_cells):
+        K1 = torch.tensor(1.0 if i % 2 else -1.0)
+        elements += [
+            TorchDrift(f"d{i}", torch.tensor(1.0)),
+            TorchQuad(f"q{i}", torch.tensor(0.1), K1),
+        ]
+    return TorchAccelerator(elements)
+
+
+def make_beams(n_beams):
+    torch.manual_seed(0)
+    A = torch.eye(6) + 0.1 * torch.randn(n_beams, 6, 6)
+    return A @ A.transpose(-1, -2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n-beams", type=int, nargs="+", default=[10, 100, 1000, 10000]
+    )
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    accel = make_lattice()
+    with torch.no_grad():
+        M = accel.calculate_transport()
+
+        print(f"{'n_beams':>8} {'loop (beams/s)':>16} {'batched (beams/s)':>18}")
+        for n_beams in args.n_beams:
+            R = make_beams(n_beams)
+
+            start = time.perf_counter()
+            for R_i in R:
+                accel.propagate_beam(M, R_i)
+            loop = n_beams / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            accel.propagate_beams(M, R, chunk_size=args.chunk_size)
+            batched = n_beams / (time.perf_counter() - start)
+
+            print(f"{n_beams:>8} {loop:>16.0f} {batched:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Latency and throughput of the hysteresis prediction server with concurrent clients,
+with and without micro-batching of NEXT queries.
+
+Usage, from the repository root or after `pip install -e .`:
+    python -m benchmarks.bench_server [--clients 1 8 32] [--requests 200]
+        [--batch-size 1] [--output server_results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import torch
+
+from hysteresis.server import HysteresisClient, HysteresisService, serve
+
+from benchmarks.run_benchmarks import get_metadata, make_model
+
+
+async def run_client(path, n_requests, batch_size, latencies):
+    client = await HysteresisClient.connect(path=path)
+    for _ in range(n_requests):
+        x = torch.rand(batch_size).double()
+        t0 = time.perf_counter()
+        await client.predict("q1", x)
+        latencies += [time.perf_counter() - t0]
+    await client.close()
+
+
+async def run_case(n_clients, n_requests, batch_size, batch_window):
+    service = HysteresisService(
+        {"q1": make_model(100, mesh_scale=0.5)}, batch_window=batch_window
+    )
+    latencies = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hysteresis.sock")
+        async with service:
+            server = await serve(service, path=path)
+            async with server:
+                start = time.perf_counter()
+                await asyncio.gather(
+                    *[
+                        run_client(path, n_requests, batch_size, latencies)
+                        for _ in range(n_clients)
+                    ]
+                )
+                elapsed = time.perf_counter() - start
+                stats = service.stats()["q1"]
+                server.close()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "n_clients": n_clients,
+        "batch_size": batch_size,
+        "batch_window": batch_window,
+        "throughput_per_s": len(latencies) / elapsed,
+        "p50_ms": 1e3 * quantiles[49],
+        "p95_ms": 1e3 * quantiles[94],
+        "p99_ms": 1e3 * quantiles[98],
+        "mean_requests_per_batch": stats["requests"] / stats["batches"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0.0, 5e-4])
+    parser.add_argument("--output", default="server_results.json")
+    args = parser.parse_args()
+
+    results = []
+    for n_clients in args.clients:
+        for window in args.windows:
+            result = asyncio.run(
+                run_case(n_clients, args.requests, args.batch_size, window)
+            )
+            results += [result]
+            print(
+                f"clients={n_clients:<4} window={window:<8.2g} "
+                f"{result['throughput_per_s']:>10.1f} req/s  "
+                f"p50={result['p50_ms']:.3f} ms  p99={result['p99_ms']:.3f} ms  "
+                f"{result['mean_requests_per_batch']:.1f} req/batch"
+            )
+
+    with open(args.output, "w") as f:
+        json.dump({"metadata": get_metadata("server"), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+"""
+Benchmark suite for the performance critical paths of the package: hysteresis state
+calculation, model fitting, normalization transforms, hybrid GP posteriors and
+accelerator transport. Every benchmark runs on synthetic data at several scales and
+results are written as JSON so that runs of different versions can be compared.
+
+Usage, from the repository root or after `pip install -e .`:
+    python -m benchmarks.run_benchmarks [--scale quick|full] [--output results.json]
+        [--filter get_states] [--compare baseline.json --threshold 1.2]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from copy import deepcopy
+from datetime import datetime, timezone
+
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.export import export_hysteresis, get_current_state
+from hysteresis.hybrid import ExactHybridGP
+from hysteresis.meshing import create_triangle_mesh
+from hysteresis.modes import NEXT, REGRESSION
+from hysteresis.pruning import prune_density
+from hysteresis.states import get_states, predict_batched_state
+from hysteresis.synthetic import make_model as make_synthetic_model
+from hysteresis.torch_accelerator.first_order import TorchDrift
+from hysteresis.torch_accelerator.hysteresis import (
+    HysteresisAccelerator,
+    HysteresisQuad,
+)
+from hysteresis.training import (
+    train_adaptive,
+    train_hysteresis,
+    train_multiresolution,
+)
+from hysteresis.transform import HysteresisTransform
+
+SCALES = {
+    "quick": {
+        "get_states": {"n_history": [100, 1000], "mesh_scale": [1.0, 0.5]},
+        "predict_batched_state": {"batch_size": [10, 1000], "mesh_scale": [1.0]},
+        "train_hysteresis": {"n_history": [50], "target_loss": [1e-3]},
+        "transform": {"n_history": [100, 1000], "polynomial_degree": [1, 3]},
+        "hybrid_posterior": {"n_train": [20, 100], "batch_size": [64]},
+        "accelerator_forward": {"n_magnets": [2, 8], "batch_size": [64]},
+        "next_forward": {"batch_size": [1, 64], "exported": [False, True]},
+        "pruned_regression": {"n_history": [1000], "max_mass": [0.0, 1e-3, 1e-2]},
+        "multiresolution_fit": {
+            "n_history": [500],
+            "mesh_scale": [0.2],
+            "target_loss": [0.1],
+            "multiresolution": [False, True],
+        },
+        "adaptive_fit": {
+            "n_history": [200],
+            "mesh_scale": [0.5],
+            "n_iterations": [0, 2],
+        },
+    },
+    "full": {
+        "get_states": {"n_history": [100, 1000, 10000], "mesh_scale": [1.0, 0.5, 0.2]},
+        "predict_batched_state": {
+            "batch_size": [10, 1000, 100000],
+            "mesh_scale": [1.0, 0.2],
+        },
+        "train_hysteresis": {"n_history": [50, 500], "target_loss": [1e-3, 1e-4]},
+        "transform": {"n_history": [100, 10000], "polynomial_degree": [1, 3, 5]},
+        "hybrid_posterior": {"n_train": [20, 100, 500], "batch_size": [64, 1024]},
+        "accelerator_forward": {"n_magnets": [2, 8, 32], "batch_size": [64, 1024]},
+        "next_forward": {"batch_size": [1, 64, 4096], "exported": [False, True]},
+        "pruned_regression": {
+            "n_history": [1000, 10000],
+            "max_mass": [0.0, 1e-3, 1e-2],
+        },
+        "multiresolution_fit": {
+            "n_history": [500, 2000],
+            "mesh_scale": [0.2, 0.1],
+            "target_loss": [0.1],
+            "multiresolution": [False, True],
+        },
+        "adaptive_fit": {
+            "n_history": [500],
+            "mesh_scale": [0.5, 0.2],
+            "n_iterations": [0, 3],
+        },
+    },
+}
+
+BENCHMARKS = {}
+# number of untimed calls before timing each benchmark, None for training
+# benchmarks that are timed with a single run
+WARMUP = {}
+
+
+def benchmark(name, warmup=1):
+    """
+    Register a benchmark. The decorated function is called with the parameters of
+    one case and returns a tuple of (callable to time, dict of extra metrics), the
+    extra metrics can be updated by the timed callable. `warmup` is the number of
+    untimed calls before timing, None for training benchmarks which are timed with
+    a single run without warm up.
+    """
+
+    def decorator(fn):
+        BENCHMARKS[name] = fn
+        WARMUP[name] = warmup
+        return fn
+
+    return decorator
+
+
+def make_model(n_history=0, mesh_scale=1.0, seed=0, **kwargs):
+    torch.manual_seed(seed)
+    H = BaseHysteresis(
+        trainable=False,
+        mesh_scale=mesh_scale,
+        fixed_domain=torch.tensor((0.0, 1.0)).double(),
+        **kwargs,
+    )
+    H.hysterion_density = torch.rand(H.n_mesh_points).double()
+    if n_history:
+        H.set_history(torch.rand(n_history).double())
+    return H
+
+
+@benchmark("get_states")
+def bench_get_states(n_history, mesh_scale):
+    torch.manual_seed(0)
+    mesh = torch.tensor(create_triangle_mesh(mesh_scale)).double()
+    h = torch.rand(n_history).double()
+    metrics = {"n_mesh_points": len(mesh)}
+    return lambda: get_states(h, mesh), metrics
+
+
+@benchmark("predict_batched_state")
+def bench_predict_batched_state(batch_size, mesh_scale):
+    H = make_model(100, mesh_scale)
+    h = torch.rand(batch_size).double()
+    current_state, current_field = H._get_current_state()
+    metrics = {"n_mesh_points": H.n_mesh_points}
+
+    def fn():
+        return predict_batched_state(
+            h,
+            H.mesh_points,
+            current_state=current_state,
+            current_field=current_field,
+            temp=H.temp,
+        )
+
+    return fn, metrics
+
+
+@benchmark("train_hysteresis", warmup=None)
+def bench_train_hysteresis(n_history, target_loss, max_steps=5000):
+    truth = make_model(mesh_scale=0.5)
+    h = torch.rand(n_history).double()
+    with truth.mode_scope(REGRESSION), torch.no_grad():
+        m = truth(h, return_real=True)
+
+    metrics = {}
+
+    def fn():
+        model = BaseHysteresis(h, m, mesh_scale=0.5, polynomial_fit_iterations=100)
+        loss = train_hysteresis(model, max_steps, lr=0.01, atol=target_loss)
+        metrics["n_steps"] = len(loss)
+        metrics["final_loss"] = float(torch.min(loss))
+        metrics["reached_target"] = bool(torch.min(loss) < target_loss)
+
+    return fn, metrics
+
+
+@benchmark("transform")
+def bench_transform(n_history, polynomial_degree):
+    torch.manual_seed(0)
+    h = torch.rand(n_history).double()
+    m = h ** 2 + 0.01 * torch.randn(n_history).double()
+
+    def fn():
+        return HysteresisTransform(
+            h, m, polynomial_degree=polynomial_degree, polynomial_fit_iterations=1000
+        )
+
+    return fn, {}
+
+
+@benchmark("hybrid_posterior")
+def bench_hybrid_posterior(n_train, batch_size):
+    H = make_model(mesh_scale=0.5)
+    train_x = torch.rand(n_train, 1).double()
+    train_y = torch.sin(6.0 * train_x).flatten()
+    model = ExactHybridGP(train_x, train_y, H)
+    model.next()
+    X = torch.rand(batch_size, 1, 1).double()
+
+    def fn():
+        with torch.no_grad():
+            posterior = model.posterior(X)
+            return posterior.mean, posterior.variance
+
+    return fn, {}
+
+
+@benchmark("accelerator_forward")
+def bench_accelerator_forward(n_magnets, batch_size):
+    H = make_model(mesh_scale=0.5)
+    H.scale = 10.0
+    H.slope = 20.0
+
+    elements = []
+    for i in range(n_magnets):
+        elements += [
+            HysteresisQuad(f"q{i}", torch.tensor(0.1), deepcopy(H)),
+            TorchDrift(f"d{i}", torch.tensor(1.0)),
+        ]
+    HA = HysteresisAccelerator(elements)
+    HA.set_histories(torch.rand(10, n_magnets).double())
+    HA.next()
+
+    R = torch.eye(6)
+    X = torch.rand(batch_size, n_magnets).double()
+    metrics = {"batch_size": batch_size}
+
+    def fn():
+        with torch.no_grad():
+            return HA(R, X=X)
+
+    return fn, metrics
+
+
+# scripted modules are optimized by the profiling executor during the first calls
+@benchmark("next_forward", warmup=3)
+def bench_next_forward(batch_size, exported):
+    H = make_model(100, mesh_scale=0.5)
+    X = torch.rand(batch_size).double()
+
+    if exported:
+        module = export_hysteresis(H, NEXT)
+        state, field = get_current_state(H)
+        return lambda: module(X, state, field), {}
+
+    def fn():
+        with H.mode_scope(NEXT), torch.no_grad():
+            return H(X, return_real=True)
+
+    return fn, {}
+
+
+@benchmark("pruned_regression")
+def bench_pruned_regression(n_history, max_mass):
+    H = make_synthetic_model("bimodal", mesh_scale=0.5)
+    pruned, report = prune_density(H, max_mass)
+    x = torch.rand(n_history).double()
+    with H.mode_scope(REGRESSION), pruned.mode_scope(REGRESSION), torch.no_grad():
+        error = torch.max(torch.abs(pruned(x) - H(x)))
+    metrics = dict(report, max_error=float(error))
+
+    def fn():
+        with pruned.mode_scope(REGRESSION), torch.no_grad():
+            return pruned(x)
+
+    return fn, metrics
+
+
+@benchmark("multiresolution_fit", warmup=None)
+def bench_multiresolution_fit(
+    n_history, mesh_scale, target_loss, multiresolution, max_steps=2000
+):
+    truth = make_synthetic_model("bimodal", mesh_scale=0.5)
+    h = torch.rand(n_history).double()
+    with truth.mode_scope(REGRESSION), torch.no_grad():
+        m = truth(h, return_real=True)
+
+    metrics = {}
+
+    def fn():
+        model = BaseHysteresis(
+            h, m, mesh_scale=mesh_scale, polynomial_fit_iterations=100
+        )
+        if multiresolution:
+            losses = train_multiresolution(
+                model, max_steps, lr=0.01, atol=target_loss
+            )
+        else:
+            losses = [train_hysteresis(model, max_steps, lr=0.01, atol=target_loss)]
+        metrics["n_mesh_points"] = model.n_mesh_points
+        metrics["n_steps"] = [len(loss) for loss in losses]
+        metrics["final_loss"] = float(torch.min(losses[-1]))
+        metrics["reached_target"] = bool(torch.min(losses[-1]) < target_loss)
+
+    return fn, metrics
+
+
+@benchmark("adaptive_fit", warmup=None)
+def bench_adaptive_fit(n_history, mesh_scale, n_iterations, n_steps=1000):
+    truth = make_synthetic_model("gaussian", mesh_scale=0.2, width=0.05)
+    h, test_h = torch.rand(n_history).double(), torch.rand(n_history).double()
+    with truth.mode_scope(REGRESSION), torch.no_grad():
+        m, test_m = truth(h, return_real=True), truth(test_h, return_real=True)
+
+    metrics = {}
+
+    def fn():
+        model = BaseHysteresis(
+            h,
+            m,
+            mesh_scale=mesh_scale,
+            polynomial_fit_iterations=100,
+            fixed_domain=torch.tensor((0.0, 1.0)).double(),
+        )
+        losses = train_adaptive(model, n_steps, n_iterations, lr=0.01)
+        with model.mode_scope(REGRESSION), torch.no_grad():
+            test_error = torch.mean((model(test_h, return_real=True) - test_m) ** 2)
+
+        # cost of a single state update on the final mesh
+        state, field = model._get_current_state()
+        update = time_case(
+            lambda: predict_batched_state(
+                torch.rand(1).double(), model.mesh_points, state, field
+            ),
+            10,
+        )
+        metrics["n_mesh_points"] = model.n_mesh_points
+        metrics["final_loss"] = float(torch.min(losses[-1]))
+        metrics["test_error"] = float(test_error)
+        metrics["state_update_s"] = update["median_s"]
+
+    return fn, metrics
+
+
+def time_case(fn, repeat, min_time=0.2, warmup=1):
+    """
+    time `fn` at least `repeat` times and until `min_time` has elapsed, after
+    `warmup` untimed calls
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        fn()
+        times += [time.perf_counter() - t0]
+        if len(times) >= 100 * repeat:
+            break
+    return {
+        "n_calls": len(times),
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.mean(times),
+    }
+
+
+def cases(params):
+    """cartesian product of parameter lists"""
+    result = [{}]
+    for key, values in params.items():
+        result = [dict(case, **{key: value}) for case in result for value in values]
+    return result
+
+
+def get_metadata(scale):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "date": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "scale": scale,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "platform": platform.platform(),
+    }
+
+
+def case_key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """print cases slower than the baseline by more than `threshold`"""
+    baseline = {case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+        ratio = result["median_s"] / old["median_s"]
+        if ratio > threshold:
+            regressions += [(result, ratio)]
+            print(
+                f"REGRESSION {result['name']} {result['params']}: "
+                f"{old['median_s']:.4g}s -> {result['median_s']:.4g}s ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--filter", nargs="+", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=None,
+        help="untimed calls before timing, overrides the benchmark defaults",
+    )
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    results = []
+    for name, params in SCALES[args.scale].items():
+        if args.filter and name not in args.filter:
+            continue
+        for case in cases(params):
+            fn, metrics = BENCHMARKS[name](**case)
+            if WARMUP[name] is None:
+                # a single training run is already long enough to time, warming
+                # up would double the cost without making the result more stable
+                timing = time_case(fn, 1, min_time=0.0, warmup=0)
+            else:
+                warmup = WARMUP[name] if args.warmup is None else args.warmup
+                timing = time_case(fn, args.repeat, warmup=warmup)
+            result = {"name": name, "params": case, **timing, "metrics": metrics}
+            results += [result]
+            print(f"{name:<24} {str(case):<48} {timing['median_s']:.4g} s")
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {"metadata": get_metadata(args.scale), "results": results}, f, indent=2
+        )
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
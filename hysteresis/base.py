@@ -5,9 +5,11 @@ from gpytorch import Module
 from torch import Tensor
 from typing import Dict, Callable
 from .meshing import create_triangle_mesh
-from .states import get_states, predict_batched_state
+from .history import HistoryStore
+from .states import get_states, iter_states, predict_batched_state, reduce_states
 from .transform import HysteresisTransform
 from .modes import ModeModule, REGRESSION, NEXT, FUTURE, FITTING, CURRENT
+from .profiling import profiled, mode_stage
 
 import logging
 
@@ -19,6 +21,11 @@ class HysteresisError(Exception):
 
 
 class BaseHysteresis(Module, ModeModule):
+    # class defaults so that models saved by earlier versions still load
+    history_store = None
+    _states_cache = None
+    _final_state_cache = None
+
     def __init__(
         self,
         train_h: Tensor = None,
@@ -27,6 +34,7 @@ class BaseHysteresis(Module, ModeModule):
         tkwargs: Dict = None,
         mesh_scale: float = 1.0,
         mesh_density_function: Callable = None,
+        mesh_points: Tensor = None,
         polynomial_degree: int = 1,
         polynomial_fit_iterations: int = 3000,
         temp: float = 1e-2,
@@ -84,6 +92,10 @@ class BaseHysteresis(Module, ModeModule):
             Density function for meshing on the Preisach plane. Default produces a
             fine mesh along \alpha=\beta line and corse mesh away from that line.
 
+        mesh_points : Tensor, optional
+            Explicit mesh points on the Preisach plane, overrides `mesh_scale` and
+            `mesh_density_function`.
+
         polynomial_degree : int, 1
             Polynomial degree for fitting training data, used for transformer object
             to resolve small hysteresis errors.
@@ -119,9 +131,12 @@ class BaseHysteresis(Module, ModeModule):
         # generate mesh grid on 2D normalized domain [[0,1],[0,1]]
         self.temp = temp
         self.mesh_scale = mesh_scale
-        self.mesh_points = torch.tensor(
-            create_triangle_mesh(mesh_scale, mesh_density_function), **self.tkwargs
-        )
+        if isinstance(mesh_points, Tensor):
+            self.mesh_points = mesh_points.to(**self.tkwargs)
+        else:
+            self.mesh_points = torch.tensor(
+                create_triangle_mesh(mesh_scale, mesh_density_function), **self.tkwargs
+            )
 
         # initialize trainable parameters
         density = torch.zeros(len(self.mesh_points))
@@ -162,6 +177,7 @@ class BaseHysteresis(Module, ModeModule):
         self.polynomial_degree = polynomial_degree
         self.polynomial_fit_iterations = polynomial_fit_iterations
         self._fixed_domain = fixed_domain
+        self.history_store = None
 
         # if data is specified then set the history data and train transformer
         if isinstance(train_h, Tensor):
@@ -171,17 +187,14 @@ class BaseHysteresis(Module, ModeModule):
         if not self.trainable or self.fixed_scaling:
             self.transformer.freeze()
 
+    @profiled("BaseHysteresis.set_history")
     def set_history(self, history_h, history_m=None):
-        """set historical state values and recalculate hysterion states"""
-        if self.trainable and not self.fixed_scaling:
-            self.transformer = HysteresisTransform(
-                history_h,
-                history_m,
-                self._fixed_domain,
-                self.polynomial_degree,
-                self.polynomial_fit_iterations,
-            )
-
+        """
+        set historical state values, hysterion states are calculated when first
+        needed. If `history_m` is not specified it is predicted from the current
+        model parameters.
+        """
+        self._update_transformer(history_h, history_m)
 
         if isinstance(history_h, Tensor):
             history_h = history_h.to(**self.tkwargs)
@@ -200,32 +213,201 @@ class BaseHysteresis(Module, ModeModule):
         self._update_h_history_buffer(_history_h)
 
         if not isinstance(_history_m, Tensor):
-            old_mode = self.mode
-            self.regression()
-            _history_m = self.forward(history_h.detach())
-            self.mode = old_mode
+            _history_m = self._predict_history_m(_history_h)
         self.register_buffer("_history_m", _history_m.detach())
 
-    def _update_h_history_buffer(self, norm_history_h):
+    def _update_transformer(self, history_h, history_m=None):
+        """refit the normalization transform to data if the model is trainable"""
+        if self.trainable and not self.fixed_scaling:
+            self.transformer = HysteresisTransform(
+                history_h,
+                history_m,
+                self._fixed_domain,
+                self.polynomial_degree,
+                self.polynomial_fit_iterations,
+            )
+
+    def _predict_history_m(self, norm_h):
+        """
+        predict normalized outputs of the history with the current parameters,
+        streaming states to avoid holding the full state matrix. The final state
+        is kept for predictions from the end of the history.
+        """
+        with torch.no_grad():
+            _history_m, final_state = reduce_states(
+                norm_h.detach(),
+                self.mesh_points,
+                self._predict_normalized_magnetization,
+                tkwargs=self.tkwargs,
+                temp=self.temp,
+            )
+        self._final_state_cache = final_state
+        return _history_m
+
+    def _update_h_history_buffer(self, norm_history_h, states=None, final_state=None):
         self.register_buffer("_history_h", norm_history_h.detach())
 
-        # recalculate states
-        _states = get_states(self._history_h, self.mesh_points, temp=self.temp)
-        self.register_buffer("_states", _states)
+        # states are recalculated lazily, see `_states` and `_final_state`
+        self._buffers.pop("_states", None)
+        self._states_cache = states
+        self._final_state_cache = final_state
+
+    @property
+    def _states(self):
+        """
+        Hysteresis states for each field in the history, calculated on first
+        access. States are not a buffer, so they are not included in the
+        state_dict or pickles of the model.
+        """
+        if self._states_cache is None:
+            # models pickled by earlier versions stored states as a buffer
+            if "_states" in self._buffers:
+                return self._buffers["_states"]
+            self._states_cache = get_states(
+                self._history_h, self.mesh_points, temp=self.temp
+            )
+        return self._states_cache
+
+    @property
+    def _final_state(self):
+        """
+        Hysteresis state after the last field in the history. Calculated without
+        materializing the full state matrix unless it is already available.
+        """
+        if self._states_cache is not None or "_states" in self._buffers:
+            return self._states[-1]
+        if self._final_state_cache is None:
+            self._final_state_cache = self._calculate_final_state(self._history_h)
+        return self._final_state_cache
+
+    def _calculate_final_state(self, norm_h, current_state=None, current_field=None):
+        """calculate the state after applying normalized fields one chunk at a time"""
+        state = current_state
+        for states in iter_states(
+            norm_h.detach(),
+            self.mesh_points,
+            current_state=current_state,
+            current_field=current_field,
+            tkwargs=self.tkwargs,
+            temp=self.temp,
+        ):
+            state = states[-1]
+        return state
+
+    def __getstate__(self):
+        # do not pickle calculated states, they are recalculated when needed
+        state = self.__dict__.copy()
+        state["_states_cache"] = None
+        state["_final_state_cache"] = None
+        return state
 
+    def attach_history_store(self, store: HistoryStore):
+        """
+        Keep the history of applied fields in a persistent HistoryStore instead of
+        in memory. Afterwards only the current state and field are held by the
+        model, so memory use does not grow with the number of applied fields.
+
+        If the store already contains fields the current state is restored from
+        its latest checkpoint, replaying at most `store.checkpoint_interval`
+        fields. Otherwise, any history held by the model is moved to the store.
+        Note that the store does not record measured outputs, so FITTING mode
+        is not available afterwards.
+        """
+        if len(store):
+            checkpoint = store.load_checkpoint()
+            if checkpoint is None:
+                state, field, index = None, None, 0
+            else:
+                state = checkpoint["state"].to(**self.tkwargs)
+                field = checkpoint["field"].to(**self.tkwargs)
+                index = checkpoint["index"]
+
+            remaining = store.fields[index:]
+            if len(remaining):
+                norm_h = self.transformer.transform(remaining.to(**self.tkwargs))[0]
+                state = self._calculate_final_state(norm_h, state, field)
+                field = norm_h[-1].detach()
+
+        elif hasattr(self, "_history_h"):
+            state, field = self._final_state, self._history_h[-1]
+            store.append(self.history_h)
+            store.save_checkpoint(state, field)
+
+        else:
+            state, field = None, None
+
+        self.reset_history()
+
+        self.history_store = store
+        self._update_current_state(state, field)
+
+    def _update_current_state(self, state, field):
+        if state is not None:
+            state, field = state.detach(), field.detach()
+        self.register_buffer("_current_state", state)
+        self.register_buffer("_current_field", field)
+
+    def _get_current_state(self):
+        """get the current hysteresis state and normalized field, if available"""
+        if hasattr(self, "_history_h"):
+            return self._final_state, self._history_h[-1]
+        return (
+            getattr(self, "_current_state", None),
+            getattr(self, "_current_field", None),
+        )
+
+    @profiled("BaseHysteresis.apply_field")
     def apply_field(self, h):
         """
         updates magnet history and recalculates
         """
         h = torch.atleast_1d(h)
         self._check_inside_valid_domain(h)
+        current_state, current_field = self._get_current_state()
+
+        # models without a history (history store or compact checkpoint) only
+        # track the current state
+        if not hasattr(self, "_history_h") and (
+            current_state is not None or self.history_store is not None
+        ):
+            norm_h = self.transformer.transform(h.to(**self.tkwargs))[0].detach()
+            states = get_states(
+                norm_h,
+                self.mesh_points,
+                current_state=current_state,
+                current_field=current_field,
+                tkwargs=self.tkwargs,
+                temp=self.temp,
+            )
+            self._update_current_state(states[-1], norm_h[-1])
+            if self.history_store is not None:
+                self.history_store.append(h, states[-1], norm_h[-1])
+            return
+
         if hasattr(self, "_history_h"):
-            _history_h = torch.cat(
-                (self._history_h, self.transformer.transform(h)[0])
-            ).detach()
+            norm_h = self.transformer.transform(h)[0].to(**self.tkwargs).detach()
+            _history_h = torch.cat((self._history_h, norm_h)).detach()
+
+            # extend calculated states instead of recalculating them
+            states, final_state = self._states_cache, self._final_state_cache
+            if states is not None:
+                new_states = get_states(
+                    norm_h,
+                    self.mesh_points,
+                    current_state=states[-1],
+                    current_field=self._history_h[-1],
+                    tkwargs=self.tkwargs,
+                    temp=self.temp,
+                )
+                states = torch.cat((states, new_states))
+            elif final_state is not None:
+                final_state = self._calculate_final_state(
+                    norm_h, final_state, self._history_h[-1]
+                )
         else:
             _history_h = self.transformer.transform(h)[0].to(**self.tkwargs)
-        self._update_h_history_buffer(_history_h)
+            states, final_state = None, None
+        self._update_h_history_buffer(_history_h, states, final_state)
 
     def _predict_normalized_magnetization(self, states, h):
         m = torch.sum(self.hysterion_density * states, dim=-1) / torch.sum(
@@ -239,6 +421,7 @@ class BaseHysteresis(Module, ModeModule):
             1
         ].to(**self.tkwargs)
 
+    @profiled(mode_stage("BaseHysteresis.forward"))
     def forward(self, x: Tensor = None, return_real=False):
         if isinstance(x, Tensor):
             x = x.to(**self.tkwargs)
@@ -248,15 +431,14 @@ class BaseHysteresis(Module, ModeModule):
                 raise HysteresisError("must specify field when not using CURRENT mode")
 
         # get current state/field if available
-        if hasattr(self, "history_h"):
-            current_fld = self._history_h[-1]
-            current_state = self._states[-1]
-        else:
-            current_state = None
-            current_fld = None
+        current_state, current_fld = self._get_current_state()
 
         if self.mode == FITTING:
-            if not hasattr(self, "history_h"):
+            if self.history_store is not None:
+                raise HysteresisError(
+                    "FITTING mode is not available with a history store"
+                )
+            if not hasattr(self, "_history_h"):
                 raise RuntimeError(
                     "no training.py data supplied to do fitting! Try "
                     "using FUTURE mode instead OR set data using "
@@ -282,7 +464,7 @@ class BaseHysteresis(Module, ModeModule):
             )
 
         elif self.mode == CURRENT:
-            if not hasattr(self, "history_h"):
+            if current_state is None:
                 raise HysteresisError(
                     "no history data to determine current state! Try "
                     "using FUTURE mode instead OR set data using "
@@ -330,6 +512,59 @@ class BaseHysteresis(Module, ModeModule):
             result = self._predict_normalized_magnetization(states, norm_h)
         return result
 
+    def predict_streaming(self, x: Tensor, chunk_size: int = 1024, return_real=False):
+        """
+        Predict the output for a long sequence of applied fields in REGRESSION or
+        FUTURE mode, holding at most `chunk_size` hysteresis states in memory at a
+        time (see hysteresis.states.reduce_states). Memory use is independent of
+        the sequence length when gradients are disabled.
+
+        Parameters
+        ----------
+        x : Tensor
+            1D sequence of applied fields.
+
+        chunk_size : int, 1024
+            Number of hysteresis states calculated at once.
+
+        return_real : bool, False
+            Return values in real units, otherwise normalized units.
+
+        Returns
+        -------
+        m : Tensor
+            Predicted output for each applied field.
+        """
+        if self.mode not in [REGRESSION, FUTURE]:
+            raise HysteresisError(
+                "streaming prediction requires REGRESSION or FUTURE mode"
+            )
+
+        x = x.to(**self.tkwargs)
+        if len(x.shape) != 1:
+            raise ValueError("input must be 1D for streaming prediction")
+        self._check_inside_valid_domain(x)
+
+        current_state, current_field = None, None
+        if self.mode == FUTURE:
+            current_state, current_field = self._get_current_state()
+
+        norm_h, _ = self.transformer.transform(x)
+        result, _ = reduce_states(
+            norm_h,
+            self.mesh_points,
+            self._predict_normalized_magnetization,
+            current_state=current_state,
+            current_field=current_field,
+            tkwargs=self.tkwargs,
+            temp=self.temp,
+            chunk_size=chunk_size,
+        )
+
+        if return_real:
+            result = self.transformer.untransform(norm_h, result)[1]
+        return result
+
     def _check_inside_valid_domain(self, values):
         machine_error = 1e-4
         if torch.any(values < self.valid_domain[0] - machine_error) or torch.any(
@@ -341,8 +576,12 @@ class BaseHysteresis(Module, ModeModule):
             )
 
     def reset_history(self):
-        del self._history_h
-        del self._history_m
+        for name in ["_history_h", "_history_m", "_current_state", "_current_field"]:
+            if name in self._buffers:
+                delattr(self, name)
+        self._buffers.pop("_states", None)
+        self._states_cache = None
+        self._final_state_cache = None
 
     @property
     def trainable(self):
@@ -370,6 +609,8 @@ class BaseHysteresis(Module, ModeModule):
 
     @property
     def history_h(self):
+        if self.history_store is not None:
+            return self.history_store.fields.to(**self.tkwargs)
         return self.transformer.untransform(self._history_h)[0].detach()
 
     @property
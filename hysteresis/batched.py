@@ -0,0 +1,170 @@
+from typing import Dict, List
+
+import torch
+from torch import Tensor
+
+from hysteresis.base import BaseHysteresis, HysteresisError
+from hysteresis.states import predict_batched_state
+
+
+def can_stack(hysteresis_models: List[BaseHysteresis]) -> bool:
+    """
+    Check if a list of hysteresis models can be evaluated in a single batched
+    pass, which requires a shared mesh, temperature and polynomial degree.
+    """
+    ref = hysteresis_models[0]
+    for model in hysteresis_models[1:]:
+        if model.temp != ref.temp:
+            return False
+        if model.mesh_points.shape != ref.mesh_points.shape or not torch.equal(
+            model.mesh_points, ref.mesh_points
+        ):
+            return False
+        if (
+            model.transformer._poly_fit.weights.shape
+            != ref.transformer._poly_fit.weights.shape
+        ):
+            return False
+    return True
+
+
+def stack_hysteresis_models(hysteresis_models: List[BaseHysteresis]) -> Dict:
+    """
+    Collect the parameters, normalization transforms and current states of M
+    hysteresis models that share a mesh into stacked tensors with a leading
+    dimension of size M.
+
+    Parameters
+    ----------
+    hysteresis_models : List[BaseHysteresis]
+        Hysteresis models to stack, see `can_stack` for requirements.
+
+    Returns
+    -------
+    stack : Dict
+        Dictionary of stacked tensors used by `batched_next_magnetization`.
+    """
+    if not can_stack(hysteresis_models):
+        raise HysteresisError(
+            "hysteresis models must share a mesh, temperature and polynomial "
+            "degree to be stacked"
+        )
+
+    ref = hysteresis_models[0]
+    tkwargs = ref.tkwargs
+    n_mesh_points = ref.n_mesh_points
+
+    keys = [
+        "density",
+        "scale",
+        "offset",
+        "slope",
+        "domain",
+        "mrange",
+        "poly_weights",
+        "poly_bias",
+        "scale_m",
+        "offset_m",
+        "current_state",
+        "current_field",
+    ]
+    values = {key: [] for key in keys}
+
+    for model in hysteresis_models:
+        transformer = model.transformer
+        values["density"] += [model.hysterion_density]
+        values["scale"] += [model.scale.reshape(1)]
+        values["offset"] += [model.offset.reshape(1)]
+        values["slope"] += [model.slope.reshape(1)]
+        values["domain"] += [transformer.domain.to(**tkwargs)]
+        values["mrange"] += [transformer.mrange.to(**tkwargs)]
+        values["poly_weights"] += [transformer._poly_fit.weights.to(**tkwargs)]
+        values["poly_bias"] += [transformer._poly_fit.bias.to(**tkwargs)]
+        values["scale_m"] += [torch.as_tensor(transformer.scale_m).reshape(1)]
+        values["offset_m"] += [torch.as_tensor(transformer.offset_m).reshape(1)]
+
+        current_state, current_field = model._get_current_state()
+        if current_state is not None:
+            values["current_state"] += [current_state]
+            values["current_field"] += [current_field.reshape(1)]
+        else:
+            values["current_state"] += [-torch.ones(n_mesh_points, **tkwargs)]
+            values["current_field"] += [torch.zeros(1, **tkwargs)]
+
+    stack = {
+        key: torch.stack([ele.to(**tkwargs) for ele in val])
+        for key, val in values.items()
+    }
+    stack["mesh_points"] = ref.mesh_points
+    stack["temp"] = ref.temp
+    stack["poly_powers"] = ref.transformer._poly_fit.p.to(**tkwargs)
+    return stack
+
+
+def batched_next_magnetization(stack: Dict, X: Tensor, return_real=True):
+    """
+    Predict the magnetization of M stacked hysteresis models in NEXT mode.
+    Equivalent to calling each model in NEXT mode on `X[..., i]` but the
+    hysteresis states of all models are calculated in one tensor operation.
+
+    Parameters
+    ----------
+    stack : Dict
+        Stacked model tensors returned by `stack_hysteresis_models`.
+
+    X : Tensor
+        Applied fields with shape `batch_shape x M`.
+
+    return_real : bool, True
+        Return magnetization in real units, otherwise normalized units.
+
+    Returns
+    -------
+    m : Tensor
+        Predicted magnetization with shape `batch_shape x M`.
+    """
+    X = X.to(stack["domain"])
+    domain = stack["domain"]
+    n_models = domain.shape[0]
+    if X.shape[-1] != n_models:
+        raise ValueError(f"last dimension of X must be {n_models}")
+
+    machine_error = 1e-4
+    if torch.any(X < domain[:, 0] - machine_error) or torch.any(
+        X > domain[:, 1] + machine_error
+    ):
+        raise HysteresisError(
+            f"Argument values are not inside valid domain for stacked models! "
+            f"Offending tensor is {X}"
+        )
+
+    norm_h = (X - domain[:, 0]) / (domain[:, 1] - domain[:, 0])
+
+    # states have shape batch_shape x M x n_mesh_points
+    states = predict_batched_state(
+        norm_h,
+        stack["mesh_points"],
+        current_state=stack["current_state"],
+        current_field=stack["current_field"],
+        temp=stack["temp"],
+    )
+
+    density = stack["density"]
+    m = torch.sum(density * states, dim=-1) / torch.sum(density, dim=-1)
+    m = (
+        stack["scale"].squeeze(-1) * m
+        + stack["offset"].squeeze(-1)
+        + norm_h * stack["slope"].squeeze(-1)
+    )
+
+    if not return_real:
+        return m
+
+    # untransform with polynomial fit of each model
+    hp = norm_h.unsqueeze(-1).pow(stack["poly_powers"])
+    poly = torch.sum(stack["poly_weights"] * hp, dim=-1) + stack[
+        "poly_bias"
+    ].squeeze(-1)
+    mrange = stack["mrange"]
+    fit = poly * (mrange[:, 1] - mrange[:, 0]) + mrange[:, 0]
+    return stack["scale_m"].squeeze(-1) * m + fit + stack["offset_m"].squeeze(-1)
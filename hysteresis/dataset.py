@@ -0,0 +1,128 @@
+from typing import List, Tuple
+
+import torch
+from torch import Tensor
+
+from hysteresis.io import load_measurement
+
+
+class MultiRunDataset:
+    def __init__(
+        self,
+        runs: List[Tuple[Tensor, Tensor]],
+        initial_states: List[Tensor] = None,
+        initial_fields: List[Tensor] = None,
+    ):
+        """
+        Collection of independent measurement runs of one magnet. Each run is a
+        sequence of applied fields and measured outputs that starts from its own
+        initial hysteresis state, so runs must not be concatenated into a single
+        history.
+
+        Parameters
+        ----------
+        runs : List[Tuple[Tensor, Tensor]]
+            Applied fields and measured outputs of each run, in real units.
+
+        initial_states : List[Tensor], optional
+            Hysteresis state at the start of each run, entries of None (or no list)
+            start the run at negative saturation.
+
+        initial_fields : List[Tensor], optional
+            Applied field (real units) corresponding to each initial state.
+        """
+        self.runs = []
+        for h, m in runs:
+            h = torch.as_tensor(h).double().flatten()
+            m = torch.as_tensor(m).double().flatten()
+            if h.shape != m.shape:
+                raise ValueError("fields and outputs of each run must match shape")
+            if len(h) == 0:
+                raise ValueError("runs must not be empty")
+            self.runs += [(h, m)]
+
+        self.initial_states = initial_states or [None] * len(self.runs)
+        self.initial_fields = initial_fields or [None] * len(self.runs)
+        if len(self.initial_states) != len(self.runs) or len(
+            self.initial_fields
+        ) != len(self.runs):
+            raise ValueError("must specify one initial state and field per run")
+        for state, field in zip(self.initial_states, self.initial_fields):
+            if (state is None) != (field is None):
+                raise ValueError("need to specify initial field if state is given")
+
+    @classmethod
+    def from_files(cls, paths: List[str], current="MAIN", field="BL", cache_dir=None):
+        """
+        Create a dataset from SLAC measurement files, one run per file, see
+        hysteresis.io.load_measurement.
+        """
+        return cls(
+            [load_measurement(path, current, field, cache_dir) for path in paths]
+        )
+
+    def __len__(self):
+        return len(self.runs)
+
+    def __getitem__(self, idx):
+        return self.runs[idx]
+
+    @property
+    def lengths(self) -> Tensor:
+        return torch.tensor([len(h) for h, _ in self.runs])
+
+    @property
+    def h(self) -> Tensor:
+        """concatenated applied fields of all runs"""
+        return torch.cat([h for h, _ in self.runs])
+
+    @property
+    def m(self) -> Tensor:
+        """concatenated measured outputs of all runs"""
+        return torch.cat([m for _, m in self.runs])
+
+    def padded(self) -> Tuple[Tensor, Tensor, Tensor]:
+        """
+        Stack runs into padded tensors, each run is padded with its last value.
+
+        Returns
+        -------
+        h : Tensor
+            Applied fields with shape `n_runs x max_length`.
+        m : Tensor
+            Measured outputs with shape `n_runs x max_length`.
+        lengths : Tensor
+            Number of valid entries in each run.
+        """
+        lengths = self.lengths
+        max_length = int(torch.max(lengths))
+        h, m = [], []
+        for run_h, run_m in self.runs:
+            n_pad = max_length - len(run_h)
+            h += [torch.cat((run_h, run_h[-1].repeat(n_pad)))]
+            m += [torch.cat((run_m, run_m[-1].repeat(n_pad)))]
+        return torch.stack(h), torch.stack(m), lengths
+
+    def mask(self) -> Tensor:
+        """boolean mask of valid entries in padded tensors"""
+        lengths = self.lengths
+        return torch.arange(int(torch.max(lengths))) < lengths.unsqueeze(-1)
+
+    def get_initial_states(self, model):
+        """
+        Initial states and normalized fields of each run for a model, returns
+        (None, None) if every run starts at negative saturation.
+        """
+        if all(state is None for state in self.initial_states):
+            return None, None
+
+        states, fields = [], []
+        for state, field in zip(self.initial_states, self.initial_fields):
+            if state is None:
+                states += [-torch.ones(model.n_mesh_points, **model.tkwargs)]
+                fields += [torch.zeros(1, **model.tkwargs)]
+            else:
+                states += [state.to(**model.tkwargs)]
+                field = torch.as_tensor(field).to(**model.tkwargs).reshape(1)
+                fields += [model.transformer.transform(field)[0]]
+        return torch.stack(states), torch.cat(fields)
@@ -0,0 +1,186 @@
+from typing import List, Tuple
+
+import torch
+from torch import Tensor
+from torch.nn import Module
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.modes import FUTURE, NEXT
+from hysteresis.states import sweep_left, sweep_up
+
+
+class _FrozenHysteresis(Module):
+    def __init__(self, model: BaseHysteresis):
+        """
+        Parameters, mesh and transform of a fitted model as plain buffers, with
+        constraint transforms already applied.
+        """
+        super(_FrozenHysteresis, self).__init__()
+        transformer = model.transformer
+        poly = transformer._poly_fit
+        with torch.no_grad():
+            density = model.hysterion_density.detach().to(**model.tkwargs)
+            tensors = {
+                "mesh_points": model.mesh_points,
+                "density": density / torch.sum(density),
+                "scale": model.scale,
+                "offset": model.offset,
+                "slope": model.slope,
+                "domain": transformer.domain,
+                "mrange": transformer.mrange,
+                "offset_m": transformer.offset_m,
+                "scale_m": transformer.scale_m,
+                "poly_weights": poly.weights,
+                "poly_bias": poly.bias,
+                "poly_powers": poly.p,
+            }
+            for name, value in tensors.items():
+                value = torch.as_tensor(value).detach().clone()
+                self.register_buffer(name, value.to(**model.tkwargs))
+
+        self.temp = float(model.temp)
+        self.machine_error = 1e-4
+
+    def _check_domain(self, x: Tensor):
+        if bool(torch.any(x < self.domain[0] - self.machine_error)) or bool(
+            torch.any(x > self.domain[1] + self.machine_error)
+        ):
+            raise RuntimeError("argument values are not inside valid domain")
+
+    def _norm_h(self, h: Tensor) -> Tensor:
+        return (h - self.domain[0]) / (self.domain[1] - self.domain[0])
+
+    def _magnetization(self, states: Tensor, hn: Tensor, return_real: bool) -> Tensor:
+        m = torch.sum(self.density * states, dim=-1)
+        mn = self.scale * m.reshape(hn.shape) + self.offset + hn * self.slope
+        if not return_real:
+            return mn
+
+        powers = hn.unsqueeze(-1).pow(self.poly_powers)
+        fit = self.poly_bias + torch.matmul(powers, self.poly_weights)
+        fit = fit * (self.mrange[1] - self.mrange[0]) + self.mrange[0]
+        return self.scale_m * mn + fit.reshape(hn.shape) + self.offset_m
+
+
+class NextHysteresis(_FrozenHysteresis):
+    def forward(
+        self, x: Tensor, state: Tensor, field: Tensor, return_real: bool = True
+    ) -> Tensor:
+        """
+        Batched prediction of the output for each candidate field in `x` applied to
+        the given state, equivalent to BaseHysteresis in NEXT mode.
+
+        Parameters
+        ----------
+        x : Tensor
+            Candidate fields in real units with arbitrary shape.
+        state : Tensor
+            Current hysteresis state with shape `n_mesh_points`.
+        field : Tensor
+            Field corresponding to the current state in real units.
+        return_real : bool, True
+            Return values in real units, otherwise normalized units.
+        """
+        self._check_domain(x)
+        hn = self._norm_h(x).unsqueeze(-1)
+        fieldn = self._norm_h(field)
+        states = torch.where(
+            hn >= fieldn,
+            sweep_up(hn, self.mesh_points, state, self.temp),
+            sweep_left(hn, self.mesh_points, state, self.temp),
+        )
+        return self._magnetization(states, hn.squeeze(-1), return_real)
+
+
+class FutureHysteresis(_FrozenHysteresis):
+    def forward(
+        self, x: Tensor, state: Tensor, field: Tensor, return_real: bool = True
+    ) -> Tuple[Tensor, Tensor]:
+        """
+        Prediction of the output for a 1D sequence of fields applied one after
+        another to the given state, equivalent to BaseHysteresis in FUTURE mode.
+
+        Parameters
+        ----------
+        x : Tensor
+            Sequence of fields in real units.
+        state : Tensor
+            Current hysteresis state with shape `n_mesh_points`.
+        field : Tensor
+            Field corresponding to the current state in real units.
+        return_real : bool, True
+            Return values in real units, otherwise normalized units.
+
+        Returns
+        -------
+        m : Tensor
+            Predicted output for each field.
+        final_state : Tensor
+            Hysteresis state after the last field, the new current field is x[-1].
+        """
+        if x.dim() != 1:
+            raise RuntimeError("input must be 1D for FUTURE mode")
+        self._check_domain(x)
+        hn = self._norm_h(x)
+        fieldn = self._norm_h(field).reshape(())
+
+        states: List[Tensor] = []
+        for i in range(hn.shape[0]):
+            if bool(hn[i] > fieldn):
+                state = sweep_up(hn[i], self.mesh_points, state, self.temp)
+            elif bool(hn[i] < fieldn):
+                state = sweep_left(hn[i], self.mesh_points, state, self.temp)
+            fieldn = hn[i]
+            states.append(state)
+
+        return self._magnetization(torch.stack(states), hn, return_real), state
+
+
+EXPORTED_MODES = {NEXT: NextHysteresis, FUTURE: FutureHysteresis}
+
+
+def export_hysteresis(model: BaseHysteresis, mode: int = NEXT, freeze: bool = True):
+    """
+    Export a fitted model as a TorchScript module for a prediction mode. The
+    module does not depend on this package, it can be saved with torch.jit.save
+    and loaded with torch.jit.load in any process that has torch installed.
+
+    The hysteresis state is an explicit input of the exported module, see
+    `get_current_state`, so the calling process keeps track of applied fields.
+
+    Parameters
+    ----------
+    model : BaseHysteresis
+        Fitted model, its parameters and transform are copied.
+
+    mode : int, NEXT
+        Prediction mode, NEXT or FUTURE.
+
+    freeze : bool, True
+        Inline parameters as constants with torch.jit.freeze.
+
+    Returns
+    -------
+    module : torch.jit.ScriptModule
+        Scripted module, called with (x, state, field, return_real=True).
+    """
+    if mode not in EXPORTED_MODES:
+        raise ValueError("only NEXT and FUTURE modes can be exported")
+
+    module = torch.jit.script(EXPORTED_MODES[mode](model).eval())
+    if freeze:
+        module = torch.jit.freeze(module)
+    return module
+
+
+def get_current_state(model: BaseHysteresis) -> Tuple[Tensor, Tensor]:
+    """
+    Current hysteresis state of a model and the corresponding field in real units,
+    (negative saturation if no fields were applied) for use with exported modules.
+    """
+    state, field = model._get_current_state()
+    if state is None:
+        state = -torch.ones(model.n_mesh_points, **model.tkwargs)
+        field = torch.zeros(1, **model.tkwargs)
+    field = model.transformer.untransform(field.reshape(1))[0]
+    return state.detach(), field.detach().reshape(())
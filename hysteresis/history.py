@@ -0,0 +1,121 @@
+import os
+from typing import Dict
+
+import numpy as np
+import torch
+from torch import Tensor
+
+
+class HistoryStore:
+    FIELDS_FILE = "fields.bin"
+    CHECKPOINT_FILE = "checkpoint.pt"
+
+    def __init__(self, path: str, checkpoint_interval: int = 1000):
+        """
+        Persistent, append-only record of the fields applied to a hysteresis model.
+
+        Applied fields (in real units) are appended as raw float64 values to a
+        binary file that is read back through a memory map, so the history never
+        has to be held in memory. Every `checkpoint_interval` fields the hysteresis
+        state after the last field is written to a checkpoint file, which lets a
+        model resume after a restart by replaying at most `checkpoint_interval`
+        fields instead of the full history. See
+        BaseHysteresis.attach_history_store.
+
+        Parameters
+        ----------
+        path : str
+            Directory containing the store, created if it does not exist.
+
+        checkpoint_interval : int, 1000
+            Number of appended fields between state checkpoints.
+        """
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        os.makedirs(path, exist_ok=True)
+
+        self._fields_path = os.path.join(path, self.FIELDS_FILE)
+        self._checkpoint_path = os.path.join(path, self.CHECKPOINT_FILE)
+
+        # drop a partially written trailing value left by an interrupted append
+        itemsize = np.dtype(np.float64).itemsize
+        if os.path.exists(self._fields_path):
+            size = os.path.getsize(self._fields_path)
+            if size % itemsize:
+                with open(self._fields_path, "r+b") as f:
+                    f.truncate(size - size % itemsize)
+
+        self._file = open(self._fields_path, "ab")
+        self._length = os.path.getsize(self._fields_path) // itemsize
+
+        checkpoint = self.load_checkpoint()
+        self.checkpoint_index = checkpoint["index"] if checkpoint else 0
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def fields(self) -> Tensor:
+        """memory mapped view of all applied fields"""
+        if self._length == 0:
+            return torch.zeros(0, dtype=torch.double)
+        data = np.memmap(
+            self._fields_path, dtype=np.float64, mode="c", shape=(self._length,)
+        )
+        return torch.from_numpy(data)
+
+    def append(self, h: Tensor, state: Tensor = None, field: Tensor = None):
+        """
+        Append applied fields to the store. If `state` and `field` (the
+        hysteresis state and normalized field after the last applied field) are
+        given, a checkpoint is written once `checkpoint_interval` fields have been
+        appended since the last one.
+        """
+        h = torch.atleast_1d(h).detach().to(device="cpu", dtype=torch.double)
+        self._file.write(h.numpy().tobytes())
+        self._file.flush()
+        self._length += len(h)
+
+        if state is not None and (
+            self._length - self.checkpoint_index >= self.checkpoint_interval
+        ):
+            self.save_checkpoint(state, field)
+
+    def save_checkpoint(self, state: Tensor, field: Tensor):
+        """
+        Atomically write the hysteresis state and normalized field after the
+        last appended field.
+        """
+        checkpoint = {
+            "index": self._length,
+            "state": state.detach().cpu(),
+            "field": field.detach().cpu(),
+        }
+        tmp_path = self._checkpoint_path + ".tmp"
+        torch.save(checkpoint, tmp_path)
+        os.replace(tmp_path, self._checkpoint_path)
+        self.checkpoint_index = self._length
+
+    def load_checkpoint(self) -> Dict:
+        """
+        Load the latest checkpoint, returns None if there is no checkpoint or it
+        refers to fields that were not written to the store.
+        """
+        if not os.path.exists(self._checkpoint_path):
+            return None
+        checkpoint = torch.load(self._checkpoint_path)
+        if checkpoint["index"] > self._length:
+            return None
+        return checkpoint
+
+    def close(self):
+        self._file.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_file"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._file = open(self._fields_path, "ab")
@@ -1,13 +1,22 @@
 from typing import Any, Union, List
 
 import torch
-from botorch.models import SingleTaskGP
+from botorch.models import SingleTaskGP, KroneckerMultiTaskGP
 from botorch.models.transforms import Normalize, Standardize
 from botorch.posteriors import GPyTorchPosterior
+from gpytorch.distributions import MultitaskMultivariateNormal
 from gpytorch.models import GP
 from torch import Tensor
 
 from hysteresis.base import HysteresisError, BaseHysteresis
+from hysteresis.batched import (
+    can_stack,
+    stack_hysteresis_models,
+    batched_next_magnetization,
+)
+from hysteresis.kernels import AdditiveMaternKernel
+from hysteresis.parallel import set_histories
+from hysteresis.profiling import profiled
 from hysteresis.modes import ModeModule, FITTING, NEXT
 
 
@@ -19,6 +28,7 @@ class ExactHybridGP(ModeModule, GP):
         train_x: Tensor,
         train_y: Tensor,
         hysteresis_models: List[BaseHysteresis] or BaseHysteresis,
+        n_workers: int = 1,
         **kwargs
     ):
         """
@@ -51,6 +61,10 @@ class ExactHybridGP(ModeModule, GP):
             List of M independent hysteresis models to model each element exibiting
             hysteresis.
 
+        n_workers : int, 1
+            Number of threads used to set the training histories of the
+            hysteresis models concurrently, see hysteresis.parallel.map_models.
+
         kwargs
             Arguments passed to botorch SingleTaskGP object.
         """
@@ -60,10 +74,7 @@ class ExactHybridGP(ModeModule, GP):
         if train_x.shape[0] != train_y.shape[0]:
             raise ValueError("train_x and train_y must have the same number of samples")
 
-        if len(train_y.shape) != 1:
-            raise ValueError(
-                "multi output models are not supported, train_y must be a 1D tensor"
-            )
+        self._check_train_y(train_y)
 
         if not isinstance(hysteresis_models, list):
             self.hysteresis_models = torch.nn.ModuleList([hysteresis_models])
@@ -82,6 +93,7 @@ class ExactHybridGP(ModeModule, GP):
             )
 
         # set hysteresis model history data
+        self.n_workers = n_workers
         self._set_hysteresis_model_train_data(train_x)
 
         # set train inputs
@@ -90,22 +102,33 @@ class ExactHybridGP(ModeModule, GP):
         self.m_transform = Normalize(self.input_dim)
 
         # train outcome transform
-        self.outcome_transform = Standardize(1)
-        self.outcome_transform.train()
-        self.train_targets = self.outcome_transform(train_y.unsqueeze(1))[0].flatten()
-        self.outcome_transform.eval()
+        self._set_train_targets(train_y)
 
         # get magnetization from hysteresis models
         train_m = self.get_magnetization(train_x, mode=FITTING).detach()
 
-        self.gp = SingleTaskGP(train_m, train_y.unsqueeze(1), **kwargs)
+        self.gp = self._build_gp(train_m, train_y, **kwargs)
 
     def __call__(self, *inputs, **kwargs):
         return self.forward(*inputs, **kwargs)
 
+    def _check_train_y(self, train_y):
+        if len(train_y.shape) != 1:
+            raise ValueError(
+                "multi output models are not supported, train_y must be a 1D tensor"
+            )
+
+    def _set_train_targets(self, train_y):
+        self.outcome_transform = Standardize(1)
+        self.outcome_transform.train()
+        self.train_targets = self.outcome_transform(train_y.unsqueeze(1))[0].flatten()
+        self.outcome_transform.eval()
+
+    def _build_gp(self, train_m, train_y, **kwargs):
+        return SingleTaskGP(train_m, train_y.unsqueeze(1), **kwargs)
+
     def _set_hysteresis_model_train_data(self, train_h):
-        for idx, hyst_model in enumerate(self.hysteresis_models):
-            hyst_model.set_history(train_h[:, idx])
+        set_histories(list(self.hysteresis_models), train_h, n_workers=self.n_workers)
 
     def apply_fields(self, x: Tensor):
         for idx, hyst_model in enumerate(self.hysteresis_models):
@@ -114,20 +137,25 @@ class ExactHybridGP(ModeModule, GP):
     def get_magnetization(self, X, mode=None):
         train_m = []
         # set applied fields and calculate magnetization for training.py data
+        mode = mode or self.mode
         for idx, hyst_model in enumerate(self.hysteresis_models):
-            hyst_model.mode = mode or self.mode
+            # models stay in the mode, only walk them when it changes
+            if hyst_model.mode != mode:
+                hyst_model.mode = mode
             train_m += [hyst_model(X[..., idx], return_real=True)]
         return torch.cat([ele.unsqueeze(-1) for ele in train_m], dim=-1)
 
     def get_normalized_magnetization(self, X, mode=None):
-        m = self.get_magnetization(X, mode)
+        return self._normalize_magnetization(self.get_magnetization(X, mode))
 
+    def _normalize_magnetization(self, m):
         # check to see if a normalization model has been trained
         if not self.m_transform.equals(Normalize(self.input_dim)) or self.training:
             return self.m_transform(m)
         else:
             return m
 
+    @profiled("ExactHybridGP.posterior")
     def posterior(
         self, X: Tensor, observation_noise: Union[bool, Tensor] = False, **kwargs: Any
     ) -> GPyTorchPosterior:
@@ -157,3 +185,146 @@ class ExactHybridGP(ModeModule, GP):
             )
         else:
             return self.gp(train_m)
+
+
+class AdditiveHybridGP(ExactHybridGP):
+    def __init__(
+        self,
+        train_x: Tensor,
+        train_y: Tensor,
+        hysteresis_models: List[BaseHysteresis] or BaseHysteresis,
+        **kwargs
+    ):
+        """
+        High dimensional variant of ExactHybridGP for problems with tens to
+        hundreds of hysteretic inputs.
+
+        The GP uses an additive kernel over the normalized magnetization of each
+        input (see hysteresis.kernels.AdditiveMaternKernel), which scales to large
+        input dimensions where a full dimensional kernel cannot be learned from few
+        samples. If all hysteresis models share a mesh (for example when they are
+        copies of the same model) the NEXT mode magnetizations used by `posterior`
+        are calculated for all inputs in a single batched tensor operation.
+
+        Parameters
+        ----------
+        train_x : Tensor
+            Sequence of input training data, shape N x M.
+
+        train_y : Tensor
+            Sequence of output training data, shape (N,).
+
+        hysteresis_models: List[BaseHysteresis]
+            List of M independent hysteresis models.
+
+        kwargs
+            Arguments passed to botorch SingleTaskGP object. If `covar_module` is
+            not specified an additive kernel is used.
+        """
+        input_dim = train_x.shape[-1]
+        if "covar_module" not in kwargs:
+            kwargs["covar_module"] = AdditiveMaternKernel(input_dim)
+        super(AdditiveHybridGP, self).__init__(
+            train_x, train_y, hysteresis_models, **kwargs
+        )
+        self.batched = can_stack(list(self.hysteresis_models))
+
+    def get_magnetization(self, X, mode=None):
+        mode = mode or self.mode
+        if mode == NEXT and self.batched:
+            stack = stack_hysteresis_models(list(self.hysteresis_models))
+            return batched_next_magnetization(stack, X, return_real=True)
+        return super(AdditiveHybridGP, self).get_magnetization(X, mode)
+
+
+class MultiOutputHybridGP(ExactHybridGP):
+    def __init__(
+        self,
+        train_x: Tensor,
+        train_y: Tensor,
+        hysteresis_models: List[BaseHysteresis] or BaseHysteresis,
+        multitask: bool = False,
+        **kwargs
+    ):
+        """
+        Multi-output variant of ExactHybridGP. The hysteresis models are evaluated
+        once per call and the resulting magnetizations are shared by all outputs
+        of a batched multi-output GP, so the cost of the hysteresis calculation
+        does not grow with the number of objectives.
+
+        Parameters
+        ----------
+        train_x : Tensor
+            Sequence of input training data, shape N x M.
+
+        train_y : Tensor
+            Sequence of output training data, shape N x K where K is the number of
+            outputs.
+
+        hysteresis_models: List[BaseHysteresis]
+            List of M independent hysteresis models.
+
+        multitask : bool, False
+            If True a botorch KroneckerMultiTaskGP is used to model correlations
+            between outputs, otherwise the outputs are modeled by independent GPs
+            batched in a single botorch SingleTaskGP.
+
+        kwargs
+            Arguments passed to botorch GP object.
+        """
+        self.multitask = multitask
+        super(MultiOutputHybridGP, self).__init__(
+            train_x, train_y, hysteresis_models, **kwargs
+        )
+        self.num_outputs = train_y.shape[-1]
+
+    def _check_train_y(self, train_y):
+        if len(train_y.shape) != 2:
+            raise ValueError("train_y must be a 2D tensor of shape N x K")
+
+    def _set_train_targets(self, train_y):
+        self.outcome_transform = Standardize(train_y.shape[-1])
+        self.outcome_transform.train()
+        train_targets = self.outcome_transform(train_y)[0]
+        self.outcome_transform.eval()
+
+        # independent outputs are stored by botorch as a K x N batch
+        if self.multitask:
+            self.train_targets = train_targets
+        else:
+            self.train_targets = train_targets.transpose(-1, -2)
+
+    def _build_gp(self, train_m, train_y, **kwargs):
+        if self.multitask:
+            return KroneckerMultiTaskGP(train_m, train_y, **kwargs)
+        return SingleTaskGP(train_m, train_y, **kwargs)
+
+    def _expand_magnetization(self, train_m):
+        if self.multitask:
+            return train_m
+        return train_m.unsqueeze(-3).expand(
+            *train_m.shape[:-2], self.num_outputs, *train_m.shape[-2:]
+        )
+
+    def forward(
+        self, X, from_magnetization=False, return_real=False, return_likelihood=False
+    ):
+        # X are hysteresis model outputs in real units if from_magnetization
+        m = X if from_magnetization else self.get_magnetization(X)
+        train_m = self._expand_magnetization(self._normalize_magnetization(m))
+
+        if self.training:
+            self.gp.set_train_data(train_m, self.train_targets, strict=False)
+
+        output = self.gp(train_m)
+        if return_likelihood:
+            output = self.gp.likelihood(output)
+        if return_real:
+            # independent outputs are a batch of K distributions, combine them
+            # into a multitask distribution before undoing the standardization
+            if not self.multitask:
+                output = MultitaskMultivariateNormal.from_batch_mvn(output)
+            return self.outcome_transform.untransform_posterior(
+                GPyTorchPosterior(output)
+            )
+        return output
@@ -0,0 +1,184 @@
+from typing import Tuple
+
+import torch
+from torch import Tensor
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.profiling import profiled
+from hysteresis.states import get_current, get_states, sweep_left, sweep_up
+
+
+def _branch_output(model, hn, up, initial_states, real):
+    """output after applying fields `hn` along a sweep up or down from each state"""
+    states = torch.where(
+        up.unsqueeze(-1),
+        sweep_up(hn.unsqueeze(-1), model.mesh_points, initial_states, model.temp),
+        sweep_left(hn.unsqueeze(-1), model.mesh_points, initial_states, model.temp),
+    )
+    m = model._predict_normalized_magnetization(states, hn)
+    if real:
+        m = model.transformer.untransform(hn, m)[1]
+    return m
+
+
+def _check_monotonic(model, lo, hi, up, initial_states, real, n_points=33):
+    """raise if the output is not monotonic on a grid of each branch"""
+    weights = torch.linspace(0.0, 1.0, n_points).to(lo).unsqueeze(-1)
+    grid = lo + weights * (hi - lo)
+    m = _branch_output(model, grid, up, initial_states, real)
+    diff = torch.diff(m, dim=0)
+    tol = 1e-9 * (1.0 + torch.max(torch.abs(m), dim=0).values)
+    increasing = torch.all(diff >= -tol, dim=0)
+    decreasing = torch.all(diff <= tol, dim=0)
+    if not torch.all(increasing | decreasing):
+        raise ValueError(
+            "model output is not monotonic in the applied field, a negative "
+            "slope or output transform counteracts the hysteresis response"
+        )
+
+
+@profiled("solve_fields")
+def solve_fields(
+    model: BaseHysteresis,
+    target: Tensor,
+    tol: float = 1e-6,
+    max_iter: int = 60,
+    direction: str = None,
+    return_real: bool = True,
+) -> Tuple[Tensor, Tensor, Tensor]:
+    """
+    Find the fields that produce target outputs when applied to the current
+    state of a model (the inverse of NEXT mode), for many targets at once.
+
+    The output along a sweep up from the current field to the upper domain
+    limit, and along a sweep down to the lower domain limit, is monotonic
+    (increasing or decreasing), so each target is solved by a vectorized
+    bisection on both branches. A negative slope or output transform can
+    counteract the hysteresis response, a ValueError is raised when a branch is
+    not monotonic on a grid of fields. Targets that cannot be reached from the
+    current state (in the requested direction) are solved from the state after a
+    standardization cycle: apply the upper then the lower domain limit and sweep
+    up, or the reverse when approaching from above. All branches of all targets
+    are evaluated in one tensor pass per iteration.
+
+    Parameters
+    ----------
+    model : BaseHysteresis
+        Hysteresis model, its current state is not modified.
+
+    target : Tensor
+        Target outputs, in real units if `return_real` else normalized units.
+
+    tol : float, 1e-6
+        Tolerance of the solution in normalized field units.
+
+    max_iter : int, 60
+        Maximum number of bisection iterations.
+
+    direction : str, optional
+        Approach the target only by sweeping "up" or "down", as is common to
+        make setpoints reproducible. By default either direction is used.
+
+    return_real : bool, True
+        Targets and returned fields are in real units, otherwise normalized.
+
+    Returns
+    -------
+    h : Tensor
+        Field to apply for each target. When standardization is needed the field
+        is applied after the standardization cycle. Unreachable targets get the
+        domain limit that comes closest.
+    standardize : Tensor
+        Boolean mask of targets that need a standardization cycle first.
+    reachable : Tensor
+        Boolean mask of targets inside the output range of the model.
+    """
+    if direction not in [None, "up", "down"]:
+        raise ValueError("direction must be None, 'up' or 'down'")
+    standard_up = direction != "down"
+
+    target = torch.atleast_1d(torch.as_tensor(target)).to(**model.tkwargs).flatten()
+    n = len(target)
+
+    with torch.no_grad():
+        state, field = model._get_current_state()
+        state, field = get_current(state, field, model.n_mesh_points, **model.tkwargs)
+        field = torch.as_tensor(field).to(**model.tkwargs).reshape(())
+
+        # state after a standardization cycle from the current state
+        cycle = torch.tensor((1.0, 0.0) if standard_up else (0.0, 1.0))
+        cycle = cycle.to(**model.tkwargs)
+        standard_state = get_states(
+            cycle,
+            model.mesh_points,
+            current_state=state,
+            current_field=field,
+            tkwargs=model.tkwargs,
+            temp=model.temp,
+        )[-1]
+
+        # branches: sweep up and down from the current state, sweep after
+        # standardization
+        T = target.repeat(3)
+        up = torch.tensor([True, False, standard_up]).repeat_interleave(n)
+        initial_states = torch.cat(
+            (state.expand(2 * n, -1), standard_state.expand(n, -1))
+        )
+        zeros = torch.zeros(n, **model.tkwargs)
+        lo = torch.cat((field.expand(n), zeros, zeros))
+        hi = torch.cat((zeros + 1.0, field.expand(n), zeros + 1.0))
+
+        branches = torch.arange(3) * n
+        _check_monotonic(
+            model,
+            lo[branches],
+            hi[branches],
+            up[branches],
+            initial_states[branches],
+            return_real,
+        )
+
+        def residual(hn):
+            return _branch_output(model, hn, up, initial_states, return_real) - T
+
+        f_lo, f_hi = residual(lo), residual(hi)
+        bracketed = f_lo * f_hi <= 0.0
+        f_lo_initial, f_hi_initial = f_lo, f_hi
+
+        for _ in range(max_iter):
+            if torch.max(hi - lo) < tol:
+                break
+            mid = 0.5 * (lo + hi)
+            f_mid = residual(mid)
+            left = f_lo * f_mid <= 0.0
+            hi = torch.where(left, mid, hi)
+            lo = torch.where(left, lo, mid)
+            f_lo = torch.where(left, f_lo, f_mid)
+
+        h = (0.5 * (lo + hi)).reshape(3, n)
+        bracketed = bracketed.reshape(3, n)
+        if direction == "up":
+            bracketed[1] = False
+        elif direction == "down":
+            bracketed[0] = False
+
+        # prefer the branch reachable from the current state with the smallest step
+        step = torch.where(bracketed[:2], torch.abs(h[:2] - field), torch.inf)
+        best = torch.argmin(step, dim=0)
+        direct = torch.any(bracketed[:2], dim=0)
+        h_direct = torch.gather(h[:2], 0, best.unsqueeze(0)).squeeze(0)
+
+        # unreachable targets get the standardized endpoint closest to the target
+        endpoint_lo = torch.abs(f_lo_initial.reshape(3, n)[2])
+        endpoint_hi = torch.abs(f_hi_initial.reshape(3, n)[2])
+        h_closest = torch.where(endpoint_lo < endpoint_hi, zeros, zeros + 1.0)
+        h_standard = torch.where(bracketed[2], h[2], h_closest)
+
+        hn = torch.where(direct, h_direct, h_standard)
+        standardize = ~direct
+        reachable = direct | bracketed[2]
+
+        if return_real:
+            hn = model.transformer.untransform(hn)[0]
+
+    return hn, standardize, reachable
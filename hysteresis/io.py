@@ -0,0 +1,234 @@
+import hashlib
+import os
+import re
+from typing import Dict, Iterator, List, Tuple
+
+import torch
+from torch import Tensor
+
+# bump when parsed output changes to invalidate cached files
+PARSER_VERSION = 1
+
+
+def _parse_header(line: str) -> List[str]:
+    """
+    Get column names from a measurement table header, uncertainty columns are
+    labeled with "+/-" which is dropped, ie. "MAIN +/- sigma" -> ["MAIN", "sigma"]
+    """
+    return [name.replace("+/-", "") for name in line.split() if name != "+/-"]
+
+
+def _iter_rows(lines: Iterator[str], n_columns: int) -> Iterator[List[float]]:
+    """yield rows of floats until a line that is not a row of the table"""
+    for line in lines:
+        values = line.split()
+        if len(values) != n_columns:
+            return
+        try:
+            yield [float(ele) for ele in values]
+        except ValueError:
+            return
+
+
+def _rows_to_columns(columns: List[str], rows: List[List[float]]) -> Dict:
+    data = torch.tensor(rows, dtype=torch.double).reshape(-1, len(columns))
+    return {name: data[:, idx] for idx, name in enumerate(columns)}
+
+
+def read_strplt(path: str) -> Dict[str, Tensor]:
+    """
+    Parse a SLAC magnetic measurement plot file (strplt.*) which contains a single
+    table of measurements vs. time.
+
+    Parameters
+    ----------
+    path : str
+        Path to measurement file.
+
+    Returns
+    -------
+    data : Dict[str, Tensor]
+        Measured values for each column in the file, ie. "Time", "MAIN" (current),
+        "sigma", "BL" (integrated field), "sigBL", "TF", "sigTF", "THsp",
+        "sigThsp".
+    """
+    with open(path, "r") as f:
+        columns = _parse_header(f.readline())
+        rows = list(_iter_rows(f, len(columns)))
+    return _rows_to_columns(columns, rows)
+
+
+def read_strdat(path: str) -> Dict:
+    """
+    Parse a SLAC magnetic measurement data file (strdat.*) which contains a header
+    with run information, the requested test currents and a table of measurements.
+
+    Parameters
+    ----------
+    path : str
+        Path to measurement file.
+
+    Returns
+    -------
+    data : Dict
+        Dictionary containing "metadata" (header entries, ie. "Run Number"),
+        "test_currents" (Tensor of requested currents) and "measurements"
+        (Dict of Tensors for each column in the measurement table).
+    """
+    metadata = {}
+    test_currents = []
+    with open(path, "r") as f:
+        lines = iter(f)
+
+        # header entries up to the list of test currents
+        for line in lines:
+            if line.startswith("Test Currents"):
+                break
+            if ":" in line:
+                key, value = line.split(":", 1)
+                metadata[key.strip()] = value.strip()
+
+        # test currents until the first blank line
+        for line in lines:
+            if not line.strip():
+                break
+            test_currents += [float(ele) for ele in line.split()]
+
+        # measurement table, header is the first line with a "+/-" column
+        for line in lines:
+            if "+/-" in line:
+                columns = _parse_header(line)
+                break
+        else:
+            raise ValueError(f"no measurement table found in {path}")
+
+        # skip units and separator lines
+        for line in lines:
+            if line.strip() and set(line.strip()) <= set("-+ "):
+                break
+        rows = list(_iter_rows(lines, len(columns)))
+
+    return {
+        "metadata": metadata,
+        "test_currents": torch.tensor(test_currents, dtype=torch.double),
+        "measurements": _rows_to_columns(columns, rows),
+    }
+
+
+def read_index(path: str) -> List[Dict]:
+    """
+    Parse a SLAC magnetic measurement index file (index.dat) listing the
+    measurement runs of a magnet.
+
+    Returns
+    -------
+    runs : List[Dict]
+        Dictionary for each run with "date", "time", "run" (int), "device",
+        "operator" and "comment" entries.
+    """
+    keys = ["date", "time", "run", "device", "operator", "comment"]
+    runs = []
+    with open(path, "r") as f:
+        for line in f:
+            values = line.split(None, 5)
+            if len(values) < 5 or not re.match(r"\d+-\d+-\d+$", values[0]):
+                continue
+            run = dict(zip(keys, [ele.strip() for ele in values]))
+            run["run"] = int(run["run"])
+            run.setdefault("comment", "")
+            runs += [run]
+    return runs
+
+
+def file_hash(path: str) -> str:
+    """sha256 hash of the contents of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_cached(path: str, reader, cache_dir: str = None):
+    """
+    Parse a measurement file with `reader`, caching the parsed result in
+    `cache_dir` keyed by the hash of the file contents. Later calls for a file
+    with the same contents load the binary cache instead of re-parsing the text.
+    """
+    if cache_dir is None:
+        return reader(path)
+
+    key = f"{reader.__name__}-v{PARSER_VERSION}-{file_hash(path)}"
+    cache_path = os.path.join(cache_dir, key + ".pt")
+    if os.path.exists(cache_path):
+        return torch.load(cache_path)
+
+    data = reader(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + f".{os.getpid()}.tmp"
+    torch.save(data, tmp_path)
+    os.replace(tmp_path, cache_path)
+    return data
+
+
+def load_measurement(
+    path: str, current: str = "MAIN", field: str = "BL", cache_dir: str = None
+) -> Tuple[Tensor, Tensor]:
+    """
+    Load applied currents and measured fields from a SLAC measurement file
+    (strplt.* or strdat.*), ready for BaseHysteresis.set_history.
+
+    Parameters
+    ----------
+    path : str
+        Path to measurement file.
+
+    current : str, "MAIN"
+        Column name of the applied current.
+
+    field : str, "BL"
+        Column name of the measured field.
+
+    cache_dir : str, optional
+        Directory used to cache parsed files, see `read_cached`.
+
+    Returns
+    -------
+    h : Tensor
+        Applied currents.
+    m : Tensor
+        Measured fields.
+    """
+    if os.path.basename(path).startswith("strdat"):
+        data = read_cached(path, read_strdat, cache_dir)["measurements"]
+    else:
+        data = read_cached(path, read_strplt, cache_dir)
+    return data[current], data[field]
+
+
+def load_runs(
+    data_dir: str,
+    runs: List[int],
+    prefix: str = "strplt",
+    current: str = "MAIN",
+    field: str = "BL",
+    cache_dir: str = None,
+) -> Tuple[Tensor, Tensor]:
+    """
+    Load and concatenate the measurements of several runs in order, ie. the files
+    `<data_dir>/<prefix>.ru<run>`, see `load_measurement`.
+
+    Returns
+    -------
+    h : Tensor
+        Applied currents of all runs.
+    m : Tensor
+        Measured fields of all runs.
+    """
+    h, m = [], []
+    for run in runs:
+        path = os.path.join(data_dir, f"{prefix}.ru{run}")
+        run_h, run_m = load_measurement(path, current, field, cache_dir)
+        h += [run_h]
+        m += [run_m]
+    return torch.cat(h), torch.cat(m)
@@ -0,0 +1,105 @@
+import math
+
+import torch
+from gpytorch.constraints import Positive
+from gpytorch.kernels import Kernel
+from gpytorch.priors import GammaPrior
+
+
+class AdditiveMaternKernel(Kernel):
+    has_lengthscale = False
+
+    def __init__(self, input_dim: int, **kwargs):
+        """
+        Additive Matern 5/2 kernel, k(x, x') = sum_i s_i k_i(x_i, x'_i), where each
+        one dimensional kernel k_i has an independent lengthscale and
+        outputscale. All dimensions are evaluated in a single tensor operation,
+        so the cost scales linearly with the input dimension and, unlike a full
+        dimensional kernel, the number of samples needed to learn it does not
+        grow exponentially.
+
+        Parameters
+        ----------
+        input_dim : int
+            Number of input dimensions.
+
+        kwargs
+            Arguments passed to gpytorch Kernel object.
+        """
+        super(AdditiveMaternKernel, self).__init__(**kwargs)
+        self.input_dim = input_dim
+
+        param_shape = (*self.batch_shape, input_dim)
+        self.register_parameter(
+            "raw_lengthscale", torch.nn.Parameter(torch.zeros(param_shape))
+        )
+        self.register_parameter(
+            "raw_outputscale", torch.nn.Parameter(torch.zeros(param_shape))
+        )
+        self.register_constraint("raw_lengthscale", Positive())
+        self.register_constraint("raw_outputscale", Positive())
+        self.register_prior(
+            "lengthscale_prior",
+            GammaPrior(3.0, 6.0),
+            lambda m: m.lengthscale,
+            lambda m, v: m._set_lengthscale(v),
+        )
+        self.register_prior(
+            "outputscale_prior",
+            GammaPrior(2.0, 0.15 * input_dim),
+            lambda m: m.outputscale,
+            lambda m, v: m._set_outputscale(v),
+        )
+
+    @property
+    def lengthscale(self):
+        return self.raw_lengthscale_constraint.transform(self.raw_lengthscale)
+
+    @lengthscale.setter
+    def lengthscale(self, value):
+        self._set_lengthscale(value)
+
+    def _set_lengthscale(self, value):
+        value = torch.as_tensor(value).to(self.raw_lengthscale)
+        self.initialize(
+            raw_lengthscale=self.raw_lengthscale_constraint.inverse_transform(value)
+        )
+
+    @property
+    def outputscale(self):
+        return self.raw_outputscale_constraint.transform(self.raw_outputscale)
+
+    @outputscale.setter
+    def outputscale(self, value):
+        self._set_outputscale(value)
+
+    def _set_outputscale(self, value):
+        value = torch.as_tensor(value).to(self.raw_outputscale)
+        self.initialize(
+            raw_outputscale=self.raw_outputscale_constraint.inverse_transform(value)
+        )
+
+    def forward(self, x1, x2, diag=False, last_dim_is_batch=False, **params):
+        if last_dim_is_batch:
+            raise RuntimeError(
+                "AdditiveMaternKernel does not accept the last_dim_is_batch argument."
+            )
+
+        lengthscale = self.lengthscale.unsqueeze(-2)
+        outputscale = self.outputscale.unsqueeze(-2)
+        if diag:
+            # k_i(x, x) = 1 for every dimension
+            return torch.sum(outputscale, dim=-1).expand(*x1.shape[:-1])
+
+        # distances in each dimension, shape batch_shape x n x m x d
+        x1_ = (x1 / lengthscale).unsqueeze(-2)
+        x2_ = (x2 / lengthscale).unsqueeze(-3)
+        distance = torch.abs(x1_ - x2_)
+
+        exp_component = torch.exp(-math.sqrt(5) * distance)
+        constant_component = (
+            1.0 + math.sqrt(5) * distance + (5.0 / 3.0) * distance ** 2
+        )
+        return torch.sum(
+            outputscale.unsqueeze(-2) * constant_component * exp_component, dim=-1
+        )
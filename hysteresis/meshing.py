@@ -1,6 +1,9 @@
 import pygmsh
 import numpy as np
 import matplotlib.pyplot as plt
+import torch
+
+from hysteresis.profiling import profiled
 
 
 def constant_mesh_size(x, y, mesh_scale):
@@ -15,6 +18,7 @@ def exponential_mesh(x, y, mesh_scale, min_density=0.001, ls=0.05):
     return mesh_scale * (1.0 - np.exp(-np.abs(x - y) / ls)) + min_density
 
 
+@profiled("create_triangle_mesh")
 def create_triangle_mesh(mesh_scale, mesh_density_function=None):
     mesh_density_function = mesh_density_function or default_mesh_size
     with pygmsh.geo.Geometry() as geom:
@@ -37,6 +41,100 @@ def create_triangle_mesh(mesh_scale, mesh_density_function=None):
     return mesh.points[:, :-1]
 
 
+def mesh_point_areas(points, n_neighbors=3):
+    """
+    Approximate area of the Preisach plane represented by each mesh point, from
+    the mean distance to its nearest neighbors. Hysterion densities are weights
+    per mesh point, dividing by the area gives a density per unit area.
+    """
+    distances = torch.cdist(points, points)
+    n_neighbors = min(n_neighbors, len(points) - 1)
+    distances = torch.topk(distances, n_neighbors + 1, dim=-1, largest=False)[0]
+    return torch.mean(distances[:, 1:], dim=-1) ** 2
+
+
+def interpolate_density(points, values, new_points, n_neighbors=4, power=2.0):
+    """
+    Interpolate values defined on mesh points onto new mesh points with inverse
+    distance weighting of the nearest neighbors, ie. to transfer a hysterion
+    density between meshes of different resolution. Values at coinciding points
+    are copied.
+    """
+    distances = torch.cdist(new_points, points)
+    distances, idx = torch.topk(
+        distances, min(n_neighbors, len(points)), dim=-1, largest=False
+    )
+    weights = 1.0 / torch.clamp(distances ** power, min=1e-12)
+    return torch.sum(weights * values[idx], dim=-1) / torch.sum(weights, dim=-1)
+
+
+def adaptive_mesh_size(
+    points,
+    density,
+    target_error=None,
+    max_change=2.0,
+    min_size=0.005,
+    max_size=0.2,
+    n_neighbors=6,
+):
+    """
+    Mesh size function for create_triangle_mesh that adapts a mesh to a fitted
+    hysterion density. The local interpolation error at each point is estimated
+    as the gradient of the density per unit area times the local mesh spacing.
+    The spacing is reduced where the error is above `target_error` and increased
+    where it is below, by at most a factor of `max_change`, so that the error is
+    spread evenly over the Preisach plane.
+
+    Parameters
+    ----------
+    points : Tensor
+        Current mesh points.
+    density : Tensor
+        Fitted hysterion density at each mesh point.
+    target_error : float, optional
+        Target local error relative to the maximum density, defaults to the mean
+        estimated error.
+    max_change : float, 2.0
+        Maximum factor by which the spacing is changed.
+    min_size, max_size : float
+        Limits of the mesh size.
+    n_neighbors : int, 6
+        Number of neighbors used to estimate gradients.
+
+    Returns
+    -------
+    mesh_size : Callable
+        Mesh density function, mesh sizes are multiplied by `mesh_scale`.
+    """
+    points = points.detach()
+    areas = mesh_point_areas(points)
+    spacing = torch.sqrt(areas)
+    rho = density.detach() / areas
+    rho = rho / torch.max(rho)
+
+    distances = torch.cdist(points, points)
+    n_neighbors = min(n_neighbors, len(points) - 1)
+    distances, idx = torch.topk(distances, n_neighbors + 1, dim=-1, largest=False)
+    gradient = torch.abs(rho[idx[:, 1:]] - rho.unsqueeze(-1)) / distances[:, 1:]
+    error = torch.max(gradient, dim=-1)[0] * spacing
+
+    if target_error is None:
+        target_error = float(torch.mean(error))
+    # points without error are coarsened
+    change = torch.where(
+        error > 0.0, target_error / error, torch.full_like(error, max_change)
+    )
+    change = torch.clamp(change, 1.0 / max_change, max_change)
+    sizes = torch.clamp(spacing * change, min_size, max_size).numpy()
+    coords = points.numpy()
+
+    def mesh_size(x, y, mesh_scale):
+        nearest = np.argmin((coords[:, 0] - x) ** 2 + (coords[:, 1] - y) ** 2)
+        return mesh_scale * sizes[nearest]
+
+    return mesh_size
+
+
 if __name__ == "__main__":
     t = np.linspace(0, 0.5)
     x = 0.5 - t
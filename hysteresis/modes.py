@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+
 from torch.nn import Module
 
 FITTING = 0
@@ -6,9 +8,28 @@ NEXT = 2
 FUTURE = 3
 CURRENT = 4
 
+MODE_NAMES = {
+    FITTING: "FITTING",
+    REGRESSION: "REGRESSION",
+    NEXT: "NEXT",
+    FUTURE: "FUTURE",
+    CURRENT: "CURRENT",
+}
+
+# replaced whenever the mode of any ModeModule changes, see ModeModule.mode_scope
+_mode_token = object()
+
+
+def _modes_changed():
+    global _mode_token
+    _mode_token = object()
+
 
 class ModeModule(Module):
     _mode = FITTING
+    # mode and token at which this module and all ModeModule children were last
+    # found in the same mode
+    _scoped_mode = None
 
     @property
     def mode(self):
@@ -18,6 +39,7 @@ class ModeModule(Module):
     def mode(self, value):
         assert value in [REGRESSION, NEXT, FUTURE, FITTING, CURRENT]
         self._mode = value
+        _modes_changed()
 
         # if mode is FITTING set module to training.py
         if value == FITTING:
@@ -29,6 +51,50 @@ class ModeModule(Module):
             if isinstance(ele, ModeModule):
                 ele.mode = value
 
+    @contextmanager
+    def mode_scope(self, value):
+        """
+        Context manager that temporarily sets the prediction mode of this module
+        and its ModeModule children, restoring the previous modes on exit.
+
+        Unlike the `mode` setter, training flags are left untouched (no calls to
+        train()/eval()) and only modules whose mode differs from `value` are
+        modified and restored. Children are not visited again while no mode
+        changed since this module and its children were last found in `value`,
+        making it cheap to use in hot paths.
+
+        Example
+        -------
+        >>> with model.mode_scope(NEXT):
+        ...     m = model(x)
+        """
+        assert value in [REGRESSION, NEXT, FUTURE, FITTING, CURRENT]
+        changed = []
+        scoped = self._scoped_mode
+        if scoped is None or scoped[0] != value or scoped[1] is not _mode_token:
+            self._scope_mode(value, changed)
+            if changed:
+                _modes_changed()
+            self._scoped_mode = (value, _mode_token)
+        try:
+            yield self
+        finally:
+            for ele, old_mode in reversed(changed):
+                ele._mode = old_mode
+            if changed:
+                _modes_changed()
+
+    def _scope_mode(self, value, changed):
+        if self._mode != value:
+            changed += [(self, self._mode)]
+            self._mode = value
+
+        # children can be in a different mode than this module
+        for ele in self.children():
+            if isinstance(ele, ModeModule):
+                ele._scope_mode(value, changed)
+        return changed
+
     def fitting(self):
         self.mode = FITTING
 
@@ -0,0 +1,218 @@
+import torch
+from torch import Tensor
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.states import get_states
+
+
+class OnlineHysteresis:
+    def __init__(
+        self,
+        model: BaseHysteresis,
+        prior_std: float = 0.1,
+        noise_std: float = 0.01,
+        process_std: float = 0.0,
+        max_step: float = 1.0,
+    ):
+        """
+        Online (extended Kalman filter) updates of a hysteresis model
+        from streaming measurements, without refitting the transform or retraining.
+
+        For fixed hysteresis states the normalized model output is linear in the
+        weights w = scale * density / sum(density), the offset and the slope:
+        m = w . s + offset + slope * h. Weights are estimated as w = exp(u) so
+        that they stay positive, with an extended Kalman filter on u, the offset
+        and the slope. Each measurement updates these parameters with the state
+        row of the new field in O(n_mesh_points^2), independent of the history
+        length. Parameters are written back to the model after every update.
+
+        The model tracks the applied fields like `apply_field`, measured outputs
+        are appended to its history when the history outputs are available.
+        Histories are appended to buffers that grow by doubling their capacity,
+        the model history is a view of these buffers, so the cost of an update
+        does not grow with the history length. Attach a HistoryStore to the
+        model to keep memory use bounded as well.
+
+        Parameters
+        ----------
+        model : BaseHysteresis
+            Model to update, its transform is kept fixed.
+
+        prior_std : float, 0.1
+            Prior standard deviation of the log weights, offset and slope. Large
+            values let the first updates overshoot.
+
+        noise_std : float, 0.01
+            Measurement noise standard deviation in normalized units.
+
+        process_std : float, 0.0
+            Random walk standard deviation of the parameters per measurement, so
+            that the model can track slowly drifting magnets.
+
+        max_step : float, 1.0
+            Maximum change of the log weights per measurement.
+        """
+        self.model = model
+        self.noise_std = noise_std
+        self.process_std = process_std
+        self.max_step = max_step
+
+        with torch.no_grad():
+            density = model.hysterion_density.detach()
+            self.theta = torch.cat(
+                (
+                    torch.log(model.scale.detach() * density / torch.sum(density)),
+                    model.offset.detach().reshape(1),
+                    model.slope.detach().reshape(1),
+                )
+            ).to(**model.tkwargs)
+        self.covariance = prior_std ** 2 * torch.eye(len(self.theta), **model.tkwargs)
+
+        # growable history buffers, see `_record`
+        self._h_buffer = None
+        self._m_buffer = None
+        self._length = 0
+
+        # keep only the current state so that updates do not extend the full
+        # state matrix of the history
+        if hasattr(model, "_history_h"):
+            state, _ = model._get_current_state()
+            model._update_h_history_buffer(model._history_h, final_state=state)
+
+    def update(self, h: Tensor, m: Tensor) -> Tensor:
+        """
+        Apply measured fields to the model and update its parameters with the
+        measured outputs, one measurement at a time.
+
+        Parameters
+        ----------
+        h : Tensor
+            Applied fields in real units.
+
+        m : Tensor
+            Measured outputs in real units.
+
+        Returns
+        -------
+        prediction : Tensor
+            Predicted output for each measurement before its update, in real units.
+        """
+        model = self.model
+        h = torch.atleast_1d(torch.as_tensor(h)).to(**model.tkwargs).flatten()
+        m = torch.atleast_1d(torch.as_tensor(m)).to(**model.tkwargs).flatten()
+        if h.shape != m.shape:
+            raise ValueError("fields and outputs must match shape")
+        model._check_inside_valid_domain(h)
+        if not len(h):
+            return m
+
+        n = model.n_mesh_points
+        predictions = []
+        with torch.no_grad():
+            norm_h, norm_m = model.transformer.transform(h, m)
+            state, field = model._get_current_state()
+            for hn, mn in zip(norm_h, norm_m):
+                state = get_states(
+                    hn.reshape(1),
+                    model.mesh_points,
+                    current_state=state,
+                    current_field=field,
+                    tkwargs=model.tkwargs,
+                    temp=model.temp,
+                )[-1]
+                field = hn
+                weighted_state = torch.exp(self.theta[:n]) * state
+                prediction = (
+                    torch.sum(weighted_state) + self.theta[n] + self.theta[n + 1] * hn
+                )
+
+                # extended Kalman update, the jacobian of the prediction with
+                # respect to log weights is the weighted state
+                jacobian = torch.cat(
+                    (weighted_state, torch.ones(1).to(hn), hn.reshape(1))
+                )
+                P = self.covariance
+                if self.process_std > 0.0:
+                    P = P + self.process_std ** 2 * torch.eye(len(P)).to(P)
+                PJ = P @ jacobian
+                gain = PJ / (self.noise_std ** 2 + torch.dot(jacobian, PJ))
+                step = gain * (mn - prediction)
+
+                # limit the relative change of the weights, the linearization
+                # only holds for small steps of the log weights
+                largest = torch.max(torch.abs(step[:n]))
+                if largest > self.max_step:
+                    step = step * self.max_step / largest
+                self.theta = self.theta + step
+                self.covariance = P - torch.outer(gain, PJ)
+                predictions += [prediction]
+
+            self._record(h, norm_h, norm_m, state)
+            self._write_parameters()
+            predictions = torch.stack(predictions)
+            return model.transformer.untransform(norm_h, predictions)[1]
+
+    def _record(self, h, norm_h, norm_m, state):
+        """record measured fields and outputs in the model, ending in `state`"""
+        model = self.model
+        if hasattr(model, "_history_h"):
+            self._sync_buffers()
+            n = self._length + len(norm_h)
+            self._h_buffer = _reserve(self._h_buffer, n)
+            self._h_buffer[self._length : n] = norm_h
+            if self._m_buffer is not None:
+                self._m_buffer = _reserve(self._m_buffer, n)
+                self._m_buffer[self._length : n] = norm_m
+                model.register_buffer("_history_m", self._m_buffer[:n])
+            self._length = n
+            model._update_h_history_buffer(self._h_buffer[:n], final_state=state)
+        else:
+            model._update_current_state(state, norm_h[-1])
+            if model.history_store is not None:
+                model.history_store.append(h, state, norm_h[-1])
+
+    def _sync_buffers(self):
+        """copy the model history into new buffers if it was replaced"""
+        model = self.model
+        history_h = model._history_h
+        history_m = getattr(model, "_history_m", None)
+        if (
+            self._h_buffer is not None
+            and len(history_h) == self._length
+            and history_h.data_ptr() == self._h_buffer.data_ptr()
+            and (
+                history_m.data_ptr() == self._m_buffer.data_ptr()
+                if self._m_buffer is not None
+                else history_m is None or len(history_m) != len(history_h)
+            )
+        ):
+            return
+
+        self._length = len(history_h)
+        self._h_buffer = history_h.clone()
+        if history_m is not None and len(history_m) == len(history_h):
+            self._m_buffer = history_m.clone()
+        else:
+            self._m_buffer = None
+
+    def _write_parameters(self):
+        """set the model parameters from the estimated parameters"""
+        model = self.model
+        n = model.n_mesh_points
+        weights = torch.exp(self.theta[:n])
+        eps = 1e-4
+        model.hysterion_density = torch.clamp(
+            weights / torch.max(weights), eps, 1.0 - eps
+        )
+        model.scale = torch.clamp(torch.sum(weights), eps, 2000.0 - eps)
+        model.offset = torch.clamp(self.theta[n], -2000.0 + eps, 2000.0 - eps)
+        model.slope = torch.clamp(self.theta[n + 1], -2000.0 + eps, 2000.0 - eps)
+
+
+def _reserve(buffer: Tensor, n: int) -> Tensor:
+    """return `buffer` or a copy with at least twice its capacity that can hold n"""
+    if len(buffer) >= n:
+        return buffer
+    result = buffer.new_empty(max(n, 2 * len(buffer)))
+    result[: len(buffer)] = buffer
+    return result
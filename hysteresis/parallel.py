@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, List
+
+import torch
+from torch import Tensor
+
+from hysteresis.base import BaseHysteresis
+
+
+@contextmanager
+def torch_threads(n_threads: int = None):
+    """
+    Temporarily limit the number of threads torch uses for intra-op parallelism.
+    Note that this setting is process wide, it applies to every worker thread.
+    """
+    if n_threads is None:
+        yield
+        return
+
+    old_n_threads = torch.get_num_threads()
+    torch.set_num_threads(n_threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(old_n_threads)
+
+
+def map_models(
+    fn: Callable,
+    models: List[BaseHysteresis],
+    args: List,
+    n_workers: int = None,
+    threads_per_worker: int = 1,
+):
+    """
+    Call `fn(model, arg)` for each independent model concurrently using a thread
+    pool. Most of the cost of state calculations is python dispatch overhead that
+    releases the GIL inside torch kernels, so threads give a speedup without
+    copying models between processes.
+
+    Each call only modifies its own model and results are returned in the order
+    of `models`, so the result is identical to a serial loop.
+
+    Parameters
+    ----------
+    fn : Callable
+        Function called with a model and its argument.
+
+    models : List[BaseHysteresis]
+        Independent models, each model must only appear once.
+
+    args : List
+        Arguments passed to `fn`, one per model.
+
+    n_workers : int, optional
+        Number of worker threads, defaults to the number of cpu cores. A value of
+        1 runs the calls serially in the calling thread.
+
+    threads_per_worker : int, 1
+        Number of torch intra-op threads while the pool is running, None leaves
+        the torch setting unchanged.
+
+    Returns
+    -------
+    results : List
+        Return values of `fn`, in the order of `models`.
+    """
+    if len(set(id(model) for model in models)) != len(models):
+        raise ValueError("models must be unique to be updated concurrently")
+
+    n_workers = n_workers or os.cpu_count()
+    if n_workers == 1 or len(models) <= 1:
+        return [fn(model, arg) for model, arg in zip(models, args)]
+
+    with torch_threads(threads_per_worker):
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(fn, model, arg) for model, arg in zip(models, args)
+            ]
+            return [future.result() for future in futures]
+
+
+def set_histories(
+    models: List[BaseHysteresis],
+    history_h: Tensor,
+    history_m: Tensor = None,
+    n_workers: int = None,
+    threads_per_worker: int = 1,
+    materialize: bool = True,
+):
+    """
+    Set the histories of M independent hysteresis models concurrently, see
+    `map_models`. Hysteresis states are calculated lazily by the models, by
+    default they are calculated in the workers so that the expensive part of
+    setting a history runs concurrently.
+
+    Parameters
+    ----------
+    models : List[BaseHysteresis]
+        List of M hysteresis models.
+
+    history_h : Tensor
+        Applied fields, shape N x M.
+
+    history_m : Tensor, optional
+        Measured magnetizations, shape N x M.
+
+    n_workers : int, optional
+        Number of worker threads, defaults to the number of cpu cores.
+
+    threads_per_worker : int, 1
+        Number of torch intra-op threads while the pool is running.
+
+    materialize : bool, True
+        Calculate the hysteresis states of each model in the workers, otherwise
+        they are calculated when first needed.
+    """
+    if len(history_h.shape) != 2 or history_h.shape[-1] != len(models):
+        raise ValueError("history_h must have shape N x M")
+
+    args = []
+    for idx in range(len(models)):
+        m = history_m[:, idx] if isinstance(history_m, Tensor) else None
+        args += [(history_h[:, idx], m)]
+
+    def _set_history(model, arg):
+        model.set_history(*arg)
+        if materialize:
+            model._states
+
+    map_models(
+        _set_history,
+        models,
+        args,
+        n_workers=n_workers,
+        threads_per_worker=threads_per_worker,
+    )
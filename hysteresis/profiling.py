@@ -0,0 +1,219 @@
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Union
+
+import torch
+
+from hysteresis.modes import MODE_NAMES
+
+# profiler that records instrumented calls, None when profiling is disabled
+_active_profiler = None
+
+
+def _tensor_stats(values):
+    """total number of elements and bytes of the tensors in nested values"""
+    numel, nbytes = 0, 0
+    stack = list(values)
+    while stack:
+        value = stack.pop()
+        if isinstance(value, torch.Tensor):
+            numel += value.numel()
+            nbytes += value.numel() * value.element_size()
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+    return numel, nbytes
+
+
+def _cuda_allocated():
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        return torch.cuda.memory_allocated()
+    return None
+
+
+def profiled(name: Union[str, Callable]):
+    """
+    Decorator that records calls to a function in the active Profiler. When
+    profiling is disabled the only overhead is a check of a global variable.
+
+    Parameters
+    ----------
+    name : str or Callable
+        Stage name, or a function called with the arguments of the decorated
+        function that returns the stage name (ie. to include the model mode).
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _active_profiler
+            if profiler is None:
+                return fn(*args, **kwargs)
+
+            stage = name(*args, **kwargs) if callable(name) else name
+            allocated = _cuda_allocated()
+            start = time.perf_counter()
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                end = time.perf_counter()
+                if allocated is not None:
+                    allocated = _cuda_allocated() - allocated
+                profiler.add_event(
+                    stage,
+                    start,
+                    end,
+                    input_numel=_tensor_stats(list(args) + list(kwargs.values()))[0],
+                    output_bytes=_tensor_stats([result])[1],
+                    cuda_allocated_bytes=allocated,
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def mode_stage(stage: str):
+    """stage name function that appends the mode of the called module"""
+
+    def name(module, *args, **kwargs):
+        return f"{stage}[{MODE_NAMES.get(module.mode, module.mode)}]"
+
+    return name
+
+
+class Profiler:
+    def __init__(self):
+        """
+        Opt-in instrumentation of the performance critical stages of the package,
+        ie. BaseHysteresis.forward (per mode), set_history, apply_field, transform
+        fitting, get_states, meshing, hybrid GP posteriors and accelerator
+        transport calculations. Records call counts, wall time, tensor sizes and
+        allocated bytes of each instrumented call while active.
+
+        Example
+        -------
+        >>> with Profiler() as prof:
+        ...     model.posterior(X)
+        >>> print(prof.table())
+        >>> prof.export_chrome_trace("trace.json")
+        """
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disable()
+
+    def enable(self):
+        global _active_profiler
+        if _active_profiler is not None and _active_profiler is not self:
+            raise RuntimeError("another profiler is already active")
+        _active_profiler = self
+
+    def disable(self):
+        global _active_profiler
+        if _active_profiler is self:
+            _active_profiler = None
+
+    def reset(self):
+        with self._lock:
+            self.events = []
+
+    def add_event(self, stage, start, end, **info):
+        event = {
+            "stage": stage,
+            "start": start,
+            "duration": end - start,
+            "thread": threading.get_ident(),
+            **info,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Aggregate statistics for each stage: number of calls, total, mean and max
+        wall time in seconds, total input tensor elements, total output bytes and
+        total cuda allocated bytes (None on cpu).
+        """
+        result = {}
+        for event in self.events:
+            stats = result.setdefault(
+                event["stage"],
+                {
+                    "calls": 0,
+                    "total_s": 0.0,
+                    "max_s": 0.0,
+                    "input_numel": 0,
+                    "output_bytes": 0,
+                    "cuda_allocated_bytes": None,
+                },
+            )
+            stats["calls"] += 1
+            stats["total_s"] += event["duration"]
+            stats["max_s"] = max(stats["max_s"], event["duration"])
+            stats["input_numel"] += event["input_numel"]
+            stats["output_bytes"] += event["output_bytes"]
+            if event["cuda_allocated_bytes"] is not None:
+                stats["cuda_allocated_bytes"] = (
+                    stats["cuda_allocated_bytes"] or 0
+                ) + event["cuda_allocated_bytes"]
+
+        for stats in result.values():
+            stats["mean_s"] = stats["total_s"] / stats["calls"]
+        return result
+
+    def table(self, sort_by: str = "total_s") -> str:
+        """summary formatted as a text table, sorted by a summary column"""
+        summary = self.summary()
+        stages = sorted(summary, key=lambda key: summary[key][sort_by], reverse=True)
+        width = max([len(stage) for stage in stages] + [5])
+
+        lines = [
+            f"{'stage':<{width}} {'calls':>8} {'total (s)':>11} {'mean (ms)':>11} "
+            f"{'max (ms)':>11} {'in numel':>12} {'out bytes':>12}"
+        ]
+        for stage in stages:
+            stats = summary[stage]
+            lines += [
+                f"{stage:<{width}} {stats['calls']:>8} {stats['total_s']:>11.4f} "
+                f"{1e3 * stats['mean_s']:>11.3f} {1e3 * stats['max_s']:>11.3f} "
+                f"{stats['input_numel']:>12} {stats['output_bytes']:>12}"
+            ]
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict:
+        """events in the Chrome trace event format (chrome://tracing, Perfetto)"""
+        trace_events: List[Dict] = []
+        for event in self.events:
+            trace_events += [
+                {
+                    "name": event["stage"],
+                    "ph": "X",
+                    "ts": 1e6 * (event["start"] - self._origin),
+                    "dur": 1e6 * event["duration"],
+                    "pid": os.getpid(),
+                    "tid": event["thread"],
+                    "args": {
+                        "input_numel": event["input_numel"],
+                        "output_bytes": event["output_bytes"],
+                        "cuda_allocated_bytes": event["cuda_allocated_bytes"],
+                    },
+                }
+            ]
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
@@ -0,0 +1,139 @@
+import time
+from copy import deepcopy
+from typing import Dict, Tuple
+
+import torch
+from torch import Tensor
+from torch.nn import Parameter
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.modes import REGRESSION
+
+
+def prune_density(
+    model: BaseHysteresis, max_mass: float = 1e-3
+) -> Tuple[BaseHysteresis, Dict]:
+    """
+    Create a compact copy of a fitted model that only keeps the mesh points with
+    significant hysterion density, so that state sweeps and magnetization sums
+    run over fewer points.
+
+    The points with the smallest density are removed as long as their combined
+    mass is at most `max_mass` of the total. The scale of the copy is reduced by
+    the retained mass fraction, so the removed points are replaced by their
+    average (zero) contribution. The normalized output error is therefore at
+    most `scale * dropped_mass` for any sequence of fields.
+
+    The copy keeps the history (or current state) of the model. A history store
+    is not shared with the copy, which only tracks its current state.
+
+    Parameters
+    ----------
+    model : BaseHysteresis
+        Fitted model, not modified.
+
+    max_mass : float, 1e-3
+        Maximum fraction of the total hysterion density that can be removed.
+
+    Returns
+    -------
+    pruned : BaseHysteresis
+        Model with the retained mesh points.
+    report : Dict
+        Number of mesh points before and after pruning, removed density fraction
+        and bound of the output error in real units.
+    """
+    with torch.no_grad():
+        density = model.hysterion_density.detach()
+        total = torch.sum(density)
+        order = torch.argsort(density)
+        removed = torch.cumsum(density[order], dim=0) / total <= max_mass
+        # always keep the largest density
+        removed[-1] = False
+        keep = torch.sort(order[~removed]).values
+        dropped_mass = float(torch.sum(density[order[removed]]) / total)
+
+        # do not copy the history store
+        pruned = deepcopy(model, {id(model.history_store): None})
+        pruned.mesh_points = model.mesh_points[keep]
+        pruned.raw_hysterion_density = Parameter(
+            model.raw_hysterion_density.detach()[keep].clone(),
+            requires_grad=model.raw_hysterion_density.requires_grad,
+        )
+        pruned.scale = model.scale.detach() * (1.0 - dropped_mass)
+
+        # slice the hysteresis states that were already calculated
+        if pruned._states_cache is not None:
+            pruned._states_cache = pruned._states_cache[:, keep]
+        if "_states" in pruned._buffers:
+            pruned._buffers["_states"] = pruned._buffers["_states"][:, keep]
+        if pruned._final_state_cache is not None:
+            pruned._final_state_cache = pruned._final_state_cache[keep]
+        if getattr(pruned, "_current_state", None) is not None:
+            pruned._current_state = pruned._current_state[keep]
+
+        error_bound = float(
+            torch.abs(model.transformer.scale_m) * model.scale * dropped_mass
+        )
+
+    report = {
+        "n_mesh_points": model.n_mesh_points,
+        "n_retained": pruned.n_mesh_points,
+        "dropped_mass": dropped_mass,
+        "error_bound": error_bound,
+    }
+    return pruned, report
+
+
+def compare_predictions(
+    model: BaseHysteresis,
+    pruned: BaseHysteresis,
+    x: Tensor,
+    mode: int = REGRESSION,
+    repeat: int = 5,
+) -> Dict:
+    """
+    Measure the prediction error and speedup of a pruned model with respect to the
+    original model.
+
+    Parameters
+    ----------
+    model : BaseHysteresis
+        Original model.
+
+    pruned : BaseHysteresis
+        Pruned model, see `prune_density`.
+
+    x : Tensor
+        Applied fields in real units.
+
+    mode : int, REGRESSION
+        Prediction mode used for the comparison.
+
+    repeat : int, 5
+        Number of timed predictions, the fastest is reported.
+
+    Returns
+    -------
+    result : Dict
+        Maximum absolute error in real units, prediction times in seconds of both
+        models and the speedup.
+    """
+
+    def run(hysteresis):
+        times = []
+        with hysteresis.mode_scope(mode), torch.no_grad():
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = hysteresis(x, return_real=True)
+                times += [time.perf_counter() - start]
+        return result, min(times)
+
+    reference, time_full = run(model)
+    result, time_pruned = run(pruned)
+    return {
+        "max_error": float(torch.max(torch.abs(result - reference))),
+        "time_s": time_full,
+        "pruned_time_s": time_pruned,
+        "speedup": time_full / time_pruned,
+    }
@@ -0,0 +1,175 @@
+import zlib
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.polynomial import Polynomial
+from hysteresis.transform import HysteresisTransform
+
+FORMAT_VERSION = 1
+HISTORY_OPTIONS = ["full", "state", None]
+
+
+def _compress(value: Tensor):
+    data = value.detach().cpu().to(torch.double).numpy()
+    return zlib.compress(data.tobytes())
+
+
+def _decompress(data: bytes, tkwargs):
+    value = np.frombuffer(zlib.decompress(data), dtype=np.float64).copy()
+    return torch.from_numpy(value).to(**tkwargs)
+
+
+def save_hysteresis(model: BaseHysteresis, f, history: str = "full"):
+    """
+    Save a hysteresis model in a compact format. Unlike torch.save(model), the
+    hysteresis states are not stored, they are recalculated from the history when
+    needed after loading.
+
+    Parameters
+    ----------
+    model : BaseHysteresis
+        Model to save.
+
+    f : str or file-like
+        File to save the model to, see torch.save.
+
+    history : str, "full"
+        History saved with the model.
+
+        - "full" - zlib compressed history of normalized fields and outputs.
+        - "state" - only the current hysteresis state and field, sufficient for
+          NEXT, FUTURE and CURRENT predictions.
+        - None - no history, the loaded model starts at negative saturation.
+    """
+    if history not in HISTORY_OPTIONS:
+        raise ValueError(f"history must be one of {HISTORY_OPTIONS}")
+
+    density_constraint = model.raw_hysterion_density_constraint
+    transformer = model.transformer
+    data = {
+        "format_version": FORMAT_VERSION,
+        "config": {
+            "trainable": model.trainable,
+            "temp": model.temp,
+            "polynomial_degree": model.polynomial_degree,
+            "polynomial_fit_iterations": model.polynomial_fit_iterations,
+            "use_normalized_density": not torch.isinf(
+                torch.as_tensor(density_constraint.upper_bound)
+            ).item(),
+            "fixed_scaling": model.fixed_scaling,
+            "mode": model.mode,
+        },
+        "mesh_points": model.mesh_points.cpu(),
+        "parameters": {
+            name: value.detach().cpu()
+            for name, value in model.named_parameters(recurse=False)
+        },
+        "transform": {
+            "domain": transformer.domain.cpu(),
+            "fixed_domain": transformer._fixed_domain,
+            "mrange": transformer.mrange.cpu(),
+            "offset_m": torch.as_tensor(transformer.offset_m).cpu(),
+            "scale_m": torch.as_tensor(transformer.scale_m).cpu(),
+            "polynomial_degree": transformer.polynomial_degree,
+            "polynomial_fit_iterations": transformer.polynomial_fit_iterations,
+            "poly_weights": transformer._poly_fit.weights.detach().cpu(),
+            "poly_bias": transformer._poly_fit.bias.detach().cpu(),
+        },
+        "history": {},
+    }
+
+    if history == "full" and hasattr(model, "_history_h"):
+        data["history"]["h"] = _compress(model._history_h)
+        if "_history_m" in model._buffers:
+            data["history"]["m"] = _compress(model._history_m)
+
+    elif history in ["full", "state"]:
+        current_state, current_field = model._get_current_state()
+        if current_state is not None:
+            data["history"]["state"] = current_state.detach().cpu()
+            data["history"]["field"] = current_field.detach().cpu().reshape(1)
+
+    torch.save(data, f)
+
+
+def load_hysteresis(f, tkwargs=None) -> BaseHysteresis:
+    """
+    Load a hysteresis model saved by `save_hysteresis`.
+
+    Parameters
+    ----------
+    f : str or file-like
+        File to load the model from, see torch.load.
+
+    tkwargs : Dict, optional
+        Tensor type and device for model.
+
+    Returns
+    -------
+    model : BaseHysteresis
+        Loaded model.
+    """
+    data = torch.load(f)
+    if data.get("format_version") != FORMAT_VERSION:
+        raise RuntimeError(
+            f"unsupported hysteresis model format {data.get('format_version')}"
+        )
+
+    config = data["config"]
+    transform_data = data["transform"]
+
+    fixed_domain = transform_data["domain"] if transform_data["fixed_domain"] else None
+    model = BaseHysteresis(
+        trainable=config["trainable"],
+        tkwargs=tkwargs,
+        mesh_points=data["mesh_points"],
+        polynomial_degree=config["polynomial_degree"],
+        polynomial_fit_iterations=config["polynomial_fit_iterations"],
+        temp=config["temp"],
+        use_normalized_density=config["use_normalized_density"],
+        fixed_domain=fixed_domain,
+        fixed_scaling=config["fixed_scaling"],
+    )
+
+    # restore transformer
+    transformer = HysteresisTransform(
+        fixed_domain=fixed_domain,
+        polynomial_degree=transform_data["polynomial_degree"],
+        polynomial_fit_iterations=transform_data["polynomial_fit_iterations"],
+    )
+    transformer._domain = transform_data["domain"]
+    transformer.mrange = transform_data["mrange"]
+    transformer.offset_m = transform_data["offset_m"]
+    transformer.scale_m = transform_data["scale_m"]
+    transformer._poly_fit = Polynomial(len(transform_data["poly_weights"]))
+    with torch.no_grad():
+        transformer._poly_fit.weights.copy_(transform_data["poly_weights"])
+        transformer._poly_fit.bias.copy_(transform_data["poly_bias"])
+    model.transformer = transformer
+    if not model.trainable or model.fixed_scaling:
+        transformer.freeze()
+
+    # restore parameters
+    with torch.no_grad():
+        for name, value in data["parameters"].items():
+            getattr(model, name).copy_(value)
+
+    # restore history, states are calculated lazily when first needed
+    history = data["history"]
+    if "h" in history:
+        model._update_h_history_buffer(_decompress(history["h"], model.tkwargs))
+        if "m" in history:
+            model.register_buffer(
+                "_history_m", _decompress(history["m"], model.tkwargs)
+            )
+    elif "state" in history:
+        model._update_current_state(
+            history["state"].to(**model.tkwargs),
+            history["field"].to(**model.tkwargs)[0],
+        )
+
+    model.mode = config["mode"]
+    return model
@@ -0,0 +1,413 @@
+import asyncio
+import itertools
+import json
+import re
+from collections import deque
+from typing import Dict, List
+
+import torch
+from torch import Tensor
+
+from hysteresis.base import BaseHysteresis, HysteresisError
+from hysteresis.modes import CURRENT, FUTURE, MODE_NAMES, NEXT
+
+MODES = {name: mode for mode, name in MODE_NAMES.items()}
+
+# request id of a message that cannot be decoded
+_ID_PATTERN = re.compile(rb'"id"\s*:\s*(-?\d+|"(?:[^"\\]|\\.)*")')
+
+
+class _Request:
+    def __init__(self, kind, x=None, mode=NEXT, return_real=True):
+        self.kind = kind
+        self.x = x
+        self.mode = mode
+        self.return_real = return_real
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class _MagnetWorker:
+    """processes the requests of a single magnet in order"""
+
+    def __init__(self, model: BaseHysteresis, batch_window: float, max_batch_size):
+        self.model = model
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.pending = deque()
+        self.event = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+        self.n_requests = 0
+        self.n_batches = 0
+
+    def submit(self, request: _Request):
+        self.pending.append(request)
+        self.event.set()
+        return request.future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.event.wait()
+            if not self.pending:
+                self.event.clear()
+                continue
+
+            if self.pending[0].mode == NEXT and self.pending[0].kind == "predict":
+                # wait for concurrent NEXT queries to arrive, then take the leading
+                # NEXT queries, later requests must see the state after any
+                # preceding apply_field
+                if self.batch_window > 0.0:
+                    await asyncio.sleep(self.batch_window)
+                batch, size = [], 0
+                while (
+                    self.pending
+                    and self.pending[0].kind == "predict"
+                    and self.pending[0].mode == NEXT
+                    and (
+                        not batch
+                        or size + len(self.pending[0].x) <= self.max_batch_size
+                    )
+                ):
+                    request = self.pending.popleft()
+                    batch += [request]
+                    size += len(request.x)
+                await loop.run_in_executor(None, self._evaluate_next, batch)
+            else:
+                request = self.pending.popleft()
+                await loop.run_in_executor(None, self._evaluate, request)
+
+    def _evaluate_next(self, batch: List[_Request]):
+        """evaluate NEXT queries in one predict_batched_state call"""
+        self.n_requests += len(batch)
+        self.n_batches += 1
+
+        valid = []
+        for request in batch:
+            try:
+                self.model._check_inside_valid_domain(request.x)
+                valid += [request]
+            except HysteresisError as error:
+                self._set_exception(request, error)
+
+        for return_real in [True, False]:
+            group = [request for request in valid if request.return_real == return_real]
+            if not group:
+                continue
+            try:
+                X = torch.cat([request.x for request in group])
+                with self.model.mode_scope(NEXT), torch.no_grad():
+                    result = self.model(X, return_real=return_real)
+                results = torch.split(result, [len(request.x) for request in group])
+                for request, value in zip(group, results):
+                    self._set_result(request, value)
+            except Exception as error:
+                for request in group:
+                    self._set_exception(request, error)
+
+    def _evaluate(self, request: _Request):
+        self.n_requests += 1
+        self.n_batches += 1
+        try:
+            if request.kind == "apply_field":
+                self.model.apply_field(request.x)
+                result = None
+            else:
+                with self.model.mode_scope(request.mode), torch.no_grad():
+                    result = self.model(request.x, return_real=request.return_real)
+            self._set_result(request, result)
+        except Exception as error:
+            self._set_exception(request, error)
+
+    @staticmethod
+    def _set_result(request, value):
+        loop = request.future.get_loop()
+        loop.call_soon_threadsafe(_resolve, request.future, value, None)
+
+    @staticmethod
+    def _set_exception(request, error):
+        loop = request.future.get_loop()
+        loop.call_soon_threadsafe(_resolve, request.future, None, error)
+
+
+def _resolve(future, value, error):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(value)
+    else:
+        future.set_exception(error)
+
+
+class HysteresisService:
+    def __init__(
+        self,
+        models: Dict[str, BaseHysteresis],
+        batch_window: float = 5e-4,
+        max_batch_size: int = 4096,
+    ):
+        """
+        Local service that owns the authoritative hysteresis model (and history) of
+        each magnet for several clients.
+
+        Requests for each magnet are processed in the order they are received, so
+        `apply_field` updates are serialized and predictions always see the state
+        after all preceding updates. Concurrent NEXT queries for a magnet are
+        coalesced into a single batched state prediction. Requests for different
+        magnets are evaluated concurrently in a thread pool.
+
+        Use as an async context manager, see `serve` to expose the service over
+        a unix socket or localhost.
+
+        Parameters
+        ----------
+        models : Dict[str, BaseHysteresis]
+            Hysteresis model of each magnet, the service takes ownership of them.
+
+        batch_window : float, 5e-4
+            Time in seconds to wait for concurrent NEXT queries before evaluating
+            a batch.
+
+        max_batch_size : int, 4096
+            Maximum number of fields evaluated in a NEXT batch.
+        """
+        self.models = models
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._workers = {}
+
+    @classmethod
+    def from_accelerator(cls, accelerator, **kwargs):
+        """create a service for the hysteresis elements of a HysteresisAccelerator"""
+        models = {
+            name: element.hysteresis_model
+            for name, element in accelerator.elements.items()
+            if hasattr(element, "hysteresis_model")
+        }
+        return cls(models, **kwargs)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def start(self):
+        self._workers = {
+            name: _MagnetWorker(model, self.batch_window, self.max_batch_size)
+            for name, model in self.models.items()
+        }
+
+    async def stop(self):
+        for worker in self._workers.values():
+            worker.task.cancel()
+        await asyncio.gather(
+            *[worker.task for worker in self._workers.values()],
+            return_exceptions=True,
+        )
+        self._workers = {}
+
+    def _get_worker(self, name):
+        if not self._workers:
+            raise RuntimeError("service is not running")
+        if name not in self._workers:
+            raise KeyError(f"unknown magnet {name}")
+        return self._workers[name]
+
+    async def apply_field(self, name: str, h: Tensor):
+        """apply fields to a magnet, after all previously submitted requests"""
+        h = torch.atleast_1d(torch.as_tensor(h)).double()
+        await self._get_worker(name).submit(_Request("apply_field", h))
+
+    async def predict(
+        self, name: str, x: Tensor = None, mode: int = NEXT, return_real: bool = True
+    ) -> Tensor:
+        """
+        Predict the output of a magnet in NEXT, FUTURE or CURRENT mode, NEXT
+        queries are batched with concurrent queries for the same magnet.
+        """
+        if mode not in [NEXT, FUTURE, CURRENT]:
+            raise ValueError("mode must be NEXT, FUTURE or CURRENT")
+        if x is not None:
+            x = torch.atleast_1d(torch.as_tensor(x)).double().flatten()
+        elif mode != CURRENT:
+            raise ValueError("must specify fields when not using CURRENT mode")
+        return await self._get_worker(name).submit(
+            _Request("predict", x, mode, return_real)
+        )
+
+    def stats(self) -> Dict[str, Dict]:
+        """number of requests and evaluations (batches) of each magnet"""
+        return {
+            name: {"requests": worker.n_requests, "batches": worker.n_batches}
+            for name, worker in self._workers.items()
+        }
+
+    async def handle_message(self, message: Dict) -> Dict:
+        """handle a decoded protocol message, see `serve`"""
+        response = {"id": message.get("id") if isinstance(message, dict) else None}
+        try:
+            if not isinstance(message, dict):
+                raise ValueError("messages must be JSON objects")
+            op = message["op"]
+            if op == "apply_field":
+                await self.apply_field(message["magnet"], message["x"])
+                response["result"] = None
+            elif op == "predict":
+                x = message.get("x")
+                result = await self.predict(
+                    message["magnet"],
+                    None if x is None else torch.tensor(x),
+                    MODES[message.get("mode", "NEXT")],
+                    message.get("return_real", True),
+                )
+                response["result"] = result.tolist()
+            elif op == "magnets":
+                response["result"] = list(self.models)
+            elif op == "stats":
+                response["result"] = self.stats()
+            else:
+                raise ValueError(f"unknown operation {op}")
+        except Exception as error:
+            response["error"] = f"{type(error).__name__}: {error}"
+        return response
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve newline delimited JSON requests from one connection, requests are
+        handled concurrently and responses are matched to requests by "id".
+        """
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(response):
+            async with lock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        async def respond(message):
+            await send(await self.handle_message(message))
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError as error:
+                    await send(
+                        {
+                            "id": _recover_id(line),
+                            "error": f"{type(error).__name__}: {error}",
+                        }
+                    )
+                    continue
+                task = asyncio.get_running_loop().create_task(respond(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+
+def _recover_id(line: bytes):
+    """request id of a line that is not valid JSON, if it can be found"""
+    match = _ID_PATTERN.search(line)
+    if match is None:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except ValueError:
+        return None
+
+
+async def serve(
+    service: HysteresisService, path: str = None, host: str = "127.0.0.1", port=0
+):
+    """
+    Serve a running HysteresisService over a unix socket at `path`, or over TCP on
+    `host`:`port` (localhost by default) if no path is given.
+
+    The protocol is newline delimited JSON. Requests have the form
+    {"id": 1, "op": "predict", "magnet": "q1", "x": [0.1, 0.2], "mode": "NEXT",
+    "return_real": true} or {"id": 2, "op": "apply_field", "magnet": "q1",
+    "x": [0.1]}. Responses have the form {"id": 1, "result": [...]} or
+    {"id": 1, "error": "..."}.
+
+    Returns
+    -------
+    server : asyncio.Server
+        Running server, close with `server.close()`.
+    """
+    if path is not None:
+        return await asyncio.start_unix_server(service.handle_connection, path=path)
+    return await asyncio.start_server(service.handle_connection, host, port)
+
+
+class HysteresisClient:
+    def __init__(self, reader, writer):
+        """
+        Client for a served HysteresisService, create with `HysteresisClient.connect`.
+        Requests can be issued concurrently over a single connection.
+        """
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count()
+        self._futures = {}
+        self._task = asyncio.get_running_loop().create_task(self._read())
+
+    @classmethod
+    async def connect(cls, path: str = None, host: str = "127.0.0.1", port=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _read(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._futures.pop(response["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection closed"))
+
+    async def request(self, op: str, **kwargs):
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[message_id] = future
+        message = {"id": message_id, "op": op, **kwargs}
+        self._writer.write((json.dumps(message) + "\n").encode())
+        await self._writer.drain()
+
+        response = await future
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    async def predict(self, magnet: str, x=None, mode: str = "NEXT", return_real=True):
+        if isinstance(x, Tensor):
+            x = x.flatten().tolist()
+        result = await self.request(
+            "predict", magnet=magnet, x=x, mode=mode, return_real=return_real
+        )
+        return torch.tensor(result).double()
+
+    async def apply_field(self, magnet: str, x):
+        if isinstance(x, Tensor):
+            x = torch.atleast_1d(x).flatten().tolist()
+        await self.request("apply_field", magnet=magnet, x=x)
+
+    async def close(self):
+        self._writer.close()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
@@ -1,19 +1,21 @@
 import torch
 
+from hysteresis.profiling import profiled
 
-def sweep_up(h, mesh, initial_state, T=1e-2):
+
+def sweep_up(h, mesh, initial_state, T: float = 1e-2):
     return torch.minimum(
         initial_state + switch(h, mesh[:, 1], T), torch.ones_like(mesh[:, 1])
     )
 
 
-def sweep_left(h, mesh, initial_state, T=1e-2):
+def sweep_left(h, mesh, initial_state, T: float = 1e-2):
     return torch.maximum(
         initial_state - switch(mesh[:, 0], h, T), torch.ones_like(mesh[:, 0]) * -1.0
     )
 
 
-def switch(h, mesh, T=1e-4):
+def switch(h, mesh, T: float = 1e-4):
     # note that + T is needed to satisfy boundary conditions (creating a bit of delay
     # before the flip starts happening
     return 1.0 + torch.tanh((h - mesh - 0 * T) / abs(T))
@@ -74,6 +76,7 @@ def predict_batched_state(
     return result
 
 
+@profiled("get_states")
 def get_states(
     h: torch.Tensor,
     mesh_points: torch.Tensor,
@@ -117,6 +120,58 @@ def get_states(
     ValueError
         If n is negative.
     """
+    # concatenate states into one tensor
+    return torch.cat(
+        list(
+            iter_states(
+                h,
+                mesh_points,
+                current_state=current_state,
+                current_field=current_field,
+                tkwargs=tkwargs,
+                temp=temp,
+                chunk_size=len(h),
+            )
+        )
+    )
+
+
+def iter_states(
+    h: torch.Tensor,
+    mesh_points: torch.Tensor,
+    current_state: torch.Tensor = None,
+    current_field: torch.Tensor = None,
+    tkwargs=None,
+    temp=1e-3,
+    chunk_size: int = 1024,
+):
+    """
+    Generator that yields the hysteresis states for a sequence of applied fields
+    in chunks of at most `chunk_size` x n_mesh_points, see get_states. Only one
+    chunk of states is held in memory at a time.
+
+    Parameters
+    ----------
+    h : torch.Tensor
+        Normalized applied fields.
+    mesh_points : torch.Tensor
+        Mesh points on the Preisach plane.
+    current_state : torch.Tensor, optional
+        Initial state, defaults to negative saturation.
+    current_field : torch.Tensor, optional
+        Field corresponding to the initial state.
+    tkwargs : Dict, optional
+        Tensor type and device.
+    temp : float, 1e-3
+        Temperature of the differentiable hysteresis operator.
+    chunk_size : int, 1024
+        Maximum number of states per chunk.
+
+    Yields
+    ------
+    states : torch.Tensor
+        Chunk of states with shape `chunk x n_mesh_points`.
+    """
     # verify the inputs are in the normalized region within some machine epsilon
     epsilon = 1e-6
     if torch.any(torch.less(h + epsilon, torch.zeros(1))) or torch.any(
@@ -127,36 +182,157 @@ def get_states(
     assert len(h.shape) == 1
     n_mesh_points = mesh_points.shape[0]
     tkwargs = tkwargs or {}
+    chunk_size = max(chunk_size, 1)
 
     # list of hysteresis states with initial state set
-    initial_state, initial_field = get_current(
-        current_state, current_field, n_mesh_points, **tkwargs
-    )
+    state, field = get_current(current_state, current_field, n_mesh_points, **tkwargs)
 
     states = []
 
     # loop through the states
     for i in range(len(h)):
-        if i == 0:
-            # handle initial case
-            if h[0] > initial_field:
-                states += [sweep_up(h[i], mesh_points, initial_state, temp)]
-            elif h[0] < initial_field:
-                states += [sweep_left(h[i], mesh_points, initial_state, temp)]
-            else:
-                states += [initial_state]
-
-        elif h[i] > h[i - 1]:
+        if h[i] > field:
             # if the new applied field is greater than the old one, sweep up to
             # new applied field
-            states += [sweep_up(h[i], mesh_points, states[i - 1], temp)]
-        elif h[i] < h[i - 1]:
+            state = sweep_up(h[i], mesh_points, state, temp)
+        elif h[i] < field:
             # if the new applied field is less than the old one, sweep left to
             # new applied field
-            states += [sweep_left(h[i], mesh_points, states[i - 1], temp)]
-        else:
-            states += [states[i - 1]]
+            state = sweep_left(h[i], mesh_points, state, temp)
+        field = h[i]
+        states += [state]
 
-    # concatenate states into one tensor
-    total_states = torch.cat([ele.unsqueeze(0) for ele in states])
-    return total_states
+        if len(states) == chunk_size:
+            yield torch.stack(states)
+            states = []
+
+    if len(states):
+        yield torch.stack(states)
+
+
+def reduce_states(
+    h: torch.Tensor,
+    mesh_points: torch.Tensor,
+    reduce_fn,
+    current_state: torch.Tensor = None,
+    current_field: torch.Tensor = None,
+    tkwargs=None,
+    temp=1e-3,
+    chunk_size: int = 1024,
+):
+    """
+    Apply `reduce_fn(states, h)` to each chunk of hysteresis states as they are
+    calculated (see iter_states) and concatenate the results, for example to
+    calculate magnetizations without keeping the full state matrix in memory.
+
+    Returns
+    -------
+    result : torch.Tensor
+        Concatenated outputs of `reduce_fn`.
+    final_state : torch.Tensor
+        Hysteresis state after the last applied field.
+    """
+    results = []
+    start = 0
+    final_state = None
+    for states in iter_states(
+        h,
+        mesh_points,
+        current_state=current_state,
+        current_field=current_field,
+        tkwargs=tkwargs,
+        temp=temp,
+        chunk_size=chunk_size,
+    ):
+        end = start + len(states)
+        results += [reduce_fn(states, h[start:end])]
+        final_state = states[-1]
+        start = end
+
+    return torch.cat(results), final_state
+
+
+def get_padded_states(
+    h: torch.Tensor,
+    mesh_points: torch.Tensor,
+    lengths: torch.Tensor = None,
+    current_state: torch.Tensor = None,
+    current_field: torch.Tensor = None,
+    tkwargs=None,
+    temp=1e-3,
+):
+    """
+    Calculate the hysteresis states of several independent field sequences (runs)
+    in one batched pass. Each step updates the states of all runs at once, so the
+    cost is set by the longest run rather than the total number of fields.
+
+    Parameters
+    ----------
+    h : torch.Tensor
+        Normalized applied fields with shape `n_runs x max_length`, runs shorter
+        than `max_length` are padded at the end.
+    mesh_points : torch.Tensor
+        Mesh points on the Preisach plane.
+    lengths : torch.Tensor, optional
+        Number of valid fields in each run, defaults to `max_length` for every run.
+    current_state : torch.Tensor, optional
+        Initial state of each run with shape `n_runs x n_mesh_points`, defaults to
+        negative saturation.
+    current_field : torch.Tensor, optional
+        Normalized field corresponding to the initial state of each run.
+    tkwargs : Dict, optional
+        Tensor type and device.
+    temp : float, 1e-3
+        Temperature of the differentiable hysteresis operator.
+
+    Returns
+    -------
+    states : torch.Tensor
+        States with shape `n_runs x max_length x n_mesh_points`. States at padded
+        positions are equal to the final state of the run.
+    """
+    tkwargs = tkwargs or {}
+    assert len(h.shape) == 2
+    n_runs, max_length = h.shape
+    n_mesh_points = mesh_points.shape[0]
+
+    if lengths is None:
+        lengths = torch.full((n_runs,), max_length)
+    lengths = lengths.to(h.device)
+
+    # only verify valid fields, padding values are ignored
+    valid = torch.arange(max_length, device=h.device) < lengths.unsqueeze(-1)
+    epsilon = 1e-6
+    if torch.any((h[valid] + epsilon < 0.0) | (h[valid] - epsilon > 1.0)):
+        raise RuntimeError("applied values are outside of the unit domain")
+
+    if current_state is None:
+        state = -torch.ones(n_runs, n_mesh_points, **tkwargs)
+        field = torch.zeros(n_runs, **tkwargs)
+    else:
+        if not isinstance(current_field, torch.Tensor):
+            raise ValueError("need to specify current field if state is given")
+        if current_state.shape != torch.Size([n_runs, n_mesh_points]):
+            raise ValueError("current state must have shape n_runs x n_mesh_points")
+        state = current_state
+        field = current_field.reshape(n_runs)
+
+    states = []
+    for i in range(max_length):
+        h_i = h[:, i]
+        new_state = torch.where(
+            (h_i > field).unsqueeze(-1),
+            sweep_up(h_i.unsqueeze(-1), mesh_points, state, temp),
+            torch.where(
+                (h_i < field).unsqueeze(-1),
+                sweep_left(h_i.unsqueeze(-1), mesh_points, state, temp),
+                state,
+            ),
+        )
+
+        # keep the state of runs that have ended
+        state = torch.where(valid[:, i].unsqueeze(-1), new_state, state)
+        field = torch.where(valid[:, i], h_i, field)
+        states += [state]
+
+    return torch.stack(states, dim=1)
@@ -0,0 +1,316 @@
+from typing import Iterator, Tuple
+
+import torch
+from torch import Tensor
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.states import get_current, reduce_states
+
+
+def gaussian_density(mesh_points: Tensor, center=(0.4, 0.6), width=0.1) -> Tensor:
+    """
+    Gaussian hysterion density on the Preisach plane centered at (beta, alpha) =
+    `center`, normalized to a maximum of one.
+    """
+    center = torch.as_tensor(center).to(mesh_points)
+    r2 = torch.sum((mesh_points - center) ** 2, dim=-1)
+    density = torch.exp(-r2 / (2.0 * width ** 2))
+    return density / torch.max(density)
+
+
+def bimodal_density(
+    mesh_points: Tensor,
+    centers=((0.3, 0.5), (0.5, 0.8)),
+    widths=(0.08, 0.08),
+    weights=(1.0, 0.5),
+) -> Tensor:
+    """sum of two gaussian densities, normalized to a maximum of one"""
+    density = sum(
+        weight * gaussian_density(mesh_points, center, width)
+        for center, width, weight in zip(centers, widths, weights)
+    )
+    return density / torch.max(density)
+
+
+def lorentzian_density(mesh_points: Tensor, center=(0.4, 0.6), gamma=0.05) -> Tensor:
+    """
+    Lorentzian (Cauchy) hysterion density centered at (beta, alpha) = `center`,
+    normalized to a maximum of one. Heavier tails than the gaussian density.
+    """
+    center = torch.as_tensor(center).to(mesh_points)
+    r2 = torch.sum((mesh_points - center) ** 2, dim=-1)
+    density = gamma ** 2 / (r2 + gamma ** 2)
+    return density / torch.max(density)
+
+
+DENSITIES = {
+    "gaussian": gaussian_density,
+    "bimodal": bimodal_density,
+    "lorentzian": lorentzian_density,
+}
+
+
+def make_model(
+    density: str = "gaussian",
+    mesh_scale: float = 1.0,
+    domain: Tuple[float, float] = (0.0, 1.0),
+    scale: float = 1.0,
+    offset: float = 0.0,
+    slope: float = 0.0,
+    temp: float = 1e-2,
+    **density_kwargs,
+) -> BaseHysteresis:
+    """
+    Create a non-trainable ground truth hysteresis model with a parametric
+    hysterion density.
+
+    Parameters
+    ----------
+    density : str, "gaussian"
+        Density type, one of "gaussian", "bimodal" or "lorentzian".
+
+    mesh_scale : float, 1.0
+        Mesh density scaling, see BaseHysteresis.
+
+    domain : Tuple[float, float], (0.0, 1.0)
+        Input domain of the model in real units.
+
+    scale, offset, slope : float
+        Linear output parameters of the model.
+
+    temp : float, 1e-2
+        Temperature of the differentiable hysteresis operator.
+
+    density_kwargs
+        Arguments passed to the density function.
+
+    Returns
+    -------
+    model : BaseHysteresis
+        Ground truth model.
+    """
+    if density not in DENSITIES:
+        raise ValueError(f"density must be one of {list(DENSITIES)}")
+
+    model = BaseHysteresis(
+        trainable=False,
+        mesh_scale=mesh_scale,
+        temp=temp,
+        fixed_domain=torch.tensor(domain).double(),
+    )
+    # keep densities inside the constraint interval so raw values stay finite
+    eps = 1e-4
+    model.hysterion_density = torch.clamp(
+        DENSITIES[density](model.mesh_points, **density_kwargs), eps, 1.0 - eps
+    )
+    model.scale = torch.tensor(scale)
+    model.offset = torch.tensor(offset)
+    model.slope = torch.tensor(slope)
+    return model
+
+
+def _rechunk(segments: Iterator[Tensor], chunk_size: int) -> Iterator[Tensor]:
+    """regroup a stream of 1D tensors into chunks of `chunk_size` elements"""
+    buffer, size = [], 0
+    for segment in segments:
+        buffer.append(segment)
+        size += len(segment)
+        while size >= chunk_size:
+            data = torch.cat(buffer)
+            yield data[:chunk_size]
+            buffer, size = [data[chunk_size:]], size - chunk_size
+    if size:
+        yield torch.cat(buffer)
+
+
+def _ramp(start, stop, n_points):
+    """n_points from start (exclusive) to stop (inclusive)"""
+    return start + (stop - start) * torch.arange(1, n_points + 1).double() / n_points
+
+
+def degauss_cycles(
+    n_cycles: int = 20,
+    decay: float = 0.8,
+    points_per_ramp: int = 10,
+    center: float = 0.5,
+    chunk_size: int = 10000,
+) -> Iterator[Tensor]:
+    """
+    Degaussing excitation in normalized units: ramps between center +/- an
+    amplitude that starts at saturation and decays by `decay` every cycle.
+    """
+
+    def segments():
+        field = torch.tensor(center).double()
+        amplitude = min(center, 1.0 - center)
+        for _ in range(n_cycles):
+            for sign in [1.0, -1.0]:
+                target = center + sign * amplitude
+                yield _ramp(field, target, points_per_ramp)
+                field = torch.tensor(target).double()
+            amplitude *= decay
+        yield _ramp(field, center, points_per_ramp)
+
+    return _rechunk(segments(), chunk_size)
+
+
+def minor_loops(
+    n_loops: int = 10,
+    cycles_per_loop: int = 3,
+    points_per_ramp: int = 10,
+    amplitude_range=(0.05, 0.3),
+    seed: int = 0,
+    chunk_size: int = 10000,
+) -> Iterator[Tensor]:
+    """
+    Minor hysteresis loops in normalized units around random centers with random
+    amplitudes, each loop is traversed `cycles_per_loop` times.
+    """
+    generator = torch.Generator().manual_seed(seed)
+
+    def segments():
+        field = torch.tensor(0.0).double()
+        for _ in range(n_loops):
+            u = torch.rand(2, generator=generator, dtype=torch.double)
+            amplitude = amplitude_range[0] + u[0] * (
+                amplitude_range[1] - amplitude_range[0]
+            )
+            center = amplitude + u[1] * (1.0 - 2.0 * amplitude)
+            for _ in range(cycles_per_loop):
+                for target in [center + amplitude, center - amplitude]:
+                    yield _ramp(field, target, points_per_ramp)
+                    field = target
+
+    return _rechunk(segments(), chunk_size)
+
+
+def random_walk(
+    n_steps: int = 10000,
+    step_size: float = 0.02,
+    seed: int = 0,
+    chunk_size: int = 10000,
+) -> Iterator[Tensor]:
+    """
+    Gaussian random walk in normalized units, reflected at the domain boundaries.
+    """
+    generator = torch.Generator().manual_seed(seed)
+
+    def segments():
+        field = torch.tensor(0.5).double()
+        for start in range(0, n_steps, chunk_size):
+            n = min(chunk_size, n_steps - start)
+            steps = step_size * torch.randn(n, generator=generator, dtype=torch.double)
+            walk = field + torch.cumsum(steps, dim=0)
+
+            # reflect into [0, 1], period of the reflected walk is 2
+            walk = torch.remainder(walk, 2.0)
+            walk = torch.where(walk > 1.0, 2.0 - walk, walk)
+            field = walk[-1]
+            yield walk
+
+    return _rechunk(segments(), chunk_size)
+
+
+def optimizer_trace(
+    n_steps: int = 1000,
+    initial_width: float = 0.3,
+    decay: float = 0.995,
+    explore_probability: float = 0.1,
+    seed: int = 0,
+    chunk_size: int = 10000,
+) -> Iterator[Tensor]:
+    """
+    Sequence of fields in normalized units that resembles an optimizer: samples
+    around a drifting incumbent with a shrinking width, mixed with occasional
+    uniform exploration steps.
+    """
+    generator = torch.Generator().manual_seed(seed)
+
+    def segments():
+        incumbent = float(torch.rand(1, generator=generator, dtype=torch.double))
+        for start in range(0, n_steps, chunk_size):
+            n = min(chunk_size, n_steps - start)
+            explore = torch.rand(n, generator=generator, dtype=torch.double)
+            noise = torch.randn(n, generator=generator, dtype=torch.double)
+            values = torch.rand(n, generator=generator, dtype=torch.double)
+            width = initial_width * decay ** torch.arange(
+                start, start + n, dtype=torch.double
+            )
+
+            # only the incumbent recursion is sequential, it drifts towards
+            # accepted samples which depend on the incumbent through clamping
+            accepted = explore >= explore_probability
+            samples = []
+            for step in (width * noise)[accepted].tolist():
+                sample = min(max(incumbent + step, 0.0), 1.0)
+                incumbent = 0.9 * incumbent + 0.1 * sample
+                samples += [sample]
+            values[accepted] = torch.tensor(samples, dtype=torch.double)
+            yield values
+
+    return _rechunk(segments(), chunk_size)
+
+
+def generate_measurements(
+    model: BaseHysteresis,
+    excitation: Iterator[Tensor],
+    noise_std: float = 0.0,
+    seed: int = 0,
+    chunk_size: int = 1024,
+) -> Iterator[Tuple[Tensor, Tensor]]:
+    """
+    Stream noisy measurements of a ground truth model for an excitation sequence.
+    The model history is not modified and only the current hysteresis state is
+    kept between batches, so memory use is independent of the sequence length.
+
+    Parameters
+    ----------
+    model : BaseHysteresis
+        Ground truth model, measurements start from its current state or negative
+        saturation.
+
+    excitation : Iterator[Tensor]
+        Batches of applied fields in normalized units, ie. from `random_walk`.
+        Batches can be chained with itertools.chain.
+
+    noise_std : float, 0.0
+        Standard deviation of gaussian measurement noise in real units.
+
+    seed : int, 0
+        Seed of the measurement noise.
+
+    chunk_size : int, 1024
+        Number of hysteresis states calculated at once.
+
+    Yields
+    ------
+    h : Tensor
+        Applied fields in real units.
+    m : Tensor
+        Measured outputs in real units.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    state, field = model._get_current_state()
+    state, field = get_current(state, field, model.n_mesh_points, **model.tkwargs)
+
+    for norm_h in excitation:
+        norm_h = norm_h.to(**model.tkwargs)
+        with torch.no_grad():
+            m, state = reduce_states(
+                norm_h,
+                model.mesh_points,
+                model._predict_normalized_magnetization,
+                current_state=state,
+                current_field=field,
+                tkwargs=model.tkwargs,
+                temp=model.temp,
+                chunk_size=chunk_size,
+            )
+            h, m = model.transformer.untransform(norm_h, m)
+        field = norm_h[-1]
+
+        if noise_std > 0.0:
+            noise = torch.randn(len(m), generator=generator, dtype=torch.double)
+            m = m + noise_std * noise.to(m)
+        yield h, m
+
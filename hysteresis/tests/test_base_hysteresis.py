@@ -233,3 +233,55 @@ class TestBaseHysteresis:
         h_data = torch.linspace(-1, 10.0)
         m_data = torch.linspace(-10.0, 10.0)
         H = BaseHysteresis(h_data, m_data, mesh_scale=0.1)
+
+    def test_predict_streaming(self):
+        h_data = torch.linspace(-1.0, 10.0, 20)
+        m_data = torch.linspace(-10.0, 10.0, 20)
+        H = BaseHysteresis(h_data, m_data, mesh_scale=0.5, polynomial_fit_iterations=5)
+        h_test = torch.rand(50) * 11.0 - 1.0
+
+        for mode in [REGRESSION, FUTURE]:
+            H.mode = mode
+            for return_real in [True, False]:
+                expected = H(h_test, return_real=return_real)
+                result = H.predict_streaming(
+                    h_test, chunk_size=8, return_real=return_real
+                )
+                assert torch.allclose(result, expected)
+
+        H.next()
+        with pytest.raises(HysteresisError):
+            H.predict_streaming(h_test)
+
+    def test_lazy_states(self):
+        h_data = torch.rand(30).double()
+        H = BaseHysteresis(
+            mesh_scale=0.5, fixed_domain=torch.tensor((0.0, 1.0)).double()
+        )
+        H.set_history(h_data)
+        assert H._states_cache is None
+        assert H._final_state_cache is not None
+        history_m = H._history_m.clone()
+        density = H.hysterion_density.detach().clone()
+
+        # outputs are predicted with the parameters at the time of set_history
+        H.hysterion_density = torch.rand(H.n_mesh_points).double()
+        H.regression()
+        assert not torch.allclose(H(h_data), history_m)
+        assert torch.equal(H._history_m, history_m)
+        H.hysterion_density = density
+        assert torch.allclose(H(h_data), history_m)
+
+        # predictions from the end state only calculate the final state
+        H.next()
+        H(torch.rand(5).double())
+        assert H._states_cache is None
+        assert H._final_state_cache is not None
+
+        H.apply_field(torch.tensor(0.5))
+        assert H._states_cache is None
+        states = get_states(H._history_h, H.mesh_points, temp=H.temp)
+        assert torch.allclose(H._final_state, states[-1])
+
+        # fitting requires the full state matrix
+        assert torch.allclose(H._states, states)
@@ -0,0 +1,42 @@
+from copy import deepcopy
+
+import pytest
+import torch
+
+from hysteresis.base import BaseHysteresis, HysteresisError
+from hysteresis.batched import (
+    can_stack,
+    stack_hysteresis_models,
+    batched_next_magnetization,
+)
+
+
+class TestBatched:
+    def test_next_magnetization(self):
+        h_data = torch.linspace(0.0, 10.0, 20)
+        m_data = torch.linspace(-10.0, 10.0, 20)
+        H = BaseHysteresis(h_data, m_data, mesh_scale=0.5, polynomial_fit_iterations=5)
+        models = [deepcopy(H) for _ in range(3)]
+        models[1].apply_field(torch.tensor(4.0))
+        models[2].hysterion_density = torch.rand(H.n_mesh_points)
+
+        assert can_stack(models)
+        stack = stack_hysteresis_models(models)
+
+        X = torch.rand(5, 2, 3).double() * 10.0
+        for return_real in [True, False]:
+            m = batched_next_magnetization(stack, X, return_real=return_real)
+            assert m.shape == X.shape
+            for idx, model in enumerate(models):
+                model.next()
+                m_model = model(X[..., idx], return_real=return_real)
+                assert torch.allclose(m[..., idx], m_model)
+
+        with pytest.raises(HysteresisError):
+            batched_next_magnetization(stack, X + 20.0)
+
+    def test_different_mesh(self):
+        models = [BaseHysteresis(mesh_scale=0.5), BaseHysteresis(mesh_scale=1.0)]
+        assert not can_stack(models)
+        with pytest.raises(HysteresisError):
+            stack_hysteresis_models(models)
@@ -0,0 +1,90 @@
+import pytest
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.dataset import MultiRunDataset
+from hysteresis.modes import REGRESSION
+from hysteresis.states import get_padded_states, get_states
+from hysteresis.training import predict_multi_run, train_multi_run
+
+
+def make_dataset(lengths=(15, 7, 10)):
+    torch.manual_seed(0)
+    truth = BaseHysteresis(
+        trainable=False,
+        mesh_scale=0.5,
+        fixed_domain=torch.tensor((0.0, 10.0)).double(),
+    )
+    truth.hysterion_density = torch.rand(truth.n_mesh_points).double()
+    truth.mode = REGRESSION
+
+    runs = []
+    for length in lengths:
+        h = torch.rand(length).double() * 10.0
+        runs += [(h, truth(h, return_real=True).detach())]
+    return truth, MultiRunDataset(runs)
+
+
+class TestMultiRunDataset:
+    def test_dataset(self):
+        _, dataset = make_dataset()
+        assert len(dataset) == 3
+        assert torch.equal(dataset.lengths, torch.tensor((15, 7, 10)))
+        assert torch.equal(dataset.h[15:22], dataset[1][0])
+
+        h, m, lengths = dataset.padded()
+        assert h.shape == m.shape == torch.Size([3, 15])
+        assert torch.all(h[1, 7:] == dataset[1][0][-1])
+        assert dataset.mask().sum() == 32
+
+        with pytest.raises(ValueError):
+            MultiRunDataset([(torch.rand(3), torch.rand(4))])
+        with pytest.raises(ValueError):
+            MultiRunDataset([(torch.rand(3), torch.rand(3))], [torch.ones(3)], [None])
+
+    def test_padded_states(self):
+        truth, dataset = make_dataset()
+        h, _, lengths = dataset.padded()
+        norm_h = truth.transformer.transform(h)[0]
+        states = get_padded_states(
+            norm_h, truth.mesh_points, lengths, temp=truth.temp
+        )
+
+        for idx, length in enumerate(lengths):
+            expected = get_states(
+                norm_h[idx, :length], truth.mesh_points, temp=truth.temp
+            )
+            assert torch.allclose(states[idx, :length], expected)
+            assert torch.allclose(states[idx, length:], expected[-1])
+
+        # start from given states
+        initial = states[:, 3]
+        new_states = get_padded_states(
+            norm_h[:, 4:],
+            truth.mesh_points,
+            lengths - 4,
+            current_state=initial,
+            current_field=norm_h[:, 3],
+            temp=truth.temp,
+        )
+        assert torch.allclose(new_states[0], states[0, 4:])
+
+    def test_predict_and_train(self):
+        truth, dataset = make_dataset()
+        predictions = predict_multi_run(truth, dataset, return_real=True)
+        for (_, m), prediction in zip(dataset.runs, predictions):
+            assert torch.allclose(prediction, m)
+
+        model = BaseHysteresis(
+            mesh_scale=0.5,
+            polynomial_fit_iterations=10,
+            fixed_domain=torch.tensor((0.0, 10.0)).double(),
+        )
+        loss = train_multi_run(model, dataset, 100, lr=0.01)
+        assert torch.min(loss) < 0.5 * loss[0]
+
+        # the best parameters are restored after training
+        predictions = predict_multi_run(model, dataset)
+        norm_m = [model.transformer.transform(h, m)[1] for h, m in dataset.runs]
+        mse = torch.mean((torch.cat(predictions) - torch.cat(norm_m)) ** 2)
+        assert torch.isclose(mse, torch.min(loss))
@@ -0,0 +1,100 @@
+import pytest
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.export import export_hysteresis, get_current_state
+from hysteresis.modes import CURRENT, FUTURE, NEXT
+
+
+def make_model(n_history=10):
+    torch.manual_seed(0)
+    H = BaseHysteresis(
+        trainable=False,
+        mesh_scale=0.5,
+        fixed_domain=torch.tensor((-1.0, 2.0)).double(),
+    )
+    H.hysterion_density = torch.rand(H.n_mesh_points).double()
+    H.scale = torch.tensor(2.0)
+    H.offset = torch.tensor(-0.5)
+    H.slope = torch.tensor(0.3)
+    if n_history:
+        H.set_history(3.0 * torch.rand(n_history).double() - 1.0)
+    return H
+
+
+def make_fitted_model():
+    torch.manual_seed(1)
+    h = 3.0 * torch.rand(30).double() - 1.0
+    m = 0.5 * h + 0.3 * h ** 3 - 0.5 + 0.1 * torch.randn(30).double()
+    H = BaseHysteresis(
+        h,
+        m,
+        mesh_scale=0.5,
+        polynomial_degree=3,
+        polynomial_fit_iterations=200,
+        fixed_domain=torch.tensor((-1.0, 2.0)).double(),
+    )
+    H.hysterion_density = torch.rand(H.n_mesh_points).double()
+    return H
+
+
+def predict(model, x, mode, return_real=True):
+    with model.mode_scope(mode), torch.no_grad():
+        return model(x, return_real=return_real)
+
+
+class TestExport:
+    @pytest.mark.parametrize("n_history", [0, 10])
+    def test_next(self, n_history):
+        H = make_model(n_history)
+        module = export_hysteresis(H, NEXT)
+        state, field = get_current_state(H)
+
+        x = 3.0 * torch.rand(20).double() - 1.0
+        for return_real in [True, False]:
+            assert torch.allclose(
+                module(x, state, field, return_real),
+                predict(H, x, NEXT, return_real),
+            )
+
+        with pytest.raises(torch.jit.Error):
+            module(torch.tensor([3.0]).double(), state, field)
+
+    def test_future(self, tmp_path):
+        H = make_model()
+        module = export_hysteresis(H, FUTURE)
+        state, field = get_current_state(H)
+        x = 3.0 * torch.rand(15).double() - 1.0
+
+        # round trip through a file
+        torch.jit.save(module, str(tmp_path / "future.pt"))
+        module = torch.jit.load(str(tmp_path / "future.pt"))
+
+        m, final_state = module(x, state, field)
+        assert torch.allclose(m, predict(H, x, FUTURE))
+
+        H.apply_field(x)
+        new_state, new_field = get_current_state(H)
+        assert torch.allclose(final_state, new_state)
+        assert torch.allclose(new_field, x[-1])
+
+        with pytest.raises(ValueError):
+            export_hysteresis(H, CURRENT)
+
+    def test_fitted_transform(self):
+        H = make_fitted_model()
+        transformer = H.transformer
+        assert torch.any(transformer._poly_fit.weights.abs() > 1e-3)
+        assert abs(float(transformer.scale_m) - 1.0) > 1e-2
+
+        state, field = get_current_state(H)
+        x = 3.0 * torch.rand(20).double() - 1.0
+        next_module = export_hysteresis(H, NEXT)
+        future_module = export_hysteresis(H, FUTURE)
+        for return_real in [True, False]:
+            assert torch.allclose(
+                next_module(x, state, field, return_real),
+                predict(H, x, NEXT, return_real),
+            )
+        m, _ = future_module(x, state, field)
+        assert torch.allclose(m, predict(H, x, FUTURE))
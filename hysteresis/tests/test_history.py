@@ -0,0 +1,86 @@
+import pytest
+import torch
+
+from hysteresis.base import BaseHysteresis, HysteresisError
+from hysteresis.history import HistoryStore
+from hysteresis.modes import CURRENT, FITTING, NEXT
+
+
+def make_model():
+    return BaseHysteresis(
+        trainable=False,
+        mesh_scale=0.5,
+        fixed_domain=torch.tensor((0.0, 1.0)).double(),
+    )
+
+
+class TestHistoryStore:
+    def test_append(self, tmp_path):
+        store = HistoryStore(str(tmp_path), checkpoint_interval=5)
+        assert len(store) == 0
+        assert len(store.fields) == 0
+
+        h = torch.rand(12).double()
+        store.append(h[:7])
+        store.append(h[7:])
+        assert len(store) == 12
+        assert torch.equal(store.fields, h)
+        assert store.load_checkpoint() is None
+
+        store.save_checkpoint(torch.ones(3), torch.tensor(0.5))
+        store.close()
+
+        # reopen, ignoring a partially written value
+        with open(tmp_path / HistoryStore.FIELDS_FILE, "ab") as f:
+            f.write(b"\x00\x01")
+        store = HistoryStore(str(tmp_path), checkpoint_interval=5)
+        assert len(store) == 12
+        assert torch.equal(store.fields, h)
+        assert store.checkpoint_index == 12
+        assert torch.equal(store.load_checkpoint()["state"], torch.ones(3))
+
+    def test_model_resume(self, tmp_path):
+        h = torch.rand(23).double()
+
+        ref = make_model()
+        ref.set_history(h)
+
+        H = make_model()
+        H.attach_history_store(HistoryStore(str(tmp_path), checkpoint_interval=5))
+        for ele in h:
+            H.apply_field(ele)
+        assert not hasattr(H, "_states")
+        assert torch.equal(H.history_h, h)
+        assert H.history_store.checkpoint_index == 20
+        assert torch.allclose(H._current_state, ref._states[-1])
+
+        # restart from the checkpoint in a new model
+        H.history_store.close()
+        new_H = make_model()
+        new_H.attach_history_store(HistoryStore(str(tmp_path), checkpoint_interval=5))
+        assert torch.allclose(new_H._current_state, ref._states[-1])
+        assert torch.allclose(new_H._current_field, ref._history_h[-1])
+
+        x = torch.rand(6).double()
+        for model in [ref, new_H]:
+            model.mode = NEXT
+        assert torch.allclose(new_H(x), ref(x))
+
+        new_H.mode = CURRENT
+        ref.mode = CURRENT
+        assert torch.allclose(new_H(), ref())
+
+        new_H.mode = FITTING
+        with pytest.raises(HysteresisError):
+            new_H(h)
+
+    def test_move_history(self, tmp_path):
+        h = torch.rand(10).double()
+        H = make_model()
+        H.set_history(h)
+        state = H._states[-1].clone()
+
+        H.attach_history_store(HistoryStore(str(tmp_path)))
+        assert torch.equal(H.history_h, h)
+        assert torch.equal(H._current_state, state)
+        assert H.history_store.checkpoint_index == 10
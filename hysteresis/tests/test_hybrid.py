@@ -10,7 +10,8 @@ from gpytorch.likelihoods import GaussianLikelihood
 from gpytorch.mlls import ExactMarginalLogLikelihood
 
 from hysteresis.base import BaseHysteresis, HysteresisError
-from hysteresis.hybrid import ExactHybridGP
+from hysteresis.hybrid import ExactHybridGP, AdditiveHybridGP, MultiOutputHybridGP
+from hysteresis.modes import NEXT
 import hysteresis
 import os
 
@@ -35,6 +36,9 @@ class TestExactHybridGP:
 
         model = ExactHybridGP(train_x, train_y.flatten(), H)
 
+        # training states are calculated while setting the histories
+        assert model.hysteresis_models[0]._states_cache is not None
+
     def test_eval(self):
         train_x, train_m, train_y = load()
         H = BaseHysteresis(train_x.flatten(), polynomial_degree=3)
@@ -43,6 +47,22 @@ class TestExactHybridGP:
         with torch.no_grad():
             post = model(train_x)
 
+        # hysteresis models are left in the mode used for the magnetization
+        model.next()
+        with torch.no_grad():
+            model.get_magnetization(train_x[:5].unsqueeze(1))
+        assert H.mode == NEXT
+        assert not H.training
+
+        # posterior calls do not reset the modes of the hysteresis models
+        calls = []
+        train = H.train
+        H.train = lambda mode=True: calls.append(mode) or train(mode)
+        with torch.no_grad():
+            for _ in range(3):
+                model.posterior(train_x[:5].unsqueeze(1))
+        assert calls == []
+
     def test_train_basic(self):
         train_x, train_m, train_y = load()
 
@@ -161,3 +181,81 @@ class TestExactHybridGP:
             ]
         ).reshape(2, 3)
         candidate, _ = optimize_acqf(acq, bounds, 1, 1, 1)
+
+
+class TestAdditiveHybridGP:
+    def test_additive(self):
+        H = BaseHysteresis(
+            trainable=False,
+            mesh_scale=0.5,
+            fixed_domain=torch.tensor((0.0, 1.0)).double(),
+        )
+        dim = 4
+        train_x = torch.rand(10, dim).double()
+        train_y = torch.rand(10).double()
+        model = AdditiveHybridGP(train_x, train_y, [deepcopy(H) for _ in range(dim)])
+        assert model.batched
+
+        mll = ExactMarginalLogLikelihood(model.gp.likelihood, model)
+        value = mll(model(model.train_inputs[0]), model.train_targets)
+        assert value.shape == torch.Size([])
+
+        # batched magnetization must match the per model calculation
+        model.next()
+        test_x = torch.rand(3, 1, dim).double()
+        assert torch.allclose(
+            model.get_magnetization(test_x),
+            ExactHybridGP.get_magnetization(model, test_x),
+        )
+
+        acq = UpperConfidenceBound(model, beta=0.1)
+        bounds = torch.stack((torch.zeros(dim), torch.ones(dim))).double()
+        candidate, _ = optimize_acqf(acq, bounds, 1, 1, 4)
+        assert candidate.shape == torch.Size([1, dim])
+
+
+class TestMultiOutputHybridGP:
+    def test_multi_output(self):
+        H = BaseHysteresis(
+            trainable=False,
+            mesh_scale=0.5,
+            fixed_domain=torch.tensor((0.0, 1.0)).double(),
+        )
+        train_x = torch.rand(10, 2).double()
+        train_y = torch.stack(
+            (torch.sin(train_x.sum(dim=-1)), torch.cos(train_x[:, 0]), train_x[:, 1]),
+            dim=-1,
+        )
+
+        with pytest.raises(ValueError):
+            MultiOutputHybridGP(train_x, train_y[:, 0], [deepcopy(H), deepcopy(H)])
+
+        for multitask in [False, True]:
+            model = MultiOutputHybridGP(
+                train_x, train_y, [deepcopy(H), deepcopy(H)], multitask=multitask
+            )
+            assert model.num_outputs == 3
+
+            mll = ExactMarginalLogLikelihood(model.gp.likelihood, model)
+            value = mll(model(model.train_inputs[0]), model.train_targets).sum()
+            value.backward()
+
+            model.eval()
+            with torch.no_grad():
+                post = model(train_x, return_real=True)
+                assert post.mean.shape == torch.Size([10, 3])
+                mean = model(train_x).mean
+                if not multitask:
+                    mean = mean.transpose(-1, -2)
+                transform = model.outcome_transform
+                expected = transform.means + transform.stdvs * mean
+                assert torch.allclose(post.mean, expected)
+                likelihood = model(train_x, return_real=True, return_likelihood=True)
+                assert torch.all(likelihood.variance > post.variance)
+                m = model.get_magnetization(train_x)
+                from_m = model(m, return_real=True, from_magnetization=True)
+                assert torch.allclose(from_m.mean, post.mean)
+
+            model.next()
+            post = model.posterior(torch.rand(5, 1, 2).double())
+            assert post.mean.shape == torch.Size([5, 1, 3])
@@ -0,0 +1,98 @@
+import pytest
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.inverse import solve_fields
+from hysteresis.modes import FUTURE, NEXT
+
+
+def make_model():
+    torch.manual_seed(0)
+    H = BaseHysteresis(
+        trainable=False,
+        mesh_scale=0.5,
+        fixed_domain=torch.tensor((-1.0, 2.0)).double(),
+    )
+    H.hysterion_density = torch.rand(H.n_mesh_points).double()
+    H.scale = torch.tensor(2.0)
+    H.offset = torch.tensor(-0.5)
+    H.slope = torch.tensor(0.3)
+    H.set_history(torch.tensor((1.5, -0.5, 1.0, 0.2)).double())
+    return H
+
+
+def predict(model, x, mode):
+    with model.mode_scope(mode), torch.no_grad():
+        return model(x, return_real=True)
+
+
+class TestInverse:
+    def test_reachable(self):
+        H = make_model()
+        history = H.history_h.clone()
+        x = 3.0 * torch.rand(50).double() - 1.0
+        target = predict(H, x, NEXT)
+
+        h, standardize, reachable = solve_fields(H, target, tol=1e-10)
+        assert torch.all(reachable)
+        assert not torch.any(standardize)
+        assert torch.allclose(predict(H, h, NEXT), target, atol=1e-6)
+
+        # the model state is not modified
+        assert torch.equal(H.history_h, history)
+
+    def test_direction(self):
+        H = make_model()
+        domain = H.valid_domain
+        # stay away from the domain limits, where the soft hysteresis operator
+        # makes the output of a sweep up slightly exceed a sweep down from the limit
+        x = 2.8 * torch.rand(50).double() - 0.9
+        target = predict(H, x, NEXT)
+
+        # targets below the current field can only be approached from below
+        # after a standardization cycle, and vice versa
+        current_field = H.history_h[-1]
+        for direction, cycle in [("up", domain.flip(0)), ("down", domain)]:
+            h, standardize, reachable = solve_fields(
+                H, target, tol=1e-10, direction=direction
+            )
+            assert torch.all(reachable)
+            if direction == "up":
+                assert torch.equal(standardize, x < current_field)
+            else:
+                assert torch.equal(standardize, x >= current_field)
+
+            for i in range(len(target)):
+                fields = h[i].reshape(1)
+                if standardize[i]:
+                    fields = torch.cat((cycle, fields))
+                result = predict(H, fields, FUTURE)[-1]
+                assert torch.allclose(result, target[i], atol=1e-6)
+
+    def test_unreachable(self):
+        H = make_model()
+        target = torch.tensor((-1e3, 1e3)).double()
+        h, standardize, reachable = solve_fields(H, target)
+        assert not torch.any(reachable)
+        assert torch.all(standardize)
+        assert torch.allclose(h, H.valid_domain)
+
+        with pytest.raises(ValueError):
+            solve_fields(H, target, direction="left")
+
+    def test_monotonic(self):
+        # outputs decreasing with the field are solved
+        H = make_model()
+        H.scale = torch.tensor(0.5)
+        H.slope = torch.tensor(-3.0)
+        x = 2.8 * torch.rand(50).double() - 0.9
+        target = predict(H, x, NEXT)
+        h, standardize, reachable = solve_fields(H, target, tol=1e-10)
+        assert torch.all(reachable)
+        assert torch.allclose(predict(H, h, NEXT), target, atol=1e-6)
+
+        # outputs that are not monotonic cannot be solved by bisection
+        H.scale = torch.tensor(2.0)
+        H.slope = torch.tensor(-1.0)
+        with pytest.raises(ValueError):
+            solve_fields(H, target)
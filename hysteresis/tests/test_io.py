@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+import hysteresis
+from hysteresis.io import (
+    load_measurement,
+    load_runs,
+    read_index,
+    read_strdat,
+    read_strplt,
+)
+
+DATA_DIR = os.path.join(
+    os.path.dirname(hysteresis.__file__), "..", "examples", "fitting", "data"
+)
+
+
+class TestIO:
+    def test_read_strplt(self):
+        data = read_strplt(os.path.join(DATA_DIR, "strplt.ru3"))
+        assert list(data.keys()) == [
+            "Time", "MAIN", "sigma", "BL", "sigBL", "TF", "sigTF", "THsp", "sigThsp"
+        ]
+        assert len(data["MAIN"]) == 61
+        assert data["MAIN"][1] == 16.4402908
+        assert data["BL"][-1] == 0.0343561
+
+        # compare with a plain text parse
+        reference = np.loadtxt(os.path.join(DATA_DIR, "strplt.ru3"), skiprows=1)
+        assert np.allclose(data["MAIN"].numpy(), reference[:, 1])
+        assert np.allclose(data["BL"].numpy(), reference[:, 3])
+
+    def test_read_strdat(self):
+        data = read_strdat(os.path.join(DATA_DIR, "strdat.ru8"))
+        assert data["metadata"]["Run Number"] == "8"
+        assert data["metadata"]["Time"] == "13:57:56"
+        assert torch.equal(
+            data["test_currents"][:3], torch.tensor((0.0, 82.5, 66.0)).double()
+        )
+
+        measurements = data["measurements"]
+        assert "sigTHsp" in measurements
+        assert len(measurements["MAIN"]) == len(data["test_currents"])
+
+        plot_data = read_strplt(os.path.join(DATA_DIR, "strplt.ru8"))
+        assert torch.allclose(measurements["MAIN"], plot_data["MAIN"], atol=1e-4)
+
+    def test_read_index(self):
+        runs = read_index(os.path.join(DATA_DIR, "index.dat"))
+        assert [run["run"] for run in runs] == list(range(1, 9))
+        assert runs[2]["device"] == "1DQB26"
+        assert runs[2]["comment"].startswith("Major Hysteresis Loop")
+
+    def test_cache(self, tmp_path):
+        path = str(tmp_path / "strplt.ru3")
+        with open(os.path.join(DATA_DIR, "strplt.ru3")) as f:
+            text = f.read()
+        with open(path, "w") as f:
+            f.write(text)
+
+        cache_dir = str(tmp_path / "cache")
+        h, m = load_measurement(path, cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+
+        # cached result is used while the file contents are unchanged
+        cached_h, cached_m = load_measurement(path, cache_dir=cache_dir)
+        assert torch.equal(h, cached_h) and torch.equal(m, cached_m)
+        assert len(os.listdir(cache_dir)) == 1
+
+        with open(path, "w") as f:
+            f.write(text.replace("16.4402908", "16.5000000"))
+        new_h, _ = load_measurement(path, cache_dir=cache_dir)
+        assert new_h[1] == 16.5
+        assert len(os.listdir(cache_dir)) == 2
+
+    def test_load_runs(self):
+        h, m = load_runs(DATA_DIR, range(3, 9))
+        assert len(h) == len(m) == 187
+        h3, m3 = load_measurement(os.path.join(DATA_DIR, "strplt.ru3"))
+        assert torch.equal(h[:61], h3)
+
+        with pytest.raises(FileNotFoundError):
+            load_runs(DATA_DIR, [100])
@@ -0,0 +1,80 @@
+from torch.nn import Linear
+
+from hysteresis.modes import ModeModule, FITTING, NEXT, CURRENT, FUTURE
+
+
+class Parent(ModeModule):
+    def __init__(self):
+        super(Parent, self).__init__()
+        self.child = ModeModule()
+        self.linear = Linear(1, 1)
+
+
+class TestModes:
+    def test_mode_scope(self):
+        module = Parent()
+        assert module.mode == FITTING
+        assert module.training
+
+        with module.mode_scope(NEXT) as scoped:
+            assert scoped is module
+            assert module.mode == NEXT
+            assert module.child.mode == NEXT
+
+            # training flags are not modified
+            assert module.training
+            assert module.child.training
+            assert module.linear.training
+
+        assert module.mode == FITTING
+        assert module.child.mode == FITTING
+
+    def test_nested_mode_scope(self):
+        module = Parent()
+        module.current()
+        assert not module.training
+
+        with module.mode_scope(NEXT):
+            with module.mode_scope(NEXT):
+                assert module.mode == NEXT
+            assert module.mode == NEXT
+            assert module.child.mode == NEXT
+
+        assert module.mode == CURRENT
+        assert module.child.mode == CURRENT
+        assert not module.training
+
+    def test_mode_scope_children(self):
+        module = Parent()
+        module.next()
+        module.child.future()
+
+        # children are scoped even when the parent is already in the mode
+        with module.mode_scope(NEXT):
+            assert module.mode == NEXT
+            assert module.child.mode == NEXT
+
+        assert module.mode == NEXT
+        assert module.child.mode == FUTURE
+
+    def test_mode_scope_unchanged(self):
+        module = Parent()
+        module.next()
+        visits = []
+        scope_mode = module.child._scope_mode
+        module.child._scope_mode = lambda value, changed: scope_mode(
+            value, visits.append(value) or changed
+        )
+
+        # children are not visited again while no mode changed
+        for _ in range(3):
+            with module.mode_scope(NEXT):
+                assert module.child.mode == NEXT
+        assert len(visits) == 1
+
+        # a child set to another mode is visited and scoped
+        module.child.future()
+        with module.mode_scope(NEXT):
+            assert module.child.mode == NEXT
+        assert len(visits) == 2
+        assert module.child.mode == FUTURE
@@ -0,0 +1,119 @@
+from copy import deepcopy
+
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.history import HistoryStore
+from hysteresis.modes import FUTURE, REGRESSION
+from hysteresis.online import OnlineHysteresis
+from hysteresis.synthetic import make_model
+
+
+def make_models(n_history=20):
+    truth = make_model("gaussian", domain=(0.0, 2.0), scale=1.5, offset=0.2)
+    h = 2.0 * torch.rand(n_history).double()
+    with truth.mode_scope(REGRESSION), torch.no_grad():
+        m = truth(h, return_real=True)
+    truth.set_history(h)
+
+    model = BaseHysteresis(
+        h,
+        m,
+        polynomial_fit_iterations=100,
+        fixed_domain=torch.tensor((0.0, 2.0)).double(),
+    )
+    return truth, model
+
+
+def future_error(truth, model, x):
+    errors = []
+    for hysteresis in [truth, model]:
+        with hysteresis.mode_scope(FUTURE), torch.no_grad():
+            errors += [hysteresis(x, return_real=True)]
+    return torch.mean((errors[0] - errors[1]) ** 2)
+
+
+class TestOnline:
+    def test_update(self):
+        torch.manual_seed(0)
+        truth, model = make_models()
+        n_history = len(model.history_h)
+        x = 2.0 * torch.rand(50).double()
+        initial_error = future_error(truth, model, x)
+
+        online = OnlineHysteresis(model)
+        h = 2.0 * torch.rand(200).double()
+        with truth.mode_scope(FUTURE), torch.no_grad():
+            m = truth(h, return_real=True)
+        truth.apply_field(h)
+
+        prediction = online.update(h, m)
+        assert prediction.shape == m.shape
+
+        # predictions improve as measurements arrive
+        errors = (prediction - m) ** 2
+        assert torch.mean(errors[-50:]) < torch.mean(errors[:50])
+        assert future_error(truth, model, x) < 0.25 * initial_error
+
+        # the history is extended and states match a full recalculation
+        assert len(model.history_h) == n_history + 200
+        assert torch.allclose(model.history_h[n_history:], h)
+        assert torch.allclose(model.history_m[n_history:], m)
+        state, _ = model._get_current_state()
+        model._update_h_history_buffer(model._history_h)
+        assert torch.allclose(state, model._final_state)
+
+        # weights stay positive, the model predicts with the estimated weights
+        assert torch.all(model.hysterion_density > 0.0)
+
+    def test_update_store(self, tmp_path):
+        torch.manual_seed(0)
+        truth, model = make_models()
+        model.attach_history_store(HistoryStore(str(tmp_path)))
+        online = OnlineHysteresis(model, process_std=1e-3)
+
+        h = 2.0 * torch.rand(10).double()
+        with truth.mode_scope(FUTURE), torch.no_grad():
+            m = truth(h, return_real=True)
+        online.update(h, m)
+
+        assert len(model.history_store) == 30
+        assert torch.allclose(model.history_store.fields[20:], h)
+        assert torch.allclose(model._current_field, h[-1] / 2.0)
+
+    def test_update_batches(self):
+        torch.manual_seed(0)
+        truth, model = make_models()
+        h = 2.0 * torch.rand(40).double()
+        with truth.mode_scope(FUTURE), torch.no_grad():
+            m = truth(h, return_real=True)
+
+        # updates are sequential, splitting a stream does not change them
+        batched = deepcopy(model)
+        prediction = OnlineHysteresis(model).update(h, m)
+        online = OnlineHysteresis(batched)
+        batched_prediction = torch.cat(
+            [online.update(h[i : i + 7], m[i : i + 7]) for i in range(0, 40, 7)]
+        )
+        assert torch.allclose(prediction, batched_prediction)
+        assert torch.allclose(model.hysterion_density, batched.hysterion_density)
+        assert torch.equal(model.history_h, batched.history_h)
+
+        # histories grow in place, buffers are only reallocated when full
+        n_history = len(batched.history_h)
+        pointers = set()
+        for i in range(64):
+            online.update(h[i % 40], m[i % 40])
+            pointers.add(batched._history_h.data_ptr())
+        assert len(pointers) <= 2
+        assert len(batched.history_h) == len(batched.history_m) == n_history + 64
+        idx = torch.arange(64) % 40
+        assert torch.allclose(batched.history_h[-64:], h[idx])
+        assert torch.allclose(batched.history_m[-64:], m[idx])
+        assert torch.equal(online.update(h[:0], m[:0]), m[:0])
+
+        # outputs predicted at set_history are extended with measured outputs
+        model.set_history(h)
+        OnlineHysteresis(model).update(h[:5], m[:5])
+        assert len(model.history_m) == len(model.history_h) == 45
+        assert torch.allclose(model.history_m[40:], m[:5])
@@ -0,0 +1,47 @@
+from copy import deepcopy
+
+import pytest
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.parallel import map_models, set_histories
+
+
+class TestParallel:
+    def test_set_histories(self):
+        H = BaseHysteresis(mesh_scale=0.5, polynomial_fit_iterations=5)
+        history_h = torch.rand(20, 4).double()
+        history_m = torch.rand(20, 4).double()
+
+        serial = [deepcopy(H) for _ in range(4)]
+        for idx, model in enumerate(serial):
+            model.set_history(history_h[:, idx], history_m[:, idx])
+
+        parallel = [deepcopy(H) for _ in range(4)]
+        n_threads = torch.get_num_threads()
+        set_histories(parallel, history_h, history_m, n_workers=4)
+        assert torch.get_num_threads() == n_threads
+        # states are calculated in the workers
+        assert all(model._states_cache is not None for model in parallel)
+
+        for serial_model, parallel_model in zip(serial, parallel):
+            assert torch.equal(serial_model._states, parallel_model._states)
+            assert torch.equal(serial_model.history_h, parallel_model.history_h)
+            assert torch.equal(serial_model.history_m, parallel_model.history_m)
+
+        lazy = [deepcopy(H) for _ in range(4)]
+        set_histories(lazy, history_h, history_m, n_workers=4, materialize=False)
+        assert all(model._states_cache is None for model in lazy)
+        for serial_model, lazy_model in zip(serial, lazy):
+            assert torch.equal(serial_model._states, lazy_model._states)
+
+        with pytest.raises(ValueError):
+            set_histories(parallel, history_h[:, :2])
+
+    def test_map_models(self):
+        H = BaseHysteresis(mesh_scale=0.5)
+        result = map_models(lambda model, arg: arg * 2, [H, deepcopy(H)], [1, 2])
+        assert result == [2, 4]
+
+        with pytest.raises(ValueError):
+            map_models(lambda model, arg: arg, [H, H], [1, 2])
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+import torch
+
+from hysteresis import profiling
+from hysteresis.base import BaseHysteresis
+from hysteresis.profiling import Profiler, profiled
+
+
+class TestProfiling:
+    def test_disabled(self):
+        calls = []
+
+        @profiled("stage")
+        def fn(x):
+            calls.append(x)
+            return x
+
+        assert profiling._active_profiler is None
+        assert fn(1) == 1
+        assert calls == [1]
+
+    def test_profiler(self, tmp_path):
+        h = torch.rand(20).double()
+        with Profiler() as prof:
+            H = BaseHysteresis(
+                mesh_scale=0.5, fixed_domain=torch.tensor((0.0, 1.0)).double()
+            )
+            H.set_history(h)
+            H.apply_field(torch.tensor(0.5))
+            H.next()
+            H(torch.rand(4).double())
+            H.regression()
+            H(h)
+            H(h)
+        assert profiling._active_profiler is None
+
+        # no events are recorded after the profiler is disabled
+        H(h)
+
+        summary = prof.summary()
+        assert summary["BaseHysteresis.forward[REGRESSION]"]["calls"] == 2
+        assert summary["BaseHysteresis.forward[NEXT]"]["calls"] == 1
+        assert summary["BaseHysteresis.set_history"]["calls"] == 1
+        assert summary["BaseHysteresis.apply_field"]["calls"] == 1
+        assert summary["create_triangle_mesh"]["calls"] == 1
+        assert summary["get_states"]["calls"] == 2
+        assert summary["get_states"]["input_numel"] >= 2 * 20
+        assert summary["BaseHysteresis.forward[NEXT]"]["output_bytes"] == 4 * 8
+
+        table = prof.table()
+        assert table.splitlines()[0].startswith("stage")
+        assert "BaseHysteresis.forward[REGRESSION]" in table
+
+        path = tmp_path / "trace.json"
+        prof.export_chrome_trace(str(path))
+        with open(path) as f:
+            trace = json.load(f)
+        assert len(trace["traceEvents"]) == len(prof.events)
+        assert all(event["ph"] == "X" for event in trace["traceEvents"])
+
+    def test_single_active(self):
+        with Profiler():
+            with pytest.raises(RuntimeError):
+                Profiler().enable()
@@ -0,0 +1,57 @@
+import torch
+
+from hysteresis.history import HistoryStore
+from hysteresis.modes import CURRENT, FUTURE, NEXT, REGRESSION
+from hysteresis.pruning import compare_predictions, prune_density
+from hysteresis.synthetic import make_model
+
+
+def predict(model, x, mode):
+    with model.mode_scope(mode), torch.no_grad():
+        return model(x, return_real=True)
+
+
+class TestPruning:
+    def test_prune(self):
+        model = make_model("gaussian", domain=(-1.0, 1.0), scale=2.0, width=0.05)
+        model.set_history(2.0 * torch.rand(20).double() - 1.0)
+        x = 2.0 * torch.rand(50).double() - 1.0
+
+        pruned, report = prune_density(model, max_mass=1e-2)
+        assert report["n_mesh_points"] == model.n_mesh_points
+        assert report["n_retained"] == pruned.n_mesh_points
+        assert pruned.n_mesh_points < model.n_mesh_points / 2
+        assert 0.0 < report["dropped_mass"] <= 1e-2
+        assert torch.equal(pruned.history_h, model.history_h)
+
+        for mode in [REGRESSION, NEXT, FUTURE]:
+            error = torch.abs(predict(pruned, x, mode) - predict(model, x, mode))
+            assert torch.max(error) <= report["error_bound"]
+        error = predict(pruned, None, CURRENT) - predict(model, None, CURRENT)
+        assert torch.abs(error) <= report["error_bound"]
+
+        result = compare_predictions(model, pruned, x, repeat=2)
+        assert result["max_error"] <= report["error_bound"]
+        assert result["speedup"] > 0.0
+
+        # nothing is removed without a mass budget
+        pruned, report = prune_density(model, max_mass=0.0)
+        assert pruned.n_mesh_points == model.n_mesh_points
+        assert report["error_bound"] == 0.0
+
+    def test_prune_state(self, tmp_path):
+        model = make_model("bimodal")
+        model.attach_history_store(HistoryStore(str(tmp_path)))
+        model.apply_field(torch.rand(10).double())
+
+        pruned, report = prune_density(model, max_mass=1e-2)
+        assert pruned.history_store is None
+        assert pruned._current_state.shape == torch.Size([pruned.n_mesh_points])
+
+        # the pruned model tracks its own state
+        x = torch.rand(5).double()
+        pruned.apply_field(x)
+        model.apply_field(x)
+        assert len(model.history_store) == 15
+        error = predict(pruned, None, CURRENT) - predict(model, None, CURRENT)
+        assert torch.abs(error) <= report["error_bound"]
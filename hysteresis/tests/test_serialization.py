@@ -0,0 +1,87 @@
+import io
+
+import pytest
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.modes import CURRENT, FUTURE, NEXT, REGRESSION
+from hysteresis.serialization import load_hysteresis, save_hysteresis
+
+
+def make_model(n_history=500):
+    torch.manual_seed(0)
+    h = torch.rand(n_history).double()
+    h[0], h[1] = 0.0, 1.0
+    m = torch.rand(n_history).double()
+    H = BaseHysteresis(h, m, mesh_scale=0.5, polynomial_fit_iterations=5)
+    with torch.no_grad():
+        H.raw_hysterion_density.copy_(torch.randn(H.n_mesh_points))
+        H.raw_offset.fill_(0.3)
+    return H
+
+
+def save_load(model, history="full"):
+    f = io.BytesIO()
+    save_hysteresis(model, f, history=history)
+    size = f.tell()
+    f.seek(0)
+    return load_hysteresis(f), size
+
+
+class TestSerialization:
+    def test_full_history(self):
+        H = make_model()
+        loaded, size = save_load(H)
+
+        states_size = H._states.numel() * H._states.element_size()
+        assert size < states_size / 2
+
+        assert loaded._states_cache is None
+        assert torch.equal(loaded.mesh_points, H.mesh_points)
+        assert torch.allclose(loaded.history_h, H.history_h)
+        assert torch.allclose(loaded.history_m, H.history_m)
+        assert torch.equal(loaded._states, H._states)
+
+        x = torch.rand(10).double()
+        for mode in [REGRESSION, FUTURE, NEXT]:
+            H.mode = mode
+            loaded.mode = mode
+            assert torch.allclose(loaded(x, return_real=True), H(x, return_real=True))
+
+    def test_state_only(self):
+        H = make_model()
+        loaded, _ = save_load(H, history="state")
+        assert not hasattr(loaded, "_history_h")
+
+        x = torch.rand(10).double()
+        for mode in [FUTURE, NEXT]:
+            H.mode = mode
+            loaded.mode = mode
+            assert torch.allclose(loaded(x), H(x))
+
+        # continue from the loaded state
+        H.apply_field(x[:3])
+        loaded.apply_field(x[:3])
+        H.mode = CURRENT
+        loaded.mode = CURRENT
+        assert torch.allclose(loaded(), H())
+
+    def test_no_history(self):
+        H = make_model()
+        loaded, _ = save_load(H, history=None)
+        assert not hasattr(loaded, "_history_h")
+        assert torch.equal(loaded.hysterion_density, H.hysterion_density)
+
+        with pytest.raises(ValueError):
+            save_hysteresis(H, io.BytesIO(), history="bad")
+
+    def test_pickle_excludes_states(self):
+        H = make_model()
+        states = H._states
+        f = io.BytesIO()
+        torch.save(H, f)
+        f.seek(0)
+        loaded = torch.load(f)
+        assert loaded._states_cache is None
+        assert "_states" not in loaded.state_dict()
+        assert torch.equal(loaded._states, states)
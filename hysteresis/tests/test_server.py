@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import pytest
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.modes import CURRENT, FUTURE, NEXT
+from hysteresis.server import HysteresisClient, HysteresisService, serve
+
+
+def make_model(seed=0):
+    torch.manual_seed(seed)
+    H = BaseHysteresis(
+        trainable=False,
+        mesh_scale=0.5,
+        fixed_domain=torch.tensor((0.0, 1.0)).double(),
+    )
+    H.hysterion_density = torch.rand(H.n_mesh_points).double()
+    H.set_history(torch.rand(10).double())
+    return H
+
+
+def direct(model, x, mode):
+    with model.mode_scope(mode), torch.no_grad():
+        return model(x, return_real=True)
+
+
+class TestServer:
+    def test_batched_next(self):
+        model = make_model()
+        x = [torch.rand(3).double() for _ in range(20)]
+        expected = [direct(model, ele, NEXT) for ele in x]
+
+        async def run():
+            async with HysteresisService({"q1": model}) as service:
+                results = await asyncio.gather(
+                    *[service.predict("q1", ele) for ele in x]
+                )
+                return results, service.stats()
+
+        results, stats = asyncio.run(run())
+        for result, ele in zip(results, expected):
+            assert torch.allclose(result, ele)
+
+        # concurrent queries are coalesced
+        assert stats["q1"]["requests"] == 20
+        assert stats["q1"]["batches"] < 20
+
+    def test_ordering(self):
+        model = make_model()
+        reference = make_model()
+        x = torch.rand(5).double()
+        h = torch.tensor(0.3).double()
+
+        before = direct(reference, x, NEXT)
+        reference.apply_field(h)
+        after = direct(reference, x, NEXT)
+        future = direct(reference, x, FUTURE)
+        current = direct(reference, None, CURRENT)
+
+        async def run():
+            async with HysteresisService({"q1": model}) as service:
+                return await asyncio.gather(
+                    service.predict("q1", x),
+                    service.apply_field("q1", h),
+                    service.predict("q1", x),
+                    service.predict("q1", x, mode=FUTURE),
+                    service.predict("q1", mode=CURRENT),
+                )
+
+        results = asyncio.run(run())
+        assert torch.allclose(results[0], before)
+        assert results[1] is None
+        assert torch.allclose(results[2], after)
+        assert torch.allclose(results[3], future)
+        assert torch.allclose(results[4], current)
+        assert torch.equal(model.history_h, reference.history_h)
+
+    def test_invalid_request(self):
+        model = make_model()
+
+        async def run():
+            async with HysteresisService({"q1": model}) as service:
+                return await asyncio.gather(
+                    service.predict("q1", torch.tensor([2.0])),
+                    service.predict("q1", torch.tensor([0.5])),
+                    return_exceptions=True,
+                )
+
+        results = asyncio.run(run())
+        assert isinstance(results[0], Exception)
+        assert torch.allclose(results[1], direct(model, torch.tensor([0.5]), NEXT))
+
+        with pytest.raises(ValueError):
+            asyncio.run(HysteresisService({"q1": model}).predict("q1", None))
+
+    def test_socket(self, tmp_path):
+        models = {"q1": make_model(0), "q2": make_model(1)}
+        reference = {name: make_model(i) for i, name in enumerate(models)}
+        x = torch.rand(4).double()
+
+        async def run():
+            async with HysteresisService(models) as service:
+                server = await serve(service, path=str(tmp_path / "hysteresis.sock"))
+                async with server:
+                    client = await HysteresisClient.connect(
+                        path=str(tmp_path / "hysteresis.sock")
+                    )
+                    results = await asyncio.gather(
+                        client.predict("q1", x),
+                        client.predict("q2", x),
+                        client.apply_field("q1", torch.tensor(0.5)),
+                        client.predict("q1", x, mode="FUTURE"),
+                    )
+                    with pytest.raises(RuntimeError):
+                        await client.predict("q3", x)
+                    await client.close()
+                    server.close()
+                return results
+
+        results = asyncio.run(run())
+        assert torch.allclose(results[0], direct(reference["q1"], x, NEXT))
+        assert torch.allclose(results[1], direct(reference["q2"], x, NEXT))
+        reference["q1"].apply_field(torch.tensor(0.5).double())
+        assert torch.allclose(results[3], direct(reference["q1"], x, FUTURE))
+
+    def test_invalid_json(self, tmp_path):
+        path = str(tmp_path / "hysteresis.sock")
+
+        async def run():
+            async with HysteresisService({"q1": make_model()}) as service:
+                server = await serve(service, path=path)
+                async with server:
+                    reader, writer = await asyncio.open_unix_connection(path)
+                    responses = []
+                    for line in [b'{"id": 7, "op": "magnets"', b"[1, 2]", b"{"]:
+                        writer.write(line + b"\n")
+                        await writer.drain()
+                        responses += [json.loads(await reader.readline())]
+                    writer.close()
+                    server.close()
+                return responses
+
+        responses = asyncio.run(run())
+        assert responses[0]["id"] == 7
+        assert responses[0]["error"].startswith("JSONDecodeError")
+        assert responses[1] == {
+            "id": None,
+            "error": "ValueError: messages must be JSON objects",
+        }
+        assert responses[2]["id"] is None
+        assert responses[2]["error"].startswith("JSONDecodeError")
@@ -8,6 +8,8 @@ from hysteresis.states import (
     sweep_up,
     sweep_left,
     predict_batched_state,
+    iter_states,
+    reduce_states,
 )
 
 
@@ -89,3 +91,28 @@ class TestStateCalc:
         for t in tests:
             out = predict_batched_state(t, mesh, current_state, current_field)
             assert out.shape == torch.Size([*t.shape, len(mesh)])
+
+    def test_iter_states(self):
+        mesh = torch.tensor(create_triangle_mesh(0.5))
+        h = torch.rand(25).double()
+        h[5] = h[4]
+        states = get_states(h, mesh)
+
+        chunks = list(iter_states(h, mesh, chunk_size=10))
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        assert torch.equal(torch.cat(chunks), states)
+
+        # start from a given state
+        chunks = list(iter_states(h[10:], mesh, states[9], h[9], chunk_size=4))
+        assert torch.equal(torch.cat(chunks), states[10:])
+
+    def test_reduce_states(self):
+        mesh = torch.tensor(create_triangle_mesh(0.5))
+        h = torch.rand(25).double()
+        states = get_states(h, mesh)
+
+        result, final_state = reduce_states(
+            h, mesh, lambda s, f: torch.sum(s, dim=-1) + f, chunk_size=7
+        )
+        assert torch.allclose(result, torch.sum(states, dim=-1) + h)
+        assert torch.equal(final_state, states[-1])
@@ -0,0 +1,86 @@
+from itertools import chain
+
+import pytest
+import torch
+
+from hysteresis.modes import REGRESSION
+from hysteresis.synthetic import (
+    degauss_cycles,
+    generate_measurements,
+    make_model,
+    minor_loops,
+    optimizer_trace,
+    random_walk,
+)
+
+
+class TestSynthetic:
+    def test_models(self):
+        for density in ["gaussian", "bimodal", "lorentzian"]:
+            model = make_model(density, mesh_scale=0.5, domain=(-2.0, 2.0))
+            max_density = torch.max(model.hysterion_density).item()
+            assert max_density == pytest.approx(1.0, abs=1e-3)
+            assert torch.all(model.hysterion_density > 0.0)
+            assert torch.all(torch.isfinite(model.raw_hysterion_density))
+
+        with pytest.raises(ValueError):
+            make_model("uniform")
+
+    def test_excitations(self):
+        excitations = [
+            degauss_cycles(n_cycles=5, chunk_size=7),
+            minor_loops(n_loops=3, chunk_size=7),
+            random_walk(n_steps=100, chunk_size=7),
+            optimizer_trace(n_steps=100, chunk_size=7),
+        ]
+        for excitation in excitations:
+            chunks = list(excitation)
+            assert all(len(chunk) == 7 for chunk in chunks[:-1])
+            h = torch.cat(chunks)
+            assert torch.all(h >= 0.0) and torch.all(h <= 1.0)
+
+        assert len(torch.cat(list(random_walk(n_steps=100, chunk_size=7)))) == 100
+
+        # deterministic for a given seed
+        assert torch.equal(
+            torch.cat(list(random_walk(50, seed=3))),
+            torch.cat(list(random_walk(50, seed=3))),
+        )
+        assert not torch.equal(
+            torch.cat(list(minor_loops(seed=1))), torch.cat(list(minor_loops(seed=2)))
+        )
+
+        h = torch.cat(list(degauss_cycles(n_cycles=3, decay=0.5, points_per_ramp=2)))
+        assert torch.allclose(h[:4], torch.tensor((0.75, 1.0, 0.5, 0.0)).double())
+        assert h[-1] == 0.5
+
+    def test_measurements(self):
+        model = make_model("bimodal", mesh_scale=0.5, domain=(0.0, 10.0), slope=0.5)
+        excitation = chain(
+            degauss_cycles(n_cycles=3, chunk_size=16),
+            random_walk(n_steps=40, chunk_size=16),
+        )
+        batches = list(generate_measurements(model, excitation, chunk_size=5))
+        h = torch.cat([batch[0] for batch in batches])
+        m = torch.cat([batch[1] for batch in batches])
+        assert torch.all(h <= 10.0)
+
+        # matches a regression over the full sequence
+        with model.mode_scope(REGRESSION):
+            expected = model(h, return_real=True)
+        assert torch.allclose(m, expected)
+        assert not hasattr(model, "_history_h")
+
+        # noise is deterministic for a given seed
+        noisy = [
+            torch.cat(
+                [
+                    batch[1]
+                    for batch in generate_measurements(
+                        model, random_walk(30), noise_std=0.1, seed=1
+                    )
+                ]
+            )
+            for _ in range(2)
+        ]
+        assert torch.equal(noisy[0], noisy[1])
@@ -0,0 +1,68 @@
+import torch
+
+from hysteresis.base import BaseHysteresis
+from hysteresis.modes import REGRESSION
+from hysteresis.synthetic import make_model
+from hysteresis.training import (
+    train_adaptive,
+    train_hysteresis,
+    train_multiresolution,
+)
+
+
+def make_data(n=50):
+    truth = make_model("gaussian", mesh_scale=0.5)
+    h = torch.rand(n).double()
+    with truth.mode_scope(REGRESSION), torch.no_grad():
+        m = truth(h, return_real=True)
+    return h, m
+
+
+def make_fit_model(h, m):
+    return BaseHysteresis(
+        h,
+        m,
+        mesh_scale=1.0,
+        polynomial_fit_iterations=100,
+        fixed_domain=torch.tensor((0.0, 1.0)).double(),
+    )
+
+
+class TestTraining:
+    def test_train_multiresolution(self):
+        torch.manual_seed(0)
+        h, m = make_data()
+        model = make_fit_model(h, m)
+        n_mesh_points = model.n_mesh_points
+
+        losses = train_multiresolution(
+            model, 100, coarse_scales=(4.0, 2.0), coarse_steps=100, lr=0.01
+        )
+        assert len(losses) == 3
+        assert model.n_mesh_points == n_mesh_points
+
+        # the warm start begins below the zero initialized loss of a direct fit
+        direct = train_hysteresis(make_fit_model(h, m), 100, lr=0.01)
+        assert losses[-1][0] < direct[0]
+        assert torch.min(losses[-1]) < torch.min(direct)
+
+        # the fitted model predicts its history
+        with model.mode_scope(REGRESSION), torch.no_grad():
+            error = torch.mean((model(h, return_real=True) - m) ** 2)
+        assert error < torch.var(m)
+
+    def test_train_adaptive(self):
+        torch.manual_seed(0)
+        h, m = make_data()
+        model = make_fit_model(h, m)
+        mesh_points = model.mesh_points
+
+        losses = train_adaptive(model, 100, n_iterations=1, lr=0.01)
+        assert len(losses) == 2
+        assert model.n_mesh_points == len(model.hysterion_density)
+        assert not torch.equal(model.mesh_points, mesh_points)
+        assert torch.min(losses[-1]) < torch.min(losses[0])
+
+        # states are calculated on the new mesh
+        with model.mode_scope(REGRESSION), torch.no_grad():
+            assert model(h).shape == h.shape
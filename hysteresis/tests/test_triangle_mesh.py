@@ -1,7 +1,48 @@
-from hysteresis.meshing import create_triangle_mesh
+import torch
+
+from hysteresis.meshing import (
+    adaptive_mesh_size,
+    create_triangle_mesh,
+    interpolate_density,
+)
+from hysteresis.synthetic import gaussian_density
 
 
 class TestTriangleMesh:
     def test_triangle_mesh(self):
         mesh = create_triangle_mesh(1.0)
         print(len(mesh))
+
+    def test_interpolate_density(self):
+        coarse = torch.tensor(create_triangle_mesh(2.0))
+        fine = torch.tensor(create_triangle_mesh(0.5))
+        values = coarse[:, 0] + 2.0 * coarse[:, 1]
+
+        # values at coinciding points are copied
+        assert torch.allclose(interpolate_density(coarse, values, coarse), values)
+
+        # interpolated values are bounded by the neighboring values
+        result = interpolate_density(coarse, values, fine)
+        assert result.shape == torch.Size([len(fine)])
+        assert torch.all(result >= torch.min(values) - 1e-12)
+        assert torch.all(result <= torch.max(values) + 1e-12)
+        assert torch.max(torch.abs(result - (fine[:, 0] + 2.0 * fine[:, 1]))) < 0.3
+
+    def test_adaptive_mesh_size(self):
+        points = torch.tensor(create_triangle_mesh(0.5)).double()
+        density = gaussian_density(points, center=(0.2, 0.7), width=0.05)
+        mesh_size = adaptive_mesh_size(points, density)
+
+        # refine at the flank of the density peak, coarsen in flat regions
+        assert mesh_size(0.2, 0.75, 1.0) < mesh_size(0.7, 0.9, 1.0)
+        assert mesh_size(0.2, 0.75, 0.5) == 0.5 * mesh_size(0.2, 0.75, 1.0)
+
+        mesh = create_triangle_mesh(1.0, mesh_size)
+        near = ((mesh[:, 0] - 0.2) ** 2 + (mesh[:, 1] - 0.7) ** 2) < 0.1 ** 2
+        near_old = torch.sum((points - torch.tensor((0.2, 0.7))) ** 2, dim=-1) < 0.01
+        assert near.sum() > near_old.sum()
+
+        # a zero target error refines everywhere the error is not zero
+        refined = adaptive_mesh_size(points, density, target_error=0.0, max_size=1.0)
+        assert refined(0.2, 0.75, 1.0) <= mesh_size(0.2, 0.75, 1.0)
+        assert refined(0.7, 0.9, 1.0) < mesh_size(0.7, 0.9, 1.0)
@@ -0,0 +1,52 @@
+import torch
+from torch import Tensor
+
+
+def fit_emittance(M: Tensor, sigma_sq: Tensor, plane: str = "x"):
+    """
+    Differentiable least squares fit of the initial beam matrix of one plane from
+    squared beam sizes measured during a quadrupole scan.
+
+    For each scan step i the squared beam size at the screen is
+    sigma_sq_i = M11^2 s11 + 2 M11 M12 s12 + M12^2 s22, where M is the transport
+    matrix from the reference point to the screen and s11, s12, s22 are the beam
+    matrix elements at the reference point. The normal equations are solved
+    directly so gradients propagate to both M and sigma_sq.
+
+    Parameters
+    ----------
+    M : Tensor
+        Transport matrices from the reference point to the screen, shape
+        `batch_shape x n_scan x 6 x 6`.
+
+    sigma_sq : Tensor
+        Squared rms beam sizes, shape `batch_shape x n_scan`.
+
+    plane : str, "x"
+        Transverse plane to fit, either "x" or "y".
+
+    Returns
+    -------
+    emittance : Tensor
+        Geometric rms emittance, shape `batch_shape`. Unphysical fits (negative
+        beam matrix determinant) return zero.
+
+    beam_matrix : Tensor
+        Fitted beam matrix elements (s11, s12, s22), shape `batch_shape x 3`.
+    """
+    if plane not in ["x", "y"]:
+        raise ValueError("plane must be `x` or `y`")
+    idx = 0 if plane == "x" else 2
+
+    m11 = M[..., idx, idx]
+    m12 = M[..., idx, idx + 1]
+    A = torch.stack((m11 ** 2, 2.0 * m11 * m12, m12 ** 2), dim=-1)
+
+    At = torch.transpose(A, -1, -2)
+    beam_matrix = torch.linalg.solve(
+        At @ A, (At @ sigma_sq.unsqueeze(-1).to(A))
+    ).squeeze(-1)
+
+    det = beam_matrix[..., 0] * beam_matrix[..., 2] - beam_matrix[..., 1] ** 2
+    emittance = torch.sqrt(torch.clamp(det, min=0.0))
+    return emittance, beam_matrix
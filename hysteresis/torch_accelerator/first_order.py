@@ -1,7 +1,11 @@
-import numpy as np
+from typing import Dict
+
 import torch
+from torch import Tensor
 from torch.nn import Module
 
+from hysteresis.profiling import profiled
+
 
 class TorchAccelerator(Module):
     def __init__(self, elements, allow_duplicates=False):
@@ -20,12 +24,116 @@ class TorchAccelerator(Module):
         for _, ele in self.elements.items():
             self.add_module(ele.name, ele)
 
-    def calculate_transport(self):
-        M_i = torch.eye(6)
-        M = [M_i]
-        for _, ele in self.elements.items():
-            M += [torch.matmul(ele(), M[-1])]
-        return torch.cat([m.unsqueeze(0) for m in M], dim=0)
+        # cache of (signature, element matrix, cumulative transport matrix)
+        self._transport_cache = []
+
+        # set when a backward pass used cached tensors, freeing their graphs
+        self._graph_consumed = False
+
+    @profiled("TorchAccelerator.calculate_transport")
+    def calculate_transport(self, element_matrices: Dict[str, Tensor] = None):
+        """
+        Calculate the cumulative transport matrices after each element.
+
+        Element matrices and cumulative products are cached. On subsequent calls
+        only elements whose parameters, buffers (for example K1 or hysteresis
+        states) or mode changed are recomputed, and cumulative products are only
+        recomputed downstream of the first changed element. Changes are detected
+        by comparing the values of parameters and buffers, attributes that are
+        not registered parameters or buffers are not tracked.
+
+        Cached tensors that require gradients are reused until a backward pass
+        goes through any of them, which frees their graphs.
+
+        Parameters
+        ----------
+        element_matrices : Dict[str, Tensor], optional
+            Transport matrices that replace those of the named elements, for
+            example batched matrices of shape `batch_shape x 6 x 6` for candidate
+            settings. These are never cached.
+
+        Returns
+        -------
+        M : Tensor
+            Cumulative transport matrices of shape `batch_shape x (n + 1) x 6 x 6`
+            where n is the number of elements, starting with the identity matrix.
+        """
+        element_matrices = element_matrices or {}
+        cache = self._transport_cache
+        n_elements = len(self.elements)
+
+        # get element matrices, index of the first element whose cumulative
+        # product needs to be recomputed
+        consumed = self._graph_consumed
+        self._graph_consumed = False
+        E, signatures, new_matrices = [], [], []
+        start = n_elements
+        needs_grad = False
+        for idx, (name, ele) in enumerate(self.elements.items()):
+            if name in element_matrices:
+                E += [element_matrices[name]]
+                signatures += [None]
+                start = min(start, idx)
+                continue
+
+            requires_grad = _requires_grad(ele)
+            needs_grad = needs_grad or requires_grad
+            cached = cache[idx] if idx < len(cache) else None
+            if (
+                cached is not None
+                and _usable(cached[1], requires_grad, consumed)
+                and _signature_matches(cached[0], ele)
+            ):
+                E += [cached[1]]
+                signatures += [cached[0]]
+                if not _usable(cached[2], needs_grad, consumed):
+                    start = min(start, idx)
+            else:
+                E += [ele()]
+                signatures += [_element_signature(ele)]
+                new_matrices += [E[-1]]
+                start = min(start, idx)
+
+        # reuse cached products upstream of the first change, calculate the
+        # remaining products with a parallel prefix scan, split at the first
+        # replaced matrix so that upstream products are not broadcast to its
+        # batch shape
+        products = [cache[idx][2] for idx in range(start)]
+        first_replaced = min(
+            [idx for idx, sig in enumerate(signatures) if sig is None] + [n_elements]
+        )
+        boundaries = [start, max(start, first_replaced), n_elements]
+        for lower, upper in zip(boundaries[:-1], boundaries[1:]):
+            if lower == upper:
+                continue
+            initial = products[-1] if len(products) else torch.eye(6)
+            segment = torch.stack(torch.broadcast_tensors(*E[lower:upper]), dim=-3)
+            segment_products = torch.matmul(
+                cumulative_matmul(segment), initial.unsqueeze(-3)
+            )
+            products += list(segment_products.unbind(-3))
+
+        # a backward pass through any cached tensor can free graph nodes that are
+        # shared with other cached tensors, invalidate all of them
+        for tensor in new_matrices + products[start:]:
+            if tensor.requires_grad:
+                tensor.register_hook(self._consume_graph)
+
+        new_cache = []
+        products_cacheable = True
+        for signature, E_i, P_i in zip(signatures, E, products):
+            if signature is None:
+                products_cacheable = False
+                new_cache += [None]
+            else:
+                new_cache += [(signature, E_i, P_i if products_cacheable else None)]
+        self._transport_cache = new_cache
+
+        M = [torch.eye(6)] + products
+        return torch.stack(torch.broadcast_tensors(*M), dim=-3)
+
+    def _consume_graph(self, grad):
+        self._graph_consumed = True
 
     @staticmethod
     def propagate_beam(M, R):
@@ -46,6 +154,85 @@ class TorchAccelerator(Module):
 
         return torch.matmul(M, torch.matmul(R, torch.transpose(M, -2, -1)))
 
+    @staticmethod
+    def propagate_beams(M, R, chunk_size=None):
+        """
+        Propagate a batch of initial beam matricies through a batch of transport
+        matricies, returning the beam matrix for every combination of the two,
+        for example for candidate settings x jittered initial beams.
+
+        Parameters
+        ----------
+        M : torch.Tensor
+            Transport matricies of shape `m_batch_shape x 6 x 6`, for example the
+            output of `calculate_transport`.
+        R : torch.Tensor
+            Initial beam matricies of shape `r_batch_shape x 6 x 6`.
+        chunk_size : int, optional
+            Maximum number of initial beam matricies propagated at once, used to
+            bound the memory of intermediate results.
+
+        Returns
+        -------
+        R_f : torch.Tensor
+            Beam matricies of shape `m_batch_shape x r_batch_shape x 6 x 6`.
+        """
+        if not (M.shape[-2:] == torch.Size([6, 6]) and R.shape[-2:] == M.shape[-2:]):
+            raise RuntimeError("last dims of transport and beam matrix must be 6 x 6")
+
+        m_batch_shape, r_batch_shape = M.shape[:-2], R.shape[:-2]
+        M_flat = M.reshape(-1, 6, 6)
+        R_flat = R.reshape(-1, 6, 6).to(M)
+        chunk_size = chunk_size or R_flat.shape[0]
+
+        n_m = M_flat.shape[0]
+        M_t = torch.transpose(M_flat, -2, -1)
+        result = []
+        for R_chunk in torch.split(R_flat, chunk_size):
+            n_r = R_chunk.shape[0]
+            # M R as a single matrix product, shape n_m x 6 x n_r x 6
+            MR = M_flat.reshape(-1, 6) @ R_chunk.transpose(0, 1).reshape(6, -1)
+            MR = MR.reshape(n_m, 6, n_r, 6).transpose(1, 2).reshape(n_m, -1, 6)
+            # (M R) M^T batched over transport matricies
+            result += [torch.matmul(MR, M_t).reshape(n_m, n_r, 6, 6)]
+        return torch.cat(result, dim=1).reshape(
+            *m_batch_shape, *r_batch_shape, 6, 6
+        )
+
+    def beam_sizes(self, R, screens, M=None):
+        """
+        Calculate the horizontal and vertical rms beam sizes after the elements
+        named in `screens`. Only the rows of the transport matrices at the screens
+        that contribute to the beam sizes are used, so the full stack of beam
+        matricies is never calculated.
+
+        Parameters
+        ----------
+        R : torch.Tensor
+            Initial beam matrix of shape `batch_shape x 6 x 6`.
+        screens : List[str]
+            Names of the elements after which the beam size is calculated.
+        M : torch.Tensor, optional
+            Cumulative transport matrices returned by `calculate_transport`,
+            calculated if not specified.
+
+        Returns
+        -------
+        sizes : torch.Tensor
+            Beam sizes of shape `batch_shape x n_screens x 2`, the last dimension
+            contains the horizontal and vertical beam size.
+        """
+        element_index = {name: idx + 1 for idx, name in enumerate(self.elements)}
+        indices = [element_index[name] for name in screens]
+
+        if M is None:
+            M = self.calculate_transport()
+
+        # rows of the transport matrices corresponding to x and y
+        A = M[..., indices, :, :][..., [0, 2], :]
+        sigma_sq = torch.sum(torch.matmul(A, R.unsqueeze(-3)) * A, dim=-1)
+        return torch.sqrt(sigma_sq)
+
     def forward(self, R, full=True):
         """
         Calculate the beam matrix. If full is True (default) the beam matrix at the
@@ -64,11 +251,87 @@ class TorchAccelerator(Module):
         M = self.calculate_transport()
         R_f = self.propagate_beam(M, R)
         if full:
-            return R_f[-1]
+            return R_f[..., -1, :, :]
         else:
             return R_f
 
 
+def cumulative_matmul(E: Tensor):
+    """
+    Calculate the cumulative products P_k = E_k @ ... @ E_1 of a stack of
+    matrices along dimension -3 using a parallel prefix (Hillis-Steele) scan,
+    which requires log2(n) batched matrix multiplications instead of n
+    sequential ones.
+
+    Parameters
+    ----------
+    E : Tensor
+        Stacked matrices of shape `batch_shape x n x d x d`.
+
+    Returns
+    -------
+    P : Tensor
+        Cumulative products of shape `batch_shape x n x d x d`.
+    """
+    P = E
+    n = E.shape[-3]
+    offset = 1
+    while offset < n:
+        P = torch.cat(
+            (
+                P[..., :offset, :, :],
+                torch.matmul(P[..., offset:, :, :], P[..., :-offset, :, :]),
+            ),
+            dim=-3,
+        )
+        offset *= 2
+    return P
+
+
+def _element_signature(element):
+    """
+    Signature of the mode and of the parameter and buffer values of an element,
+    used to detect changes that invalidate cached transport matrices. Values are
+    copied since tensors can be modified in place through `.data` without
+    updating their version counter.
+    """
+    return (
+        getattr(element, "mode", None),
+        [tensor.detach().clone() for tensor in _element_tensors(element)],
+    )
+
+
+def _element_tensors(element):
+    return list(element.parameters()) + list(element.buffers())
+
+
+def _requires_grad(element):
+    return torch.is_grad_enabled() and any(
+        param.requires_grad for param in element.parameters()
+    )
+
+
+def _usable(tensor, requires_grad, consumed):
+    """whether a cached tensor can be reused with or without gradients"""
+    if tensor is None:
+        return False
+    if tensor.requires_grad:
+        return not consumed
+    return not requires_grad
+
+
+def _signature_matches(signature, element):
+    """whether an element still has the mode and tensor values of a signature"""
+    mode, values = signature
+    tensors = _element_tensors(element)
+    if getattr(element, "mode", None) != mode or len(values) != len(tensors):
+        return False
+    return all(
+        a.shape == b.shape and torch.equal(a, b.detach())
+        for a, b in zip(values, tensors)
+    )
+
+
 def rot(alpha):
     M = torch.eye(6)
 
@@ -102,36 +365,31 @@ class TorchQuad(Module):
         # add small deviation if K1 is zero
         K1 = torch.where(torch.abs(K1) < 1e-6, K1 + 1e-6, K1)
 
+        k = torch.sqrt(torch.abs(K1))
+        kl = self.L * k
+
+        # focusing and defocusing 2 x 2 blocks, a negative K1 swaps the blocks
+        # between the horizontal and vertical planes
+        focusing = (torch.cos(kl), torch.sin(kl) / k, -k * torch.sin(kl))
+        defocusing = (torch.cosh(kl), torch.sinh(kl) / k, k * torch.sinh(kl))
+        positive = K1 >= 0.0
+        x_block = [torch.where(positive, f, d) for f, d in zip(focusing, defocusing)]
+        y_block = [torch.where(positive, d, f) for f, d in zip(focusing, defocusing)]
+
         M = torch.empty(*K1.shape, 6, 6)
         M[..., :, :] = torch.eye(6)
 
-        mag_K1 = torch.where(K1 < 0.0, -K1, K1)
+        M[..., 0, 0] = x_block[0]
+        M[..., 0, 1] = x_block[1]
+        M[..., 1, 0] = x_block[2]
+        M[..., 1, 1] = x_block[0]
 
-        k = torch.sqrt(mag_K1)
+        M[..., 2, 2] = y_block[0]
+        M[..., 2, 3] = y_block[1]
+        M[..., 3, 2] = y_block[2]
+        M[..., 3, 3] = y_block[0]
 
-        kl = self.L * k
-        M[..., 0, 0] = torch.cos(kl)
-        M[..., 0, 1] = torch.sin(kl) / k
-        M[..., 1, 0] = -k * torch.sin(kl)
-        M[..., 1, 1] = torch.cos(kl)
-
-        M[..., 2, 2] = torch.cosh(kl)
-        M[..., 2, 3] = torch.sinh(kl) / k
-        M[..., 3, 2] = k * torch.sinh(kl)
-        M[..., 3, 3] = torch.cosh(kl)
-
-        M_rot = torch.matmul(torch.matmul(rot(-np.pi / 2), M), rot(np.pi / 2))
-
-        # expand array to make >0 comparison, don't try this at home kids
-        K1_test = (
-            K1.unsqueeze(-1)
-            .repeat_interleave(6, dim=-1)
-            .unsqueeze(-1)
-            .repeat_interleave(6, dim=-1)
-        )
-        M_final = M * (K1_test >= 0.0).float() + M_rot * (K1_test < 0.0).float()
-
-        return M_final
+        return M
 
 
 class TorchDrift(Module):
@@ -139,7 +397,7 @@ class TorchDrift(Module):
         Module.__init__(self)
         self.name = name
         if fixed:
-            self.register_buffer("L", torch.nn.parameter.Parameter(length))
+            self.register_buffer("L", length.detach().clone())
         else:
             self.register_parameter("L", torch.nn.parameter.Parameter(length))
 
@@ -1,11 +1,13 @@
 from abc import ABC, abstractmethod
+from contextlib import ExitStack
 from torch.nn import Module, Parameter
 import torch
 from torch import Tensor
 from .first_order import TorchQuad, TorchAccelerator
 from typing import Dict
-from hysteresis.modes import ModeModule, CURRENT
+from hysteresis.modes import ModeModule, CURRENT, FUTURE
 from hysteresis.base import BaseHysteresis
+from hysteresis.parallel import set_histories
 
 
 class HysteresisMagnet(ModeModule, ABC):
@@ -20,14 +22,14 @@ class HysteresisMagnet(ModeModule, ABC):
 
     def get_transport_matrix(self, X: Tensor):
         if isinstance(X, Tensor):
-            self.hysteresis_model.mode = self.mode
-            m = self.hysteresis_model(X, return_real=True)
+            with self.hysteresis_model.mode_scope(self.mode):
+                m = self.hysteresis_model(X, return_real=True)
             return self._calculate_beam_matrix(m)
 
         else:
-            assert self.hysteresis_model.mode == CURRENT
             assert self.mode == CURRENT
-            m = self.hysteresis_model(return_real=True)
+            with self.hysteresis_model.mode_scope(CURRENT):
+                m = self.hysteresis_model(return_real=True)
             return self._calculate_beam_matrix(m).squeeze()
 
     def forward(self, X: Tensor = None):
@@ -71,16 +73,149 @@ class HysteresisAccelerator(TorchAccelerator, ModeModule):
             if isinstance(ele, HysteresisMagnet):
                 ele.mode = self.mode
 
-    def forward(self, R: Tensor, full=True):
-        self.set_element_modes()
-        M = self.calculate_transport()
+    def calculate_transport(self, X: Tensor = None):
+        """
+        Calculate the cumulative transport matrices after each element. If `X` is
+        specified the hysteresis elements are evaluated at the applied fields in
+        `X` (using the current mode) and the transport matrices are calculated for
+        every candidate in a single batched pass.
+
+        Parameters
+        ----------
+        X : Tensor, optional
+            Applied fields of shape `batch_shape x n_magnets`, ordered as
+            `hysteresis_element_names`.
+
+        Returns
+        -------
+        M : Tensor
+            Cumulative transport matrices of shape `batch_shape x (n + 1) x 6 x 6`.
+        """
+        if X is None:
+            return super(HysteresisAccelerator, self).calculate_transport()
+
+        if X.shape[-1] != len(self.hysteresis_element_names):
+            raise ValueError(
+                "last dimension of X must match the number of hysteresis elements"
+            )
+
+        element_matrices = {}
+        for idx, name in enumerate(self.hysteresis_element_names):
+            element_matrices[name] = self.elements[name](X[..., idx])
+        return super(HysteresisAccelerator, self).calculate_transport(
+            element_matrices
+        )
+
+    def forward(self, R: Tensor, full=True, *, X: Tensor = None):
+        """
+        Calculate the beam matrix. If full is True (default) the beam matrix at the
+        end of the beamline is returned. If False the beam matrix after every element
+        is returned.
+
+        In CURRENT mode the beam matrix is calculated from the current state of
+        each hysteresis element. In other modes hysteresis elements are evaluated
+        at the applied fields `X`, which default to the registered `<name>_H`
+        parameters. In NEXT mode `X` can be a batch of candidate fields of shape
+        `batch_shape x n_magnets`, which are propagated in one pass, returning beam
+        matrices of shape `batch_shape x 6 x 6`.
+
+        Parameters
+        ----------
+        R : Tensor
+            Initial beam matrix.
+        full : bool, True
+            Return only the beam matrix at the end of the beamline.
+        X : Tensor, optional
+            Applied fields, ordered as `hysteresis_element_names`, keyword only.
+
+        Returns
+        -------
+        R_f : Tensor
+            Beam matrix or matricies.
+        """
+        M = self._calculate_transport_in_mode(X)
         R_f = self.propagate_beam(M, R)
 
         if full:
-            return R_f[-1]
+            return R_f[..., -1, :, :]
         else:
             return R_f
 
+    def beam_sizes(self, R: Tensor, screens, X: Tensor = None):
+        """
+        Calculate the horizontal and vertical rms beam sizes after the elements
+        named in `screens`, see TorchAccelerator.beam_sizes. Applied fields `X`
+        are treated as in `forward`.
+
+        Returns
+        -------
+        sizes : Tensor
+            Beam sizes of shape `batch_shape x n_screens x 2`.
+        """
+        M = self._calculate_transport_in_mode(X)
+        return super(HysteresisAccelerator, self).beam_sizes(R, screens, M)
+
+    def quad_scan(self, name: str, fields: Tensor, R: Tensor, screen: str):
+        """
+        Simulate a quadrupole scan in a single batched pass. The scanned magnet
+        is evaluated in FUTURE mode so the hysteresis effects of the scan order
+        are included, while all other hysteresis elements stay at their current
+        state. The magnet histories are not modified.
+
+        The transport matrices can be used with
+        `hysteresis.torch_accelerator.emittance.fit_emittance` to fit the
+        emittance at the beamline entrance from the simulated beam sizes.
+
+        Parameters
+        ----------
+        name : str
+            Name of the scanned hysteresis element.
+        fields : Tensor
+            1D sequence of applied fields, in scan order.
+        R : Tensor
+            Initial beam matrix.
+        screen : str
+            Name of the element after which beam sizes are calculated.
+
+        Returns
+        -------
+        M : Tensor
+            Transport matrices from the beamline entrance to the screen, shape
+            `n_scan x 6 x 6`.
+        sizes : Tensor
+            Horizontal and vertical rms beam sizes at the screen, shape
+            `n_scan x 2`.
+        """
+        if name not in self.hysteresis_element_names:
+            raise ValueError(f"{name} is not a hysteresis element")
+        if len(fields.shape) != 1:
+            raise ValueError("scan fields must be a 1D tensor")
+
+        with ExitStack() as stack:
+            for ele_name in self.hysteresis_element_names:
+                stack.enter_context(self.elements[ele_name].mode_scope(CURRENT))
+            stack.enter_context(self.elements[name].mode_scope(FUTURE))
+
+            scan_matrices = self.elements[name](fields)
+            M = super(HysteresisAccelerator, self).calculate_transport(
+                {name: scan_matrices}
+            )
+
+        sizes = TorchAccelerator.beam_sizes(self, R, [screen], M).squeeze(-2)
+        screen_index = list(self.elements).index(screen) + 1
+        return M[..., screen_index, :, :], sizes
+
+    def _calculate_transport_in_mode(self, X: Tensor = None):
+        if X is None and self.mode != CURRENT:
+            X = torch.cat(
+                [getattr(self, name + "_H") for name in self.hysteresis_element_names]
+            )
+
+        with ExitStack() as stack:
+            for name in self.hysteresis_element_names:
+                stack.enter_context(self.elements[name].mode_scope(self.mode))
+            return self.calculate_transport(X)
+
     def apply_fields(self, fields_dict: Dict):
         for key in fields_dict:
             assert key in list(self.elements)
@@ -88,12 +223,24 @@ class HysteresisAccelerator(TorchAccelerator, ModeModule):
         for name, field in fields_dict.items():
             self.elements[name].apply_field(field)
 
-    def set_histories(self, history_h):
+    def set_histories(
+        self, history_h, n_workers=1, threads_per_worker=1, materialize=True
+    ):
+        """
+        Set the histories of all hysteresis elements, ordered as
+        `hysteresis_element_names`. Histories can be set concurrently using
+        `n_workers` threads, see hysteresis.parallel.set_histories.
+        """
         h_elements = [self.elements[ele] for ele in self.hysteresis_element_names]
         assert len(history_h.shape) == 2
         assert history_h.shape[-1] == len(h_elements)
-        for idx, ele in enumerate(h_elements):
-            ele.hysteresis_model.set_history(history_h[:, idx])
+        set_histories(
+            [ele.hysteresis_model for ele in h_elements],
+            history_h,
+            n_workers=n_workers,
+            threads_per_worker=threads_per_worker,
+            materialize=materialize,
+        )
 
 
 class HysteresisQuad(HysteresisMagnet):
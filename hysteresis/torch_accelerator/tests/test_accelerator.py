@@ -1,7 +1,12 @@
 import pytest
 import torch
 
-from hysteresis.torch_accelerator.first_order import TorchDrift, TorchAccelerator
+from hysteresis.torch_accelerator.first_order import (
+    TorchDrift,
+    TorchQuad,
+    TorchAccelerator,
+    cumulative_matmul,
+)
 
 
 class TestAccelerator:
@@ -34,3 +39,138 @@ class TestAccelerator:
         M[2, 3] = 1.0
         correct_result = M @ R @ M.T
         assert torch.equal(accel.forward(R, full=False)[1], correct_result)
+
+    def test_transport_cache(self):
+        elements = []
+        for i in range(5):
+            elements += [
+                TorchDrift(f"d{i}", torch.tensor(1.0)),
+                TorchQuad(f"q{i}", torch.tensor(0.1), torch.tensor(float(i - 2))),
+            ]
+        accel = TorchAccelerator(elements)
+
+        with torch.no_grad():
+            M1 = accel.calculate_transport()
+            assert all(ele is not None for ele in accel._transport_cache)
+            assert torch.equal(M1, accel.calculate_transport())
+
+            # change a quadrupole strength in place
+            accel.elements["q3"].K1.fill_(0.5)
+            M2 = accel.calculate_transport()
+            assert torch.equal(M1[:7], M2[:7])
+            assert not torch.equal(M1[-1], M2[-1])
+
+            accel._transport_cache = []
+            assert torch.allclose(M2, accel.calculate_transport())
+
+            # in place changes through .data do not update version counters
+            accel.elements["q1"].K1.data.fill_(-0.5)
+            accel.elements["d4"].L.data.fill_(2.0)
+            M3 = accel.calculate_transport()
+            assert torch.equal(M2[:4], M3[:4])
+            assert not torch.equal(M2[4], M3[4])
+            accel._transport_cache = []
+            assert torch.allclose(M3, accel.calculate_transport())
+
+        # gradients must flow through cached elements when enabled
+        M = accel.calculate_transport()
+        M[-1, 0, 0].backward()
+        assert accel.elements["q1"].K1.grad is not None
+
+    def test_transport_cache_grad(self):
+        elements = []
+        for i in range(5):
+            elements += [
+                TorchDrift(f"d{i}", torch.tensor(1.0)),
+                TorchQuad(f"q{i}", torch.tensor(0.1), torch.tensor(float(i - 2))),
+            ]
+        accel = TorchAccelerator(elements)
+        K1 = [accel.elements[f"q{i}"].K1 for i in range(5)]
+        assert all(param.requires_grad for param in K1)
+
+        # cached matrices are reused with gradients enabled
+        M1 = accel.calculate_transport()
+        cache = list(accel._transport_cache)
+        M2 = accel.calculate_transport()
+        assert torch.equal(M1, M2)
+        assert all(a[1] is b[1] for a, b in zip(cache, accel._transport_cache))
+        assert all(a[2] is b[2] for a, b in zip(cache, accel._transport_cache))
+
+        # only elements that changed and downstream products are recomputed
+        with torch.no_grad():
+            K1[3].add_(0.5)
+        M3 = accel.calculate_transport()
+        new_cache = accel._transport_cache
+        assert all(new_cache[i][2] is cache[i][2] for i in range(7))
+        assert new_cache[7][1] is not cache[7][1]
+        assert new_cache[6][1] is cache[6][1]
+
+        # gradients through cached matrices match a fresh calculation
+        M3[-1, 0, 0].backward()
+        grads = [param.grad.clone() for param in K1]
+        accel._transport_cache = []
+        accel.calculate_transport()
+        for param in K1:
+            param.grad = None
+        accel.calculate_transport()[-1, 0, 0].backward()
+        assert all(torch.allclose(param.grad, grad) for param, grad in zip(K1, grads))
+
+        # graphs freed by a backward pass are recomputed
+        optimizer = torch.optim.SGD(K1, lr=0.01)
+        for _ in range(3):
+            optimizer.zero_grad()
+            accel.calculate_transport()[-1, 0, 0].backward()
+            optimizer.step()
+        for _ in range(2):
+            optimizer.zero_grad()
+            accel.calculate_transport()[-1, 0, 0].backward()
+
+    def test_cumulative_matmul(self):
+        E = torch.randn(3, 13, 6, 6).double()
+        P = cumulative_matmul(E)
+        expected = E[:, 0]
+        assert torch.allclose(P[:, 0], expected)
+        for i in range(1, 13):
+            expected = E[:, i] @ expected
+            assert torch.allclose(P[:, i], expected)
+
+    def test_beam_sizes(self):
+        elements = [
+            TorchDrift("d1", torch.tensor(1.0)),
+            TorchQuad("q1", torch.tensor(0.1), torch.tensor(2.0)),
+            TorchDrift("d2", torch.tensor(1.0)),
+            TorchQuad("q2", torch.tensor(0.1), torch.tensor(-2.0)),
+            TorchDrift("d3", torch.tensor(1.0)),
+        ]
+        accel = TorchAccelerator(elements)
+        R = torch.eye(6) * 1e-3
+        R_f = accel(R, full=False)
+
+        sizes = accel.beam_sizes(R, ["d2", "d3"])
+        assert sizes.shape == torch.Size([2, 2])
+        for i, idx in enumerate([3, 5]):
+            assert torch.allclose(sizes[i, 0] ** 2, R_f[idx, 0, 0])
+            assert torch.allclose(sizes[i, 1] ** 2, R_f[idx, 2, 2])
+
+        with pytest.raises(KeyError):
+            accel.beam_sizes(R, ["q3"])
+
+    def test_propagate_beams(self):
+        elements = [
+            TorchDrift("d1", torch.tensor(1.0)),
+            TorchQuad("q1", torch.tensor(0.1), torch.tensor(2.0)),
+            TorchDrift("d2", torch.tensor(1.0)),
+        ]
+        accel = TorchAccelerator(elements)
+        M = accel.calculate_transport()
+        R = torch.eye(6) + 0.1 * torch.rand(5, 2, 6, 6)
+        R = R @ R.transpose(-1, -2)
+
+        for chunk_size in [None, 3]:
+            R_f = accel.propagate_beams(M, R, chunk_size=chunk_size)
+            assert R_f.shape == torch.Size([4, 5, 2, 6, 6])
+            for i in range(5):
+                for j in range(2):
+                    assert torch.allclose(
+                        R_f[:, i, j], accel.propagate_beam(M, R[i, j]), atol=1e-5
+                    )
@@ -0,0 +1,34 @@
+import pytest
+import torch
+
+from hysteresis.torch_accelerator.emittance import fit_emittance
+from hysteresis.torch_accelerator.first_order import TorchDrift, TorchQuad
+
+
+class TestEmittance:
+    def test_fit_emittance(self):
+        d = TorchDrift("d1", torch.tensor(2.0))
+        q = TorchQuad("q1", torch.tensor(0.1), torch.tensor(1.0))
+        k = torch.linspace(-10.0, 10.0, 15, requires_grad=True)
+        M = d() @ q.get_matrix(k)
+
+        R = torch.zeros(6, 6)
+        R[0, 0] = 2.0
+        R[0, 1] = R[1, 0] = -1.0
+        R[1, 1] = 1.0
+        R[2, 2] = 1.0
+        R[3, 3] = 4.0
+        sigma = M @ R @ M.transpose(-1, -2)
+
+        emittance, beam_matrix = fit_emittance(M, sigma[..., 0, 0])
+        assert torch.isclose(emittance, torch.tensor(1.0), rtol=1e-3)
+        assert torch.allclose(beam_matrix, torch.tensor((2.0, -1.0, 1.0)), atol=1e-3)
+
+        emittance_y, _ = fit_emittance(M, sigma[..., 2, 2], plane="y")
+        assert torch.isclose(emittance_y, torch.tensor(2.0), rtol=1e-3)
+
+        emittance.backward()
+        assert not torch.any(torch.isnan(k.grad))
+
+        with pytest.raises(ValueError):
+            fit_emittance(M, sigma[..., 0, 0], plane="z")
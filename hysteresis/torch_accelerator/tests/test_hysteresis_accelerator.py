@@ -1,8 +1,10 @@
 from copy import deepcopy
 
+import pytest
 import torch
 
 from hysteresis.torch_accelerator.hysteresis import BaseHysteresis
+from hysteresis.torch_accelerator.emittance import fit_emittance
 from hysteresis.torch_accelerator.first_order import TorchDrift
 from hysteresis.torch_accelerator.hysteresis import (
     HysteresisQuad,
@@ -45,6 +47,11 @@ class TestHysteresisAccelerator:
         m3 = HA(init_beam_matrix)
         assert torch.equal(m1, m3)
 
+        # full can be passed positionally
+        R_f = HA(init_beam_matrix, False)
+        assert R_f.shape == torch.Size([3, 6, 6])
+        assert torch.equal(R_f[-1], m3)
+
         assert torch.equal(
             HA.elements["q1"].hysteresis_model.history_h,
             torch.tensor((0.0, 1.0, 0.0)).double(),
@@ -70,3 +77,79 @@ class TestHysteresisAccelerator:
         assert torch.equal(
             HA.elements["q2"].hysteresis_model.history_h, new_histories[:, 1]
         )
+
+        HA.set_histories(new_histories, n_workers=2)
+        for name in HA.hysteresis_element_names:
+            assert HA.elements[name].hysteresis_model._states_cache is not None
+
+    def test_batched_candidates(self):
+        H = BaseHysteresis(
+            mesh_scale=0.5, trainable=False, fixed_domain=torch.tensor((-1.0, 1.0))
+        )
+        H.scale = 10.0
+        H.slope = 20.0
+        H.offset = -5.0
+
+        q1 = HysteresisQuad("q1", torch.tensor(0.1), deepcopy(H))
+        d1 = TorchDrift("d1", torch.tensor(1.0))
+        q2 = HysteresisQuad("q2", torch.tensor(0.1), deepcopy(H))
+        HA = HysteresisAccelerator([q1, d1, q2])
+        HA.set_histories(torch.rand(5, 2).double() * 2.0 - 1.0)
+
+        HA.next()
+        R = torch.eye(6)
+        X = (torch.rand(4, 3, 2).double() * 2.0 - 1.0).requires_grad_(True)
+        result = HA(R, X=X)
+        assert result.shape == torch.Size([4, 3, 6, 6])
+        assert HA(R, full=False, X=X).shape == torch.Size([4, 3, 4, 6, 6])
+
+        # compare to unbatched evaluation
+        for i in range(4):
+            for j in range(3):
+                assert torch.allclose(result[i, j], HA(R, X=X[i, j]), atol=1e-5)
+
+        result[..., 0, 0].sum().backward()
+        assert not torch.any(torch.isnan(X.grad))
+
+        # beam sizes at selected screens
+        sizes = HA.beam_sizes(R, ["d1", "q2"], X)
+        assert sizes.shape == torch.Size([4, 3, 2, 2])
+        R_f = HA(R, full=False, X=X)
+        assert torch.allclose(sizes[..., 0, 0] ** 2, R_f[..., 2, 0, 0])
+        assert torch.allclose(sizes[..., 1, 1] ** 2, R_f[..., 3, 2, 2])
+
+    def test_quad_scan(self):
+        H = BaseHysteresis(
+            mesh_scale=0.5, trainable=False, fixed_domain=torch.tensor((-1.0, 1.0))
+        )
+        H.scale = 5.0
+        H.slope = 20.0
+        H.offset = 0.0
+
+        q1 = HysteresisQuad("q1", torch.tensor(0.1), H)
+        d0 = TorchDrift("d0", torch.tensor(0.5))
+        d1 = TorchDrift("d1", torch.tensor(2.0))
+        HA = HysteresisAccelerator([d0, q1, d1])
+        HA.apply_fields({"q1": torch.tensor(-1.0)})
+
+        R = torch.eye(6) * 1e-6
+        fields = torch.linspace(-1.0, 1.0, 10).double()
+        M, sizes = HA.quad_scan("q1", fields, R, "d1")
+        assert M.shape == torch.Size([10, 6, 6])
+        assert sizes.shape == torch.Size([10, 2])
+
+        # scan must not modify the magnet history
+        assert len(H.history_h) == 1
+
+        # compare to stepping through the scan with applied fields
+        HA.current()
+        for idx, field in enumerate(fields):
+            HA.apply_fields({"q1": field})
+            R_f = HA(R)
+            assert torch.isclose(sizes[idx, 0] ** 2, R_f[0, 0], rtol=1e-4)
+
+        emittance, _ = fit_emittance(M, sizes[:, 0] ** 2)
+        assert torch.isclose(emittance, torch.tensor(1e-6), rtol=1e-2)
+
+        with pytest.raises(ValueError):
+            HA.quad_scan("d1", fields, R, "d1")
@@ -3,7 +3,14 @@ from copy import deepcopy
 
 import torch
 
+from hysteresis.meshing import (
+    adaptive_mesh_size,
+    create_triangle_mesh,
+    interpolate_density,
+    mesh_point_areas,
+)
 from hysteresis.modes import FITTING
+from hysteresis.states import get_padded_states
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +27,7 @@ def train_MSE(model: torch.nn.Module, train_x, train_y, n_steps, lr=0.1, atol=1.
         loss = torch.nn.MSELoss()(train_y, output)
         loss.backward()
 
-        loss_track += [loss]
+        loss_track += [loss.detach()]
         min_loss = torch.min(torch.tensor(loss_track))
         if min_loss < atol:
             break
@@ -43,3 +50,227 @@ def train_hysteresis(model, n_steps, lr=0.1, atol=1e-8):
     train_y = model.transformer.transform(model.history_h, model.history_m)[1]
 
     return train_MSE(model, train_x, train_y, n_steps, lr=lr, atol=atol)
+
+
+def _set_mesh(model, mesh_points):
+    """replace the mesh of a model, resetting the hysterion density"""
+    model.mesh_points = mesh_points.to(**model.tkwargs)
+    model.raw_hysterion_density = torch.nn.Parameter(
+        torch.zeros(len(mesh_points)).to(model.raw_hysterion_density),
+        requires_grad=model.raw_hysterion_density.requires_grad,
+    )
+    model._update_h_history_buffer(model._history_h)
+
+
+def _with_mesh(model, mesh_points):
+    """copy of a model on a different mesh, with a default hysterion density"""
+    new_model = deepcopy(model, {id(model.history_store): None})
+    _set_mesh(new_model, mesh_points)
+    return new_model
+
+
+def _warm_start(model, coarse_model):
+    """interpolate the density of a coarse model onto the mesh of a finer model"""
+    eps = 1e-4
+    with torch.no_grad():
+        # densities are weights per mesh point, interpolate the density per unit
+        # area since the meshes are not uniform
+        coarse_density = coarse_model.hysterion_density / mesh_point_areas(
+            coarse_model.mesh_points
+        )
+        density = interpolate_density(
+            coarse_model.mesh_points, coarse_density, model.mesh_points
+        ) * mesh_point_areas(model.mesh_points)
+
+        # predictions only depend on relative densities, keep the range of the
+        # coarse density so that raw values are not saturated
+        density = torch.max(coarse_model.hysterion_density) * density / torch.max(
+            density
+        )
+        model.hysterion_density = torch.clamp(density, eps, 1.0 - eps)
+        for name in ["raw_offset", "raw_scale", "raw_slope"]:
+            getattr(model, name).copy_(getattr(coarse_model, name))
+
+
+def train_multiresolution(
+    model,
+    n_steps,
+    coarse_scales=None,
+    coarse_steps=None,
+    lr=0.1,
+    atol=1e-8,
+    mesh_density_function=None,
+):
+    """
+    Coarse to fine fitting of a hysteresis model. Copies of the model are fit on
+    coarse meshes (see create_triangle_mesh) in order, the fitted density of each
+    level is interpolated onto the next finer mesh as a warm start and the model
+    itself is fit last on its own mesh.
+
+    Parameters
+    ----------
+    model : BaseHysteresis
+        Model with history data to fit.
+
+    n_steps : int
+        Maximum number of optimization steps on the mesh of the model.
+
+    coarse_scales : Tuple[float], optional
+        Mesh scales of the coarse levels, from coarse to fine. Defaults to a
+        single level with five times the mesh scale of the model. Coarse levels
+        only pay off when steps on the model mesh are expensive, ie. for small
+        mesh scales and long histories.
+
+    coarse_steps : int, optional
+        Maximum number of optimization steps per coarse level, defaults to
+        `n_steps`.
+
+    lr : float, 0.1
+        Learning rate.
+
+    atol : float, 1e-8
+        Target loss of every level.
+
+    mesh_density_function : Callable, optional
+        Density function for the coarse meshes, see create_triangle_mesh.
+
+    Returns
+    -------
+    losses : List[Tensor]
+        Training loss of each level, the last entry belongs to the model mesh.
+    """
+    if coarse_scales is None:
+        coarse_scales = (5.0 * model.mesh_scale,)
+    coarse_steps = coarse_steps or n_steps
+    losses = []
+    previous = None
+    for mesh_scale in coarse_scales:
+        mesh_points = torch.tensor(
+            create_triangle_mesh(mesh_scale, mesh_density_function)
+        )
+        level_model = _with_mesh(model, mesh_points)
+        if previous is not None:
+            _warm_start(level_model, previous)
+        losses += [train_hysteresis(level_model, coarse_steps, lr=lr, atol=atol)]
+        previous = level_model
+
+    if previous is not None:
+        _warm_start(model, previous)
+    losses += [train_hysteresis(model, n_steps, lr=lr, atol=atol)]
+    return losses
+
+
+def train_adaptive(
+    model,
+    n_steps,
+    n_iterations=2,
+    lr=0.1,
+    atol=1e-8,
+    target_error=None,
+    max_change=2.0,
+):
+    """
+    Fit a hysteresis model and adapt its mesh to the fitted density. Every
+    iteration regenerates the mesh with smaller elements where the estimated
+    density interpolation error is large and larger elements where the density
+    is flat (see adaptive_mesh_size), interpolates the density onto the new mesh
+    and refits. The mesh of the model is replaced in place.
+
+    Parameters
+    ----------
+    model : BaseHysteresis
+        Model with history data to fit.
+
+    n_steps : int
+        Maximum number of optimization steps per fit.
+
+    n_iterations : int, 2
+        Number of remeshing iterations after the initial fit.
+
+    lr : float, 0.1
+        Learning rate.
+
+    atol : float, 1e-8
+        Target loss of every fit.
+
+    target_error, max_change : float
+        Remeshing parameters, see adaptive_mesh_size.
+
+    Returns
+    -------
+    losses : List[Tensor]
+        Training loss of each fit, the first entry belongs to the initial mesh.
+    """
+    losses = [train_hysteresis(model, n_steps, lr=lr, atol=atol)]
+    for _ in range(n_iterations):
+        previous = deepcopy(model, {id(model.history_store): None})
+        mesh_size = adaptive_mesh_size(
+            previous.mesh_points,
+            previous.hysterion_density,
+            target_error=target_error,
+            max_change=max_change,
+        )
+        _set_mesh(model, torch.tensor(create_triangle_mesh(1.0, mesh_size)))
+        _warm_start(model, previous)
+        losses += [train_hysteresis(model, n_steps, lr=lr, atol=atol)]
+    return losses
+
+
+class _MultiRunObjective(torch.nn.Module):
+    """predicts the valid entries of padded runs from precomputed states"""
+
+    def __init__(self, model, states, mask):
+        super(_MultiRunObjective, self).__init__()
+        self.model = model
+        self.states = states
+        self.mask = mask
+
+    def forward(self, norm_h):
+        m = self.model._predict_normalized_magnetization(self.states, norm_h)
+        return m[self.mask]
+
+
+def _get_multi_run_data(model, dataset):
+    """normalized padded runs, their hysteresis states and valid entry mask"""
+    h, m, lengths = dataset.padded()
+    norm_h, norm_m = model.transformer.transform(
+        h.to(**model.tkwargs), m.to(**model.tkwargs)
+    )
+    current_state, current_field = dataset.get_initial_states(model)
+
+    # states do not depend on model parameters, compute once for all runs
+    with torch.no_grad():
+        states = get_padded_states(
+            norm_h.detach(),
+            model.mesh_points,
+            lengths,
+            current_state=current_state,
+            current_field=current_field,
+            tkwargs=model.tkwargs,
+            temp=model.temp,
+        )
+    return norm_h.detach(), norm_m.detach(), states, dataset.mask()
+
+
+def train_multi_run(model, dataset, n_steps, lr=0.1, atol=1e-8):
+    """
+    Fit a single hysteresis model (shared hysterion density, scale, offset and
+    slope) to all runs of a MultiRunDataset. Each run starts from its own initial
+    state and the states of all runs are calculated in one batched pass.
+    """
+    model._update_transformer(dataset.h, dataset.m)
+    norm_h, norm_m, states, mask = _get_multi_run_data(model, dataset)
+    objective = _MultiRunObjective(model, states, mask)
+    return train_MSE(objective, norm_h, norm_m[mask], n_steps, lr=lr, atol=atol)
+
+
+def predict_multi_run(model, dataset, return_real=False):
+    """
+    Predict the output of each run of a MultiRunDataset, returns a list with one
+    tensor per run.
+    """
+    norm_h, _, states, mask = _get_multi_run_data(model, dataset)
+    m = model._predict_normalized_magnetization(states, norm_h)
+    if return_real:
+        m = model.transformer.untransform(norm_h, m)[1]
+    return [m[idx, :length] for idx, length in enumerate(dataset.lengths)]
@@ -1,6 +1,7 @@
 import torch
 from torch.nn import Module
 from hysteresis.polynomial import Polynomial
+from hysteresis.profiling import profiled
 from hysteresis.training import train_MSE
 
 
@@ -90,6 +91,7 @@ class HysteresisTransform(Module):
         out.backward(torch.ones_like(h_copy))
         return h_copy.grad
 
+    @profiled("HysteresisTransform.update_fit")
     def update_fit(self, hn, mn):
         """do polynomial fitting on normalized train_h and train_m"""
         self._poly_fit = Polynomial(self.polynomial_degree)